@@ -1,67 +1,665 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify
 from flask_cors import CORS
-import joblib
+from werkzeug.exceptions import HTTPException
+import hmac
+import json
 import numpy as np
 import os
+import time
+import traceback
+# The inference pool's result(timeout=...) raises this; it is only the builtin TimeoutError from Python 3.11 on
+from concurrent.futures import TimeoutError as PoolTimeoutError
+from threadpoolctl import threadpool_limits
+from coalescer import MicroBatcher
+from feature_schema import SCHEMA
+from inference_executor import BoundedExecutor, Overloaded
+from metrics import PROBABILITY_BUCKETS, Registry, process_rss_bytes
+import profiler
+from model_manager import ModelManager
+from model_registry import DEFAULT_MODEL, ShadowScorer, UnknownModel, build_registry
+from prediction_log import PredictionLog
+from prediction_cache import PredictionCache, parse_quantization
 
 app = Flask(__name__)
 CORS(app)
 
-# Load the trained model and scaler
-try:
-    model = joblib.load('diabetes_risk_model.pkl')
-    scaler = joblib.load('scaler.pkl')
-    print("✅ Model loaded successfully!")
-except FileNotFoundError:
-    print("❌ Model files not found. Please run 'python train_model.py' first.")
-    model = None
-    scaler = None
+MODEL_PATH = 'diabetes_risk_model.pkl'
+SCALER_PATH = 'scaler.pkl'
+# Array-backed copy of the model written by train_model.py, memory-mapped instead of unpickled.
+# Point ML_COMPILED_MODEL at diabetes_risk_model_compact.joblib to serve the export_compact.py model.
+COMPILED_MODEL_PATH = os.getenv('ML_COMPILED_MODEL', 'diabetes_risk_model_compiled.joblib')
+
+# Inference backend: 'compiled' (flattened NumPy trees, see inference_engine.py) or 'sklearn'
+ML_ENGINE = os.getenv('ML_ENGINE', 'compiled')
+# The compiled engine is fastest for single rows and small batches; matrices of at least ML_SKLEARN_MIN_ROWS rows
+# (large /api/predict/batch requests) go to sklearn's vectorized predict_proba instead. 0 keeps every call compiled.
+SKLEARN_MIN_ROWS = int(os.getenv('ML_SKLEARN_MIN_ROWS', 500)) or None
+
+# Threads a single model call may use (sklearn n_jobs, OpenMP, BLAS); -1 keeps the library defaults.
+# Concurrency comes from requests, so one thread per call avoids oversubscribing the cores under load.
+MODEL_N_JOBS = int(os.getenv('ML_MODEL_N_JOBS', 1))
+if MODEL_N_JOBS > 0:
+    threadpool_limits(MODEL_N_JOBS)
+
+# Poll the model files and hot-swap a retrained model when they change
+WATCH_MODEL = os.getenv('ML_WATCH_MODEL', '').lower() in ('1', 'true', 'yes')
+WATCH_INTERVAL = float(os.getenv('ML_WATCH_INTERVAL', 5))
+
+# Token for /api/admin/* (sent as X-Admin-Token); without one, admin endpoints only accept localhost
+ADMIN_TOKEN = os.getenv('ML_ADMIN_TOKEN')
+
+# Per-patient feature contributions (explain.py), opt-in: ?explain=1 or an 'explain' field asks for them, and
+# ML_EXPLAIN=1 turns them on for every /api/predict call. Their cost grows with the number of leaves, so models
+# with more than ML_MAX_EXPLAIN_LEAVES leaves are not explained. Batches explain at most ML_MAX_EXPLAIN_BATCH rows.
+EXPLAIN = os.getenv('ML_EXPLAIN', '0').lower() in ('1', 'true', 'yes')
+MAX_EXPLAIN_LEAVES = int(os.getenv('ML_MAX_EXPLAIN_LEAVES', 20000))
+MAX_EXPLAIN_BATCH = int(os.getenv('ML_MAX_EXPLAIN_BATCH', 1000))
+
+# Opt-in profiling: /api/admin/profile stack sampling and per-request cProfile via X-Profile (see profiler.py)
+PROFILING = os.getenv('ML_PROFILING', '').lower() in ('1', 'true', 'yes')
+MAX_PROFILE_SECONDS = 60
+
+def on_model_swap(previous, bundle):
+    if prediction_cache is not None:
+        prediction_cache.clear()
+
+# The model is loaded lazily on first use and can be hot-swapped (see model_manager.py)
+models = ModelManager(MODEL_PATH, SCALER_PATH, COMPILED_MODEL_PATH, use_engine=ML_ENGINE == 'compiled',
+                      on_swap=on_model_swap, n_jobs=MODEL_N_JOBS if MODEL_N_JOBS > 0 else None, explain=EXPLAIN,
+                      name=DEFAULT_MODEL, sklearn_min_rows=SKLEARN_MIN_ROWS)
+
+def make_model_manager(name, path, compiled_path=None):
+    # Predictions are cached under the bundle version, so swapping these models needs no cache flush
+    return ModelManager(path, SCALER_PATH, compiled_path, use_engine=ML_ENGINE == 'compiled',
+                        n_jobs=MODEL_N_JOBS if MODEL_N_JOBS > 0 else None, explain=EXPLAIN, name=name,
+                        sklearn_min_rows=SKLEARN_MIN_ROWS)
+
+# More models next to the default one, for A/B splits and shadow scoring (see model_registry.py), e.g.
+# ML_MODELS="gb=diabetes_risk_model_gb.pkl+diabetes_risk_model_gb_compiled.joblib:10,hgb=diabetes_risk_model_hgb.pkl:shadow"
+# (the optional +compiled artifact is memory-mapped like the default model's). A request picks a model
+# with the X-Model header (ML_MODEL_HEADER), or gets a weighted pick that X-Routing-Key keeps stable.
+registry = build_registry(models, os.getenv('ML_MODELS', ''), make_model_manager)
+MODEL_HEADER = os.getenv('ML_MODEL_HEADER', 'X-Model')
+ROUTING_KEY_HEADER = 'X-Routing-Key'
+
+# ============================================
+# METRICS (exposed at /metrics, see metrics.py; ML_METRICS=0 disables them)
+# ============================================
+
+metrics = Registry(enabled=os.getenv('ML_METRICS', '1').lower() not in ('0', 'false', 'no'))
+STARTED_AT = time.time()
+
+REQUESTS = metrics.counter('ml_requests_total', 'HTTP requests handled', ['endpoint', 'method', 'status'])
+REQUEST_ERRORS = metrics.counter('ml_request_errors_total', 'Failed prediction requests by exception type', ['endpoint', 'type'])
+REQUEST_LATENCY = metrics.histogram('ml_request_duration_seconds', 'Request handling time', ['endpoint'])
+STAGE_LATENCY = metrics.histogram('ml_stage_duration_seconds', 'Prediction time per stage: parse, extract, scale, infer, explain',
+                                  ['endpoint', 'stage'])
+BATCH_ROWS = metrics.counter('ml_batch_rows_total', 'Rows received by /api/predict/batch', ['outcome'])
+IN_FLIGHT = metrics.gauge('ml_requests_in_flight', 'Requests currently being handled')
+MODEL_LATENCY = metrics.histogram('ml_model_inference_seconds', 'Model call time per model and role (primary or shadow)',
+                                  ['model', 'role'])
+MODEL_PROBABILITY = metrics.histogram('ml_model_probability', 'Predicted positive-class probability per model and role',
+                                      ['model', 'role'], buckets=PROBABILITY_BUCKETS)
+SHADOW_DELTA = metrics.histogram('ml_shadow_probability_delta', 'Absolute probability difference to the served model',
+                                 ['model'], buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0))
+SHADOW_DISAGREEMENTS = metrics.counter('ml_shadow_risk_disagreements_total',
+                                       'Rows where a shadow model predicts a different risk class', ['model'])
+
+def _inference_pool_pending():
+    return {(): inference_pool.metrics()['pending']} if inference_pool is not None else {}
+
+def _inference_pool_rejected():
+    return {(): inference_pool.metrics()['rejected']} if inference_pool is not None else {}
+
+def _model_info():
+    samples = {}
+    for name in registry.names:
+        bundle = registry.current(name)
+        if bundle is not None:
+            info = bundle.info()
+            samples[(name, info['version'], info['engine'], info['source'])] = 1
+    return samples
+
+def _cache_events():
+    if prediction_cache is None:
+        return {}
+    stats = prediction_cache.stats()
+    return {(event,): stats[event] for event in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')}
+
+def _cache_entries():
+    return {(): prediction_cache.stats()['size']} if prediction_cache is not None else {}
+
+def _coalescer_queue_depth():
+    return {(): coalescer.metrics()['queue_depth']} if coalescer is not None else {}
+
+def _prediction_log_events():
+    if prediction_log is None:
+        return {}
+    stats = prediction_log.stats()
+    return {(event,): stats[event] for event in ('logged', 'written', 'dropped')}
+
+def _prediction_log_pending():
+    return {(): prediction_log.pending()} if prediction_log is not None else {}
+
+def _shadow_events():
+    if shadow_scorer is None:
+        return {}
+    stats = shadow_scorer.stats()
+    return {(event,): stats[event] for event in ('queued', 'scored', 'dropped', 'errors')}
+
+metrics.gauge('ml_model_info', 'Loaded model bundles', ['model', 'version', 'engine', 'source'], callback=_model_info)
+metrics.gauge('ml_process_info', 'Process answering this scrape', ['pid'], callback=lambda: {(str(os.getpid()),): 1})
+metrics.gauge('ml_process_resident_memory_bytes', 'Resident memory of this process', callback=lambda: {(): process_rss_bytes()})
+metrics.gauge('ml_process_start_time_seconds', 'Time the server was started (unix time)', callback=lambda: {(): STARTED_AT})
+metrics.gauge('ml_prediction_cache_events_total', 'Prediction cache events', ['event'], callback=_cache_events, kind='counter')
+metrics.gauge('ml_prediction_cache_entries', 'Entries in the prediction cache', callback=_cache_entries)
+metrics.gauge('ml_inference_pending', 'Model calls running or queued on the inference pool', callback=_inference_pool_pending)
+metrics.gauge('ml_inference_rejected_total', 'Model calls rejected with 429 because the queue was full',
+              callback=_inference_pool_rejected, kind='counter')
+metrics.gauge('ml_coalescer_queue_depth', 'Requests waiting for the micro-batcher', callback=_coalescer_queue_depth)
+metrics.gauge('ml_prediction_log_records_total', 'Prediction log records by outcome', ['event'],
+              callback=_prediction_log_events, kind='counter')
+metrics.gauge('ml_prediction_log_pending', 'Prediction log records waiting for the writer', callback=_prediction_log_pending)
+metrics.gauge('ml_shadow_jobs_total', 'Shadow scoring jobs by outcome', ['event'], callback=_shadow_events, kind='counter')
+
+def stage_timer(endpoint, stage):
+    return metrics.time(STAGE_LATENCY, endpoint, stage)
+
+def count_error(endpoint, error):
+    if metrics.enabled:
+        REQUEST_ERRORS.inc(endpoint, error if isinstance(error, str) else type(error).__name__)
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+@app.after_request
+def record_request(response):
+    if metrics.enabled and 'request_started' in g:
+        # Route pattern rather than raw path, so unknown URLs cannot blow up the label set
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_started, endpoint)
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    if metrics.enabled and 'request_started' in g:
+        IN_FLIGHT.dec()
+
+@app.before_request
+def start_profiling():
+    if not PROFILING:
+        return
+    profiler.request_started()
+    if request.headers.get('X-Profile', '').lower() in ('1', 'true', 'yes') and admin_allowed():
+        profile = profiler.RequestProfile()
+        # A diagnostics header never fails the request: it just goes unprofiled
+        g.request_profile = profile if profile.start() else None
+
+@app.after_request
+def attach_profile(response):
+    if 'request_profile' in g:
+        profile = g.pop('request_profile')
+        summary = profile.summary() if profile is not None else 'skipped: another request is being profiled'
+        data = response.get_json(silent=True) if response.is_json else None
+        if isinstance(data, dict):
+            data['profile'] = summary
+            response.set_data(json.dumps(data))
+    return response
+
+@app.teardown_request
+def stop_profiling(exc):
+    if PROFILING:
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.stop()
+        profiler.request_finished()
+
+def current_bundle(name=DEFAULT_MODEL):
+    """The active bundle of a registered model; a request should fetch it once and use it throughout"""
+    if WATCH_MODEL:
+        registry.start_watchers(WATCH_INTERVAL)
+    return registry.current(name)
+
+def routed_bundle():
+    """Bundle of the model this request is routed to (raises UnknownModel for a bad X-Model header)"""
+    return current_bundle(registry.route(request.headers.get(MODEL_HEADER), request.headers.get(ROUTING_KEY_HEADER)))
+
+def admin_allowed():
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ML Server is running'})
+    status = {
+        'status': 'ML Server is running',
+        'uptime_seconds': time.time() - STARTED_AT,
+        'requests_in_flight': IN_FLIGHT.value(),
+        'pid': os.getpid(),
+    }
+    bundle = current_bundle()
+    if bundle is not None:
+        status['model'] = bundle.info()
+    if coalescer is not None:
+        status['coalescer'] = coalescer.metrics()
+    if prediction_cache is not None:
+        status['cache'] = prediction_cache.stats()
+    if inference_pool is not None:
+        status['inference_pool'] = inference_pool.metrics()
+    if prediction_log is not None:
+        status['prediction_log'] = prediction_log.stats()
+    if len(registry.names) > 1:
+        status['models'] = registry.info()
+    if shadow_scorer is not None:
+        status['shadow'] = shadow_scorer.stats()
+    return jsonify(status)
+
+# Training column names and display names, in model feature order (see feature_schema.py)
+FEATURE_KEYS = SCHEMA.names
+FEATURE_NAMES = SCHEMA.display_names
+
+# Upper bound on rows accepted by /api/predict/batch in a single request
+MAX_BATCH_SIZE = int(os.getenv('ML_MAX_BATCH_SIZE', 10000))
+
+def extract_features(data):
+    """Extract the model feature vector from a request payload, validated against the feature schema"""
+    return SCHEMA.extract(data)
+
+def score(features, bundle=None, endpoint='/api/predict'):
+    """Scale a (n_samples, 8) feature matrix and return class probabilities in a single pass"""
+    bundle = bundle or current_bundle()
+    # With the compiled engine the scaler is folded into the trees and 'scale' is only the array conversion
+    with stage_timer(endpoint, 'scale'):
+        X = bundle.transform(features)
+    if not metrics.enabled:
+        return bundle.infer(X)
+    start = time.perf_counter()
+    proba = bundle.infer(X)
+    elapsed = time.perf_counter() - start
+    STAGE_LATENCY.observe(elapsed, endpoint, 'infer')
+    MODEL_LATENCY.observe(elapsed, bundle.name, 'primary')
+    return proba
+
+def record_shadow(name, bundle, proba, primary_proba, seconds):
+    """ShadowScorer callback: latency, probabilities and agreement of a shadow model with the served one"""
+    if not metrics.enabled:
+        return
+    proba, primary_proba = np.asarray(proba), np.asarray(primary_proba)
+    MODEL_LATENCY.observe(seconds, name, 'shadow')
+    MODEL_PROBABILITY.observe_many(proba[:, 1].tolist(), name, 'shadow')
+    SHADOW_DELTA.observe_many(np.abs(proba[:, 1] - primary_proba[:, 1]).tolist(), name)
+    SHADOW_DISAGREEMENTS.inc(name, amount=int(np.sum(np.argmax(proba, axis=1) != np.argmax(primary_proba, axis=1))))
+
+# Shadow models score a copy of the traffic on a background thread; ML_SHADOW_QUEUE bounds the backlog
+shadow_scorer = None
+if registry.shadows:
+    shadow_scorer = ShadowScorer(registry, record_shadow, max_queue=int(os.getenv('ML_SHADOW_QUEUE', 1000)))
+
+def observe_served(bundle, features, probas):
+    """Per-model probability distribution of served predictions, and the matrix the served model scored for the shadows"""
+    if metrics.enabled:
+        MODEL_PROBABILITY.observe_many([float(p[1]) for p in probas], bundle.name, 'primary')
+    if shadow_scorer is not None:
+        shadow_scorer.submit(features, bundle.name, probas)
+
+def score_coalesced(features, bundle):
+    # Each flushed micro-batch is one model call, so it goes through the inference pool's admission control
+    return run_score(features, bundle)
+
+# Opt-in micro-batching of concurrent /api/predict requests (see coalescer.py). A request waits at most
+# ML_COALESCE_TIMEOUT seconds for its batch.
+coalescer = None
+COALESCE_TIMEOUT = float(os.getenv('ML_COALESCE_TIMEOUT', 10))
+if os.getenv('ML_COALESCE', '').lower() in ('1', 'true', 'yes'):
+    coalescer = MicroBatcher(
+        score_coalesced,
+        max_batch_size=int(os.getenv('ML_COALESCE_MAX_BATCH', 32)),
+        max_wait_ms=float(os.getenv('ML_COALESCE_WAIT_MS', 2))
+    )
+
+# Memoized predictions keyed on the (optionally quantized) feature tuple; ML_CACHE_SIZE=0 disables it.
+# ML_CACHE_QUANTIZATION snaps features to a grid before lookup, e.g. 'bmi=0.1,fasting_glucose=1'.
+prediction_cache = None
+if int(os.getenv('ML_CACHE_SIZE', 10000)) > 0:
+    prediction_cache = PredictionCache(
+        max_size=int(os.getenv('ML_CACHE_SIZE', 10000)),
+        ttl_seconds=float(os.getenv('ML_CACHE_TTL', 600)),
+        quantization=parse_quantization(os.getenv('ML_CACHE_QUANTIZATION', ''), FEATURE_KEYS),
+        watch_files=[MODEL_PATH, SCALER_PATH, COMPILED_MODEL_PATH]
+    )
+
+# Opt-in bounded inference pool: ML_INFERENCE_THREADS model calls run at once, ML_INFERENCE_QUEUE more may
+# wait, and anything beyond that is rejected with 429 + Retry-After (see inference_executor.py)
+inference_pool = None
+if int(os.getenv('ML_INFERENCE_THREADS', 0)) > 0:
+    inference_pool = BoundedExecutor(
+        max_workers=int(os.getenv('ML_INFERENCE_THREADS')),
+        max_queue=int(os.getenv('ML_INFERENCE_QUEUE', 32)),
+        timeout=float(os.getenv('ML_INFERENCE_TIMEOUT', 10))
+    )
+
+# Opt-in prediction log: ML_PREDICTION_LOG=predictions.jsonl (or .db for SQLite). Records go to a bounded
+# in-memory buffer that a background thread writes in batches, off the request path (see prediction_log.py).
+prediction_log = None
+if os.getenv('ML_PREDICTION_LOG'):
+    prediction_log = PredictionLog(
+        os.getenv('ML_PREDICTION_LOG'),
+        FEATURE_KEYS,
+        capacity=int(os.getenv('ML_PREDICTION_LOG_CAPACITY', 10000)),
+        batch_size=int(os.getenv('ML_PREDICTION_LOG_BATCH', 500)),
+        flush_interval=float(os.getenv('ML_PREDICTION_LOG_INTERVAL', 1.0)),
+        policy=os.getenv('ML_PREDICTION_LOG_POLICY', 'drop_oldest'),
+        block_timeout=float(os.getenv('ML_PREDICTION_LOG_BLOCK_MS', 50)) / 1000
+    )
+
+def pooled(fn):
+    """fn for the inference pool; profiled there too when the request is being profiled (X-Profile)"""
+    profile = g.get('request_profile') if has_request_context() else None
+    return profile.wrap(fn) if profile is not None else fn
+
+def run_score(features, bundle, endpoint='/api/predict'):
+    """score() on the bounded inference pool when it is enabled, else on the request thread"""
+    if inference_pool is None:
+        return score(features, bundle, endpoint)
+    return inference_pool.run(pooled(score), features, bundle, endpoint)
+
+def explain(features, bundle, endpoint='/api/predict'):
+    """(base value, per-feature contributions matrix) for a raw feature matrix"""
+    with stage_timer(endpoint, 'explain'):
+        return bundle.explainer().explain(np.asarray(features, dtype=np.float64))
+
+def run_explain(features, bundle, endpoint='/api/predict'):
+    if inference_pool is None:
+        return explain(features, bundle, endpoint)
+    return inference_pool.run(pooled(explain), features, bundle, endpoint)
+
+def explain_requested(payload, default):
+    """?explain=... or an 'explain' field in the JSON body, else the endpoint default"""
+    value = request.args.get('explain')
+    if value is None and isinstance(payload, dict):
+        value = payload.get('explain')
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def format_contributions(contributions):
+    return {name: float(value) for name, value in zip(FEATURE_NAMES, contributions)}
+
+def bundle_explainer(bundle):
+    """The bundle's explainer, or None if its model cannot be explained or has more leaves than the budget"""
+    explainer = bundle.explainer()
+    if explainer is None or explainer.n_leaves > MAX_EXPLAIN_LEAVES:
+        return None
+    return explainer
+
+def explain_one(features, bundle):
+    """Explanation fields for one feature vector (cached alongside the prediction), or None if unavailable"""
+    explainer = bundle_explainer(bundle)
+    if explainer is None:
+        return None
+    if prediction_cache is None:
+        base_value, contributions = run_explain([features], bundle)
+    else:
+        # Explain the same normalized key the cached prediction was scored on
+        key = prediction_cache.key(features)
+        cached = prediction_cache.get((bundle.version, key, 'explain'))
+        if cached is None:
+            cached = run_explain([key], bundle)
+            prediction_cache.put((bundle.version, key, 'explain'), cached)
+        base_value, contributions = cached
+    return {
+        'base_value': float(base_value),
+        'contributions': format_contributions(contributions[0]),
+        'units': explainer.units,
+    }
+
+def overloaded_response(error, endpoint):
+    count_error(endpoint, error)
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def score_row(row, bundle):
+    """Probability row for one feature vector, micro-batched when coalescing is on"""
+    if coalescer is None:
+        return run_score([row], bundle)[0]
+    return coalescer.submit(list(row), bundle, timeout=COALESCE_TIMEOUT)
+
+def predict_one(features, bundle):
+    """(feature vector the model scored, probability row) for one patient, served from the cache when possible"""
+    if prediction_cache is None:
+        return features, score_row(features, bundle)
+
+    key = prediction_cache.key(features)
+    # Versioned key, so a request racing a model swap can never cache a stale prediction
+    proba = prediction_cache.get((bundle.version, key))
+    if proba is None:
+        # Score the normalized key so a cached entry never depends on which request filled it
+        proba = score_row(key, bundle)
+        prediction_cache.put((bundle.version, key), proba)
+    return key, proba
+
+def format_prediction(proba, bundle):
+    """Build the per-patient response fields from one row of predict_proba output"""
+    return {
+        'risk': int(bundle.predictor.classes_[np.argmax(proba)]),
+        'probability': float(proba[1]),
+        'confidence': float(np.max(proba))
+    }
+
+def feature_importance(bundle):
+    # HistGradientBoosting has no feature_importances_ when served through sklearn
+    importances = getattr(bundle.predictor, 'feature_importances_', None)
+    if importances is None:
+        return {}
+    return {name: float(imp) for name, imp in zip(FEATURE_NAMES, importances)}
+
+class BatchTooLarge(ValueError):
+    pass
+
+def check_batch_size(n_rows):
+    if n_rows > MAX_BATCH_SIZE:
+        raise BatchTooLarge(f'Batch size {n_rows} exceeds the maximum of {MAX_BATCH_SIZE}')
+
+def batch_features(payload):
+    """(record count, feature matrix, valid indices, per-row errors) for a row-wise or columnar batch payload"""
+    if isinstance(payload, dict) and 'columns' in payload:
+        columns = payload['columns']
+        if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+            raise ValueError("'columns' must map feature names to equal-length lists")
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All 'columns' arrays must have the same length")
+        n_rows = lengths.pop() if lengths else 0
+        check_batch_size(n_rows)
+        # Validated and converted column by column, without building per-row dicts
+        return (n_rows, *SCHEMA.extract_columns(columns, n_rows))
+
+    if isinstance(payload, dict) and 'patients' in payload:
+        payload = payload['patients']
+        if not isinstance(payload, list):
+            raise ValueError("'patients' must be a list")
+    elif not isinstance(payload, list):
+        raise ValueError("Batch payload must be a list of patients or an object with 'patients' or 'columns'")
+    check_batch_size(len(payload))
+    return (len(payload), *SCHEMA.extract_records(payload))
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
+    endpoint = '/api/predict'
+    started = time.perf_counter()
     try:
-        if not model or not scaler:
+        bundle = routed_bundle()
+        if bundle is None or not bundle.ready:
+            count_error(endpoint, 'ModelNotLoaded')
             return jsonify({'error': 'Model not loaded'}), 500
 
-        data = request.json
-        
-        # Extract features from request (matching train_model.py features)
-        age = float(data.get('age', 0))
-        bmi = float(data.get('bmi', 0))
-        bp_systolic = float(data.get('bp_systolic', 0))
-        fasting_glucose = float(data.get('fasting_glucose', 0))
-        family_history = float(data.get('familyHistory', 1)) if data.get('familyHistory') else 1.0
-        activity_level = float(data.get('activityLevel', 0)) if data.get('activityLevel') else 0.0
-        cholesterol = float(data.get('cholesterol', 200))  # default healthy level
-        years_condition = float(data.get('yearsCondition', 0))
-        
-        # Create feature array (must match training features order)
-        features = np.array([[age, bmi, bp_systolic, fasting_glucose, family_history, activity_level, cholesterol, years_condition]])
-        
-        # Scale features
-        features_scaled = scaler.transform(features)
-        
-        # Make prediction
-        prediction = model.predict(features_scaled)[0]
-        probability = model.predict_proba(features_scaled)[0][1]
+        with stage_timer(endpoint, 'parse'):
+            data = request.json
         
-        # Get feature importance
-        feature_names = ['Age', 'BMI', 'Blood Pressure', 'Fasting Glucose', 'Family History', 'Activity Level', 'Cholesterol', 'Years with Condition']
-        importances = model.feature_importances_
+        # Extract features from request
+        with stage_timer(endpoint, 'extract'):
+            features = extract_features(data)
         
-        return jsonify({
-            'risk': int(prediction),
-            'probability': float(probability),
-            'confidence': float(max(model.predict_proba(features_scaled)[0])),
-            'feature_importance': {name: float(imp) for name, imp in zip(feature_names, importances)}
-        })
+        # Scale features and make prediction
+        scored, proba = predict_one(features, bundle)
+        prediction = format_prediction(proba, bundle)
+        # Shadow models score the same (possibly quantized) row as the served model, so their deltas are comparable
+        observe_served(bundle, [scored], [proba])
+        if prediction_log is not None:
+            prediction_log.log(endpoint, bundle.version, features, prediction['probability'], prediction['risk'],
+                               (time.perf_counter() - started) * 1000)
+        response = {
+            **prediction,
+            'feature_importance': feature_importance(bundle),
+            'model': bundle.name,
+            'model_version': bundle.version
+        }
+        # Why this patient got this score: per-feature contributions on top of the model's average output
+        if explain_requested(data, EXPLAIN):
+            explanation = explain_one(features, bundle)
+            if explanation is not None:
+                response['explanation'] = explanation
+        return jsonify(response)
     
+    except Overloaded as e:
+        return overloaded_response(e, endpoint)
+    except (TimeoutError, PoolTimeoutError) as e:
+        count_error(endpoint, e)
+        return jsonify({'error': 'Prediction timed out'}), 503
+    except (ValueError, TypeError, HTTPException) as e:
+        # Malformed JSON or invalid patient record
+        count_error(endpoint, e)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
+        count_error(endpoint, e)
+        traceback.print_exc()
+        return jsonify({'error': f'Prediction failed: {e}'}), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    endpoint = '/api/predict/batch'
+    started = time.perf_counter()
+    try:
+        bundle = routed_bundle()
+    except UnknownModel as e:
+        count_error(endpoint, e)
+        return jsonify({'error': str(e)}), 400
+    if bundle is None or not bundle.ready:
+        count_error(endpoint, 'ModelNotLoaded')
+        return jsonify({'error': 'Model not loaded'}), 500
+
+    try:
+        with stage_timer(endpoint, 'parse'):
+            payload = request.json
+        # Validate every row up front so bad rows are reported without failing the batch
+        with stage_timer(endpoint, 'extract'):
+            n_records, rows, valid_index, errors = batch_features(payload)
+        explainer = bundle_explainer(bundle) if explain_requested(payload, False) else None
+        if explainer is not None and len(rows) > MAX_EXPLAIN_BATCH:
+            raise BatchTooLarge(f'Explanations are limited to {MAX_EXPLAIN_BATCH} rows per batch')
+    except BatchTooLarge as e:
+        count_error(endpoint, e)
+        return jsonify({'error': str(e)}), 413
+    except (ValueError, TypeError, HTTPException) as e:
+        count_error(endpoint, e)
         return jsonify({'error': str(e)}), 400
+    if metrics.enabled:
+        BATCH_ROWS.inc('scored', amount=len(rows))
+        BATCH_ROWS.inc('rejected', amount=len(errors))
+
+    results = []
+    if len(rows):
+        # One vectorized pass for the whole batch (sklearn from ML_SKLEARN_MIN_ROWS rows, else the compiled engine)
+        try:
+            probas = run_score(rows, bundle, endpoint)
+            if explainer is not None:
+                # Vectorized over the whole batch, like the prediction
+                base_value, contributions = run_explain(rows, bundle, endpoint)
+        except Overloaded as e:
+            return overloaded_response(e, endpoint)
+        except (TimeoutError, PoolTimeoutError) as e:
+            count_error(endpoint, e)
+            return jsonify({'error': 'Prediction timed out'}), 503
+        results = [{'index': i, **format_prediction(proba, bundle)} for i, proba in zip(valid_index, probas)]
+        observe_served(bundle, rows, probas)
+        if prediction_log is not None:
+            prediction_log.log_batch(endpoint, bundle.version, rows, [r['probability'] for r in results],
+                                     [r['risk'] for r in results], (time.perf_counter() - started) * 1000)
+        if explainer is not None:
+            for result, row in zip(results, contributions):
+                result['contributions'] = format_contributions(row)
+
+    response = {
+        'count': n_records,
+        'results': results,
+        'errors': errors,
+        'feature_importance': feature_importance(bundle),
+        'model': bundle.name,
+        'model_version': bundle.version
+    }
+    if explainer is not None:
+        response['explanation'] = {'base_value': float(explainer.base_value), 'units': explainer.units}
+    return jsonify(response)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (ML_METRICS=0)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profile', methods=['GET'])
+def admin_profile():
+    """Sample request stacks for ?seconds=N and return them as a collapsed-stack (flamegraph) file"""
+    if not PROFILING:
+        return jsonify({'error': 'Profiling is disabled (set ML_PROFILING=1)'}), 404
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', 5))
+    except ValueError:
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval_ms < 1:
+        return jsonify({'error': f'seconds must be in (0, {MAX_PROFILE_SECONDS}] and interval_ms >= 1'}), 400
+
+    result = profiler.sample_stacks(seconds, interval_ms, all_threads=request.args.get('threads') == 'all')
+    if result is None:
+        return jsonify({'error': 'A profile is already being recorded'}), 409
+    stacks, passes = result
+    return Response(stacks, mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename="ml-server-{os.getpid()}.folded"',
+        'X-Profile-Pid': str(os.getpid()),
+        'X-Profile-Passes': str(passes),
+    })
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    # ?model=<name> reloads one of the ML_MODELS models instead of the default one
+    name = request.args.get('model', DEFAULT_MODEL)
+    if name not in registry.names:
+        return jsonify({'error': f"Unknown model '{name}'"}), 404
+    manager = registry.manager(name)
+    bundle = current_bundle(name)
+    if request.method == 'GET':
+        return jsonify({'model': bundle.info() if bundle else None, 'last_reload': manager.last_reload})
+
+    # Load + warm the new bundle in the background; pass ?wait=1 to block until it is swapped in
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    if not manager.reload(wait=wait):
+        return jsonify({'error': 'A reload is already in progress'}), 409
+    if wait:
+        return jsonify({'model': manager.current().info(), 'last_reload': manager.last_reload})
+    return jsonify({'status': 'reloading', 'version': bundle.version if bundle else None}), 202
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', os.getenv('ML_PORT', 3002)))
@@ -0,0 +1,252 @@
+"""
+Latency and throughput benchmark suite for the ML server
+
+Measures, and writes to one JSON file so runs can be compared:
+
+    load   cold-start load time and RSS of diabetes_risk_model.pkl (and the mmap artifact)
+    batch  scaler.transform + predict_proba latency at batch sizes 1 to 100k for the
+           RF and GB models saved by train_model.py (sklearn and compiled engine)
+    explain  latency of per-prediction feature contributions (explain.py) at batch
+           sizes 1 to 1000, i.e. what ?explain=1 adds to a request
+    http   end-to-end /api/predict p50/p95/p99 latency and throughput against a
+           locally started app.py
+
+Usage:
+    python benchmark.py                                  # everything -> benchmark_results.json
+    python benchmark.py --suites batch --output after.json
+    python benchmark.py --compare before.json            # exits 1 on regressions
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+import sklearn
+
+from benchmark_engine import MODEL_FILES, load_inputs
+from explain import TreeExplainer
+from inference_engine import compile_model, file_sha256
+from load_test import format_result, free_port, run_load, wait_until_ready
+from measure_startup import run_scenario
+from model_manager import bundle_version
+
+SUITES = ['load', 'batch', 'explain', 'http']
+BATCH_SIZES = [1, 10, 100, 1000, 10_000, 100_000]
+EXPLAIN_BATCH_SIZES = [1, 10, 100, 1000]
+
+# Each batch measurement repeats until this much time is spent (at least MIN_REPEAT times)
+TIME_BUDGET_S = 1.0
+MIN_REPEAT = 3
+MAX_REPEAT = 200
+
+
+def time_calls(fn):
+    """Per-call latencies in ms, repeated within TIME_BUDGET_S"""
+    fn()  # warm-up
+    timings = []
+    deadline = time.perf_counter() + TIME_BUDGET_S
+    while len(timings) < MIN_REPEAT or (time.perf_counter() < deadline and len(timings) < MAX_REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.asarray(timings)
+
+
+def bench_load(repeat):
+    results = {'model_size_kb': os.path.getsize('diabetes_risk_model.pkl') / 1024}
+    for scenario in ('pickle', 'mmap'):
+        try:
+            results[scenario] = run_scenario(scenario, repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️ {scenario}: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        r = results[scenario]
+        print(f"{scenario:>8} | load {r['load_ms']:8.1f} ms | first prediction {r['first_prediction_ms']:8.2f} ms | "
+              f"RSS +{r['rss_added_mb']:6.1f} MB")
+    return results
+
+
+def bench_batch(batch_sizes):
+    scaler = joblib.load('scaler.pkl')
+    X = load_inputs(max(batch_sizes))
+    results = {}
+    for name, path in MODEL_FILES.items():
+        model = joblib.load(path)
+        engine = compile_model(model, scaler)
+        paths = {
+            'sklearn': lambda batch: model.predict_proba(scaler.transform(batch)),
+            'compiled': engine.predict_proba,
+        }
+        print(f"\n{name} ({engine.n_trees} trees)")
+        results[name] = {}
+        for engine_name, predict in paths.items():
+            results[name][engine_name] = {}
+            for size in batch_sizes:
+                batch = X[:size]
+                timings = time_calls(lambda: predict(batch))
+                median = float(np.median(timings))
+                results[name][engine_name][str(size)] = {
+                    'median_ms': median,
+                    'p95_ms': float(np.percentile(timings, 95)),
+                    'rows_per_s': size / (median / 1000),
+                    'repeat': len(timings),
+                }
+                print(f"{engine_name:>9} | {size:>7} rows | median {median:10.3f} ms | {size / (median / 1000):12,.0f} rows/s")
+    return results
+
+
+def bench_explain(batch_sizes):
+    scaler = joblib.load('scaler.pkl')
+    X = load_inputs(max(batch_sizes))
+    results = {}
+    for name, path in MODEL_FILES.items():
+        start = time.perf_counter()
+        explainer = TreeExplainer(compile_model(joblib.load(path), scaler))
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"\n{name} ({explainer.n_leaves} leaves, explainer built in {build_ms:.0f} ms)")
+        results[name] = {'build_ms': build_ms}
+        for size in batch_sizes:
+            batch = X[:size]
+            timings = time_calls(lambda: explainer.contributions(batch))
+            median = float(np.median(timings))
+            results[name][str(size)] = {
+                'median_ms': median,
+                'p95_ms': float(np.percentile(timings, 95)),
+                'rows_per_s': size / (median / 1000),
+                'repeat': len(timings),
+            }
+            print(f"{size:>7} rows | median {median:10.3f} ms | {size / (median / 1000):12,.0f} rows/s")
+    return results
+
+
+def bench_http(clients, duration, url=None):
+    if url:
+        from urllib.parse import urlparse
+        target = urlparse(url)
+        result = run_load(target.hostname, target.port or 80, clients, duration)
+    else:
+        port = free_port()
+        # Disable the prediction cache so every request reaches the model
+        env = dict(os.environ, PORT=str(port), ML_CACHE_SIZE='0')
+        server = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready('127.0.0.1', port)
+            result = run_load('127.0.0.1', port, clients, duration)
+        finally:
+            server.terminate()
+            server.wait()
+    result.update(clients=clients, duration_s=duration, url=url or 'app.py')
+    print(format_result(result))
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': commit or None,
+        'model_version': bundle_version([file_sha256('diabetes_risk_model.pkl'), file_sha256('scaler.pkl')]),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': multiprocessing.cpu_count(),
+    }
+
+
+def flatten(results, prefix=''):
+    """{'batch.Random Forest.sklearn.1.median_ms': 21.5, ...} for the numeric leaves"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """Print metrics that got worse by more than threshold (fraction); returns their count"""
+    # Only timings and rates are compared; higher is better for rates
+    lower_better = ('_ms', '_mb', '_kb')
+    higher_better = ('_rps', 'rows_per_s')
+    now, before = flatten(current['results']), flatten(baseline['results'])
+    regressions = 0
+    print("\n" + "="*60)
+    print(f"COMPARED TO {baseline['environment'].get('git_commit')} ({baseline['environment'].get('timestamp')})")
+    print("="*60)
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if not old:
+            continue
+        if name.endswith(lower_better):
+            change = new / old - 1
+        elif name.endswith(higher_better):
+            change = old / new - 1 if new else float('inf')
+        else:
+            continue
+        if change > threshold:
+            regressions += 1
+            print(f"❌ {name}: {old:.3f} -> {new:.3f} ({change:+.0%} worse)")
+    if not regressions:
+        print(f"✅ No regressions above {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suites', default=','.join(SUITES), help='comma-separated subset of: ' + ', '.join(SUITES))
+    parser.add_argument('--batch-sizes', default=','.join(map(str, BATCH_SIZES)), help='comma-separated batch sizes')
+    parser.add_argument('--load-repeat', type=int, default=5, help='fresh interpreters per load scenario')
+    parser.add_argument('--clients', type=int, default=multiprocessing.cpu_count(), help='HTTP client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of HTTP load')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting app.py')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the results')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+    suites = [s.strip() for s in args.suites.split(',') if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    report = {'environment': environment(), 'results': {}}
+    if 'load' in suites:
+        print("="*60 + "\nMODEL LOAD\n" + "="*60)
+        report['results']['load'] = bench_load(args.load_repeat)
+    if 'batch' in suites:
+        print("\n" + "="*60 + "\nBATCH LATENCY (scaler.transform + predict_proba)\n" + "="*60)
+        report['results']['batch'] = bench_batch([int(s) for s in args.batch_sizes.split(',')])
+    if 'explain' in suites:
+        print("\n" + "="*60 + "\nEXPLANATIONS (per-prediction feature contributions)\n" + "="*60)
+        report['results']['explain'] = bench_explain(EXPLAIN_BATCH_SIZES)
+    if 'http' in suites:
+        print("\n" + "="*60 + f"\nHTTP /api/predict ({args.clients} clients, {args.duration:.0f}s)\n" + "="*60)
+        report['results']['http'] = bench_http(args.clients, args.duration, args.url)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
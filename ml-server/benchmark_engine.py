@@ -0,0 +1,100 @@
+"""
+Parity check and latency benchmark for the compiled inference engine
+
+Verifies that inference_engine.CompiledEnsemble reproduces sklearn's
+scaler.transform + predict_proba output for the saved models, then compares
+per-request (single row) and batch latency of both paths.
+
+Usage:
+    python benchmark_engine.py [--rows 5000] [--repeat 200]
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_schema import FEATURE_COLUMNS
+from inference_engine import compile_model
+
+# Per-family models saved by train_model.py (families missing from the search space are skipped)
+MODEL_FILES = {
+    'Random Forest': 'diabetes_risk_model_rf.pkl',
+    'Gradient Boosting': 'diabetes_risk_model_gb.pkl',
+    'Hist Gradient Boosting': 'diabetes_risk_model_hgb.pkl',
+}
+
+# Maximum allowed absolute difference between sklearn and compiled probabilities
+TOLERANCE = 1e-9
+
+
+def load_inputs(n_rows, seed=0):
+    """Training rows plus jittered and rounded copies, so inputs land on and around split thresholds"""
+    X = pd.read_csv('medical_data.csv')[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    jittered = X + rng.normal(0, 3, X.shape)
+    X = np.vstack([X, jittered, np.round(jittered)])
+    return X[rng.integers(0, len(X), n_rows)]
+
+
+def median_latency_us(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000, help='rows used for the parity check and batch timing')
+    parser.add_argument('--repeat', type=int, default=200, help='timed repetitions per measurement')
+    args = parser.parse_args()
+
+    scaler = joblib.load('scaler.pkl')
+    X = load_inputs(args.rows)
+    failed = False
+
+    for name, path in MODEL_FILES.items():
+        if not os.path.exists(path):
+            print(f"\n⏭️ {name}: {path} not found")
+            continue
+        model = joblib.load(path)
+        start = time.perf_counter()
+        engine = compile_model(model, scaler)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        print("\n" + "="*60)
+        print(f"{name.upper()} ({engine.n_trees} trees, {engine.n_nodes} nodes, compiled in {compile_ms:.1f} ms)")
+        print("="*60)
+
+        # Parity
+        expected = model.predict_proba(scaler.transform(X))
+        actual = engine.predict_proba(X)
+        max_diff = float(np.abs(expected - actual).max())
+        same_class = float((model.predict(scaler.transform(X)) == engine.predict(X)).mean())
+        ok = max_diff <= TOLERANCE and same_class == 1.0
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} Parity on {len(X)} rows: max |Δp| = {max_diff:.2e}, class agreement = {same_class:.2%}")
+
+        # Latency
+        row = X[:1]
+        sk_single = median_latency_us(lambda: model.predict_proba(scaler.transform(row)), max(args.repeat // 10, 5))
+        cm_single = median_latency_us(lambda: engine.predict_proba(row), args.repeat)
+        batch = X[:1000]
+        sk_batch = median_latency_us(lambda: model.predict_proba(scaler.transform(batch)), max(args.repeat // 20, 3))
+        cm_batch = median_latency_us(lambda: engine.predict_proba(batch), max(args.repeat // 20, 3))
+
+        print(f"Single row : sklearn {sk_single:10.1f} µs | compiled {cm_single:10.1f} µs | {sk_single / cm_single:6.1f}x")
+        print(f"1000 rows  : sklearn {sk_batch:10.1f} µs | compiled {cm_batch:10.1f} µs | {sk_batch / cm_batch:6.1f}x")
+
+    if failed:
+        raise SystemExit("❌ Compiled engine does not match sklearn output")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Offline bulk scoring of whole patient files
+
+Streams a CSV (or the columnar cache written by the data scripts) in chunks,
+validates and maps every chunk with the same feature schema as /api/predict, scores
+the chunks in a pool of worker processes and appends the results to the output
+CSV in input order. Only a few chunks are in flight at any time, so memory stays
+bounded regardless of the file size.
+
+Input columns may use the API field names (familyHistory, activityLevel,
+yearsCondition, ...) or the training column names (family_history, ...).
+
+Usage:
+    python bulk_score.py patients.csv --output scores.csv
+    python bulk_score.py big.csv --chunksize 200000 --n-jobs 8 --id-column patient_id
+"""
+
+import argparse
+import collections
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loading import iter_frames
+from feature_schema import SCHEMA
+from model_manager import load_bundle
+
+MODEL_PATH = 'diabetes_risk_model.pkl'
+SCALER_PATH = 'scaler.pkl'
+COMPILED_MODEL_PATH = 'diabetes_risk_model_compiled.joblib'
+
+PROGRESS_INTERVAL = 5.0
+
+# Model bundle of this worker process, loaded once by init_worker
+_bundle = None
+
+
+def init_worker(model_path, scaler_path, compiled_path, use_engine):
+    global _bundle
+    # Parallelism comes from the worker processes; keep each model single-threaded
+    _bundle = load_bundle(model_path, scaler_path, compiled_path, use_engine, log=lambda message: None, n_jobs=1)
+
+
+def score_chunk(task):
+    """Worker: score one chunk and return (rows, invalid rows, CSV text of the results)"""
+    start, chunk, id_column = task
+    # Same schema validation and defaults as /api/predict, vectorized per column
+    X, valid_index, errors = SCHEMA.extract_columns(chunk, len(chunk))
+    invalid = np.ones(len(chunk), dtype=bool)
+    invalid[valid_index] = False
+
+    proba = np.full((len(chunk), 2), np.nan)
+    if len(valid_index):
+        proba[valid_index] = _bundle.predict_proba(X)
+    classes = np.asarray(_bundle.predictor.classes_)
+    messages = np.full(len(chunk), '', dtype=object)
+    for error in errors:
+        messages[error['index']] = error['error']
+
+    results = pd.DataFrame({'row': np.arange(start, start + len(chunk))})
+    if id_column:
+        results.insert(0, id_column, chunk[id_column].to_numpy())
+    risk = pd.array(classes[np.argmax(np.nan_to_num(proba), axis=1)], dtype='Int64')
+    risk[invalid] = pd.NA
+    results['risk'] = risk
+    results['probability'] = proba[:, 1]
+    results['confidence'] = proba.max(axis=1)
+    results['error'] = messages
+    return len(chunk), int(invalid.sum()), results.to_csv(index=False, header=False)
+
+
+def score_file(input_path, output_path, chunksize=100_000, n_jobs=-1, id_column=None,
+               model_path=MODEL_PATH, scaler_path=SCALER_PATH, compiled_path=COMPILED_MODEL_PATH, use_engine=False):
+    """Score input_path into output_path; returns (rows, invalid rows, seconds)"""
+    n_jobs = multiprocessing.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    init_args = (model_path, scaler_path, compiled_path, use_engine)
+    header = ([id_column] if id_column else []) + ['row', 'risk', 'probability', 'confidence', 'error']
+
+    rows = invalid = 0
+    started = last_report = time.perf_counter()
+
+    def write(result, out):
+        nonlocal rows, invalid, last_report
+        n, n_invalid, text = result
+        out.write(text)
+        rows += n
+        invalid += n_invalid
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            print(f"   {rows:,} rows scored ({rows / (now - started):,.0f} rows/s)")
+            last_report = now
+
+    def tasks():
+        start = 0
+        for chunk in iter_frames(input_path, chunksize):
+            if id_column and id_column not in chunk:
+                raise ValueError(f"Column '{id_column}' not found in {input_path}")
+            yield start, chunk, id_column
+            start += len(chunk)
+
+    with open(output_path, 'w', newline='') as out:
+        out.write(','.join(header) + '\n')
+        if n_jobs == 1:
+            init_worker(*init_args)
+            for task in tasks():
+                write(score_chunk(task), out)
+        else:
+            with multiprocessing.Pool(n_jobs, initializer=init_worker, initargs=init_args) as pool:
+                # Bounded window of chunks in flight; results are written in input order
+                pending = collections.deque()
+                for task in tasks():
+                    pending.append(pool.apply_async(score_chunk, (task,)))
+                    if len(pending) >= 2 * n_jobs:
+                        write(pending.popleft().get(), out)
+                while pending:
+                    write(pending.popleft().get(), out)
+
+    return rows, invalid, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='patient CSV (or its .columns cache directory)')
+    parser.add_argument('--output', help='results CSV (default: <input>_scores.csv)')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='rows per chunk')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='scoring processes (-1 = all cores)')
+    parser.add_argument('--id-column', help='input column copied to the output to identify rows')
+    # sklearn's vectorized predict_proba wins on large chunks; the compiled engine is tuned for single rows
+    parser.add_argument('--engine', choices=['compiled', 'sklearn'], default='sklearn',
+                        help='inference path (default: sklearn, fastest for large chunks)')
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input.rstrip(os.sep))[0] + '_scores.csv'
+    print(f"📊 Scoring {args.input} -> {output}")
+    rows, invalid, elapsed = score_file(
+        args.input, output, chunksize=args.chunksize, n_jobs=args.n_jobs,
+        id_column=args.id_column, use_engine=args.engine == 'compiled'
+    )
+    print(f"✅ Scored {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    if invalid:
+        print(f"⚠️ {invalid:,} rows had invalid feature values (see the 'error' column)")
+
+
+if __name__ == '__main__':
+    main()
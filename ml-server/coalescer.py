@@ -0,0 +1,132 @@
+"""
+Micro-batching request coalescer
+
+Single-patient prediction requests are queued for a short window (up to
+max_wait_ms or max_batch_size requests, whichever comes first), scored together
+as one feature matrix and the results are handed back to the waiting request
+threads. Trades a couple of milliseconds of latency for far fewer model calls
+under bursty load.
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ('features', 'context', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, features, context):
+        self.features = features
+        self.context = context
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into batched score_fn(features, context) calls
+
+    Requests submitted with different contexts (e.g. different model bundles) are never
+    scored together.
+    """
+
+    def __init__(self, score_fn, max_batch_size=32, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stats = {
+            'requests': 0,
+            'batches': 0,
+            'errors': 0,
+            'max_batch_size_seen': 0,
+            'total_wait_s': 0.0,
+            'max_wait_s': 0.0,
+        }
+        self._start()
+
+    def _start(self):
+        # Threads do not survive fork(), so a pre-fork server worker starts its own batcher thread
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, args=(self._queue,), name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, features, context=None, timeout=None):
+        """Queue one feature vector and block until its probability row is ready"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+        pending = _Pending(features, context)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError('Timed out waiting for batched prediction')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self, pending_queue):
+        """Block for the first request, then gather more until the batch is full or the window closes"""
+        batch = [pending_queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = pending_queue.get(timeout=remaining) if remaining > 0 else pending_queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self, pending_queue):
+        while True:
+            batch = self._collect(pending_queue)
+            started = time.perf_counter()
+            for context, group in itertools.groupby(batch, key=lambda p: p.context):
+                group = list(group)
+                try:
+                    probas = self.score_fn(np.array([p.features for p in group], dtype=np.float64), context)
+                    for pending, proba in zip(group, probas):
+                        pending.result = proba
+                except Exception as e:
+                    for pending in group:
+                        pending.error = e
+            self._record(batch, started)
+            for pending in batch:
+                pending.done.set()
+
+    def _record(self, batch, started):
+        waits = [started - p.enqueued_at for p in batch]
+        with self._lock:
+            stats = self._stats
+            stats['requests'] += len(batch)
+            stats['batches'] += 1
+            stats['errors'] += sum(p.error is not None for p in batch)
+            stats['max_batch_size_seen'] = max(stats['max_batch_size_seen'], len(batch))
+            stats['total_wait_s'] += sum(waits)
+            stats['max_wait_s'] = max(stats['max_wait_s'], max(waits))
+
+    def metrics(self):
+        """Queue depth, batch size and wait time statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+        requests, batches = stats['requests'], stats['batches']
+        return {
+            'queue_depth': self._queue.qsize(),
+            'requests': requests,
+            'batches': batches,
+            'errors': stats['errors'],
+            'avg_batch_size': requests / batches if batches else 0.0,
+            'max_batch_size': stats['max_batch_size_seen'],
+            'avg_wait_ms': stats['total_wait_s'] / requests * 1000 if requests else 0.0,
+            'max_wait_ms': stats['max_wait_s'] * 1000,
+            'config': {'max_batch_size': self.max_batch_size, 'max_wait_ms': self.max_wait * 1000},
+        }
@@ -0,0 +1,270 @@
+"""
+Streaming, chunked ingestion of large training CSVs
+
+Reads the CSV in fixed-size chunks with compact dtypes, assigns every row to the
+train or test split as it streams past, accumulates the StandardScaler statistics
+incrementally (partial_fit on training rows only) and keeps a bounded uniform
+reservoir sample of each split for fitting the tree ensembles. Peak memory is
+one chunk plus the reservoirs, independent of the file size.
+
+Columnar cache: next to medical_data.csv the preparation scripts also write
+medical_data.columns/, one raw typed binary file per column plus a manifest with
+the CSV's sha256. Readers memory-map the columns directly (no text parsing, no
+dtype inference) and only fall back to the CSV when the manifest no longer
+matches it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+# Column names, order and storage dtypes come from the shared feature schema
+from feature_schema import COLUMN_DTYPES, FEATURE_COLUMNS, TARGET_COLUMN
+
+
+# ============================================
+# COLUMNAR CACHE
+# ============================================
+
+MANIFEST_NAME = 'manifest.json'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def columnar_path(csv_path):
+    """medical_data.csv -> medical_data.columns"""
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def csv_sha256(csv_path):
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def columnar_is_fresh(csv_path, manifest=None):
+    """True if the columnar cache was written from the current contents of csv_path"""
+    manifest = manifest or _read_manifest(columnar_path(csv_path))
+    if manifest is None:
+        return False
+    if not os.path.exists(csv_path):
+        # Binary-only dataset (or cache shipped without its CSV): nothing to be stale against
+        return True
+    stat = os.stat(csv_path)
+    if stat.st_size != manifest['source_size']:
+        return False
+    if stat.st_mtime_ns == manifest['source_mtime_ns']:
+        return True
+    # Touched or copied: only the content hash decides
+    return csv_sha256(csv_path) == manifest['source_sha256']
+
+
+class ColumnarWriter:
+    """Appends DataFrame chunks to the columnar cache of csv_path
+
+    Columns are written to a temporary directory that replaces the old cache in one
+    rename on commit(), so readers never see a half-written cache.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.cache_dir = columnar_path(csv_path)
+        self.tmp_dir = f"{self.cache_dir}.tmp{os.getpid()}"
+        self.columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+        self.rows = 0
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.files = {col: open(os.path.join(self.tmp_dir, f"{col}.bin"), 'wb') for col in self.columns}
+
+    def append(self, chunk):
+        for col in self.columns:
+            self.files[col].write(np.ascontiguousarray(chunk[col].to_numpy(dtype=COLUMN_DTYPES[col])).tobytes())
+        self.rows += len(chunk)
+
+    def _close_files(self):
+        for f in self.files.values():
+            f.close()
+
+    def commit(self, source_sha256=None):
+        """Finish the cache; source_sha256 of the CSV is computed if not given (None without a CSV)"""
+        self._close_files()
+        manifest = {
+            'rows': self.rows,
+            'columns': {col: np.dtype(COLUMN_DTYPES[col]).str for col in self.columns},
+            'source_sha256': None,
+            'source_size': None,
+            'source_mtime_ns': None,
+        }
+        if os.path.exists(self.csv_path):
+            stat = os.stat(self.csv_path)
+            manifest.update(
+                source_sha256=source_sha256 or csv_sha256(self.csv_path),
+                source_size=stat.st_size,
+                source_mtime_ns=stat.st_mtime_ns,
+            )
+        with open(os.path.join(self.tmp_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.cache_dir)
+        print(f"✅ Columnar cache written to {self.cache_dir} ({self.rows} rows)")
+        return self.cache_dir
+
+    def abort(self):
+        self._close_files()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def write_columnar(csv_path, data=None, chunksize=100_000):
+    """Write the columnar cache for csv_path, from an in-memory DataFrame or by streaming the CSV"""
+    writer = ColumnarWriter(csv_path)
+    try:
+        chunks = [data] if data is not None else pd.read_csv(
+            csv_path, usecols=writer.columns, dtype=COLUMN_DTYPES, chunksize=chunksize
+        )
+        for chunk in chunks:
+            writer.append(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+def load_columnar(csv_path):
+    """Memory-map the cached columns of csv_path as {column: read-only array}; None if missing or stale"""
+    cache_dir = columnar_path(csv_path)
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or not columnar_is_fresh(csv_path, manifest):
+        return None
+    rows = manifest['rows']
+    columns = {}
+    for col, dtype in manifest['columns'].items():
+        if rows == 0:
+            columns[col] = np.empty(0, dtype=dtype)
+        else:
+            columns[col] = np.memmap(os.path.join(cache_dir, f"{col}.bin"), dtype=dtype, mode='r', shape=(rows,))
+    return columns
+
+
+def load_dataset(csv_path):
+    """DataFrame of csv_path, read from the columnar cache when it is fresh
+
+    Falls back to parsing the CSV (and refreshes the cache from it) when the cache
+    is missing or stale. Returns None if neither exists.
+    """
+    columns = load_columnar(csv_path)
+    if columns is not None:
+        print(f"✅ Loaded data from {columnar_path(csv_path)} (columnar cache)")
+        return pd.DataFrame(columns, copy=False)
+    if not os.path.exists(csv_path):
+        return None
+    # Same compact dtypes as the cache, so a run from the CSV and from the cache train identically
+    data = pd.read_csv(csv_path, dtype=COLUMN_DTYPES)
+    print(f"✅ Loaded data from {csv_path}")
+    if all(col in data.columns for col in FEATURE_COLUMNS + [TARGET_COLUMN]):
+        write_columnar(csv_path, data)
+    return data
+
+
+# ============================================
+# CHUNKED INGESTION
+# ============================================
+
+def iter_frames(filepath, chunksize=100_000):
+    """Yield DataFrame chunks of a CSV, or of its columnar cache when fresh (path may also be the .columns dir)"""
+    if os.path.isdir(filepath) and filepath.rstrip(os.sep).endswith('.columns'):
+        filepath = filepath.rstrip(os.sep)[:-len('.columns')] + '.csv'
+    columns = load_columnar(filepath)
+    if columns is not None:
+        for start in range(0, len(columns[TARGET_COLUMN]), chunksize):
+            yield pd.DataFrame({col: values[start:start + chunksize] for col, values in columns.items()}, copy=False)
+        return
+    yield from pd.read_csv(filepath, chunksize=chunksize)
+
+
+def iter_chunks(filepath, chunksize=100_000):
+    """Yield (X float32 [n, 8], y uint8 [n]) chunks without ever holding the whole file"""
+    columns = load_columnar(filepath)
+    if columns is not None:
+        # Slices of the memory-mapped columns: no parsing, pages are read on demand
+        for start in range(0, len(columns[TARGET_COLUMN]), chunksize):
+            X = np.column_stack([columns[col][start:start + chunksize] for col in FEATURE_COLUMNS]).astype(np.float32, copy=False)
+            yield X, np.asarray(columns[TARGET_COLUMN][start:start + chunksize])
+        return
+    reader = pd.read_csv(filepath, usecols=FEATURE_COLUMNS + [TARGET_COLUMN], dtype=COLUMN_DTYPES, chunksize=chunksize)
+    for chunk in reader:
+        yield chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float32), chunk[TARGET_COLUMN].to_numpy(dtype=np.uint8)
+
+
+class Reservoir:
+    """Uniform fixed-size sample over a stream of row blocks (vectorized reservoir sampling)"""
+
+    def __init__(self, capacity, n_features, rng):
+        self.capacity = int(capacity)
+        self.X = np.empty((self.capacity, n_features), dtype=np.float32)
+        self.y = np.empty(self.capacity, dtype=np.uint8)
+        self.seen = 0
+        self.rng = rng
+
+    def add(self, X, y):
+        n = len(X)
+        fill = min(max(self.capacity - self.seen, 0), n)
+        if fill:
+            self.X[self.seen:self.seen + fill] = X[:fill]
+            self.y[self.seen:self.seen + fill] = y[:fill]
+        if fill < n:
+            # Row t (0-based stream position) replaces a random slot with probability capacity / (t + 1)
+            positions = np.arange(self.seen + fill, self.seen + n)
+            slots = self.rng.integers(0, positions + 1)
+            keep = slots < self.capacity
+            self.X[slots[keep]] = X[fill:][keep]
+            self.y[slots[keep]] = y[fill:][keep]
+        self.seen += n
+
+    def sample(self):
+        size = min(self.seen, self.capacity)
+        return self.X[:size], self.y[:size]
+
+
+def load_chunked(filepath, chunksize=100_000, max_train_rows=500_000, test_size=0.2, seed=42):
+    """Stream the CSV once; return (X_train, X_test, y_train, y_test, scaler) with bounded memory
+
+    The scaler is fitted on every training row of the file (not just the sample), while the
+    returned arrays are uniform samples of at most max_train_rows (and a proportional test set).
+    """
+    rng = np.random.default_rng(seed)
+    n_features = len(FEATURE_COLUMNS)
+    max_test_rows = max(1, int(max_train_rows * test_size / (1 - test_size)))
+    train = Reservoir(max_train_rows, n_features, rng)
+    test = Reservoir(max_test_rows, n_features, rng)
+    scaler = StandardScaler()
+
+    for X, y in iter_chunks(filepath, chunksize):
+        is_test = rng.random(len(X)) < test_size
+        scaler.partial_fit(X[~is_test])
+        train.add(X[~is_test], y[~is_test])
+        test.add(X[is_test], y[is_test])
+
+    if train.seen == 0:
+        raise ValueError(f"No training rows found in {filepath}")
+
+    X_train, y_train = train.sample()
+    X_test, y_test = test.sample()
+    print(f"✅ Streamed {train.seen + test.seen} rows from {filepath} in chunks of {chunksize}")
+    if train.seen > len(X_train):
+        print(f"   Training on a uniform sample of {len(X_train)} / {train.seen} rows (scaler uses all of them)")
+    return X_train, X_test, y_train, y_test, scaler
@@ -7,11 +7,16 @@ import pandas as pd
 import numpy as np
 import urllib.request
 import os
+from data_loading import write_columnar
+from synthetic_data import generate_dataset
 
 print("="*60)
 print("DOWNLOADING REAL PIMA INDIANS DIABETES DATASET")
 print("="*60)
 
+# Seed for the features the Pima dataset lacks (drawn like synthetic_data.py, so reruns give the same CSV)
+SEED = 42
+
 url = "https://raw.githubusercontent.com/jbrownlee/Datasets/master/pima-indians-diabetes.data.csv"
 
 column_names = [
@@ -37,20 +42,22 @@ try:
     print(f"✅ After cleaning: {len(df)} valid records")
     
     # Map to our model features
+    rng = np.random.default_rng(SEED)
     df_prepared = pd.DataFrame({
         'age': df['age'].astype(int),
         'bmi': df['bmi'].round(2),
         'bp_systolic': df['blood_pressure'].astype(int),
         'fasting_glucose': df['glucose'].astype(int),
         'family_history': (df['diabetes_pedigree_function'] > df['diabetes_pedigree_function'].median()).astype(int),
-        'activity_level': np.random.choice([0, 1, 2, 3], len(df), p=[0.3, 0.3, 0.25, 0.15]),
-        'cholesterol': np.random.normal(200, 40, len(df)).clip(100, 400),
-        'years_condition': np.random.exponential(3, len(df)).clip(0, 30),
+        'activity_level': rng.choice([0, 1, 2, 3], len(df), p=[0.3, 0.3, 0.25, 0.15]),
+        'cholesterol': rng.normal(200, 40, len(df)).clip(100, 400),
+        'years_condition': rng.exponential(3, len(df)).clip(0, 30),
         'diabetes_risk': df['diabetes'].astype(int)
     })
     
     # Save to CSV
     df_prepared.to_csv('medical_data.csv', index=False)
+    write_columnar('medical_data.csv', df_prepared)
     print(f"\n✅ Dataset saved to medical_data.csv")
     
     print("\n📊 Dataset Statistics:")
@@ -72,34 +79,9 @@ except Exception as e:
     # Backup: Create synthetic data if download fails
     print("\n📊 Creating realistic synthetic dataset as backup...")
     
-    np.random.seed(42)
-    n_samples = 2000
-    
-    data = pd.DataFrame({
-        'age': np.random.normal(52, 15, n_samples).clip(18, 85).astype(int),
-        'bmi': np.random.normal(27, 5, n_samples).clip(15, 50),
-        'bp_systolic': np.random.normal(125, 20, n_samples).clip(80, 200).astype(int),
-        'fasting_glucose': np.random.normal(108, 35, n_samples).clip(60, 300).astype(int),
-        'family_history': np.random.binomial(1, 0.4, n_samples),
-        'activity_level': np.random.choice([0, 1, 2, 3], n_samples, p=[0.35, 0.3, 0.25, 0.1]),
-        'cholesterol': np.random.normal(205, 45, n_samples).clip(100, 400),
-        'years_condition': np.random.exponential(3, n_samples).clip(0, 30),
-    })
-    
-    risk_score = (
-        (data['age'] > 45) * 15 +
-        (data['bmi'] > 25) * 20 +
-        (data['bmi'] > 30) * 15 +
-        (data['bp_systolic'] > 130) * 20 +
-        (data['fasting_glucose'] > 100) * 25 +
-        (data['fasting_glucose'] > 125) * 25 +
-        (data['family_history'] == 1) * 20 +
-        (data['activity_level'] == 0) * 15 +
-        (data['cholesterol'] > 240) * 10
-    )
-    
-    data['diabetes_risk'] = (risk_score > 50).astype(int)
+    data = generate_dataset(2000, profile='backup')
     data.to_csv('medical_data.csv', index=False)
+    write_columnar('medical_data.csv', data)
     
     print(f"✅ Synthetic dataset created with {len(data)} records")
     print("Run: python train_model.py")
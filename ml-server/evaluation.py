@@ -0,0 +1,105 @@
+"""
+Model evaluation from one probability pass
+
+Every metric train_model.py reports (accuracy, ROC-AUC, log loss, Brier score,
+confusion matrix, classification report) is computed with sklearn.metrics from a
+single predict_proba call per model and split: the predicted labels are the
+argmax of the probabilities, which is what model.predict and model.score would
+compute with a second and third pass.
+
+write_report() saves the evaluation, cross-validation results and timings of a
+training run as JSON.
+"""
+
+import json
+import time
+
+import numpy as np
+
+
+def scores(y_true, proba, classes):
+    """Scalar metrics of one split from its (n_samples, n_classes) predict_proba output"""
+    from sklearn.metrics import accuracy_score, brier_score_loss, log_loss, roc_auc_score
+
+    classes = np.asarray(classes)
+    proba = np.asarray(proba, dtype=np.float64)
+    result = {
+        'accuracy': float(accuracy_score(y_true, classes[np.argmax(proba, axis=1)])),
+        'log_loss': float(log_loss(y_true, proba, labels=classes)),
+    }
+    if len(classes) == 2:
+        result['roc_auc'] = float(roc_auc_score(y_true, proba[:, 1]))
+        result['brier'] = float(brier_score_loss(y_true, proba[:, 1], pos_label=classes[1]))
+    return result
+
+
+def classification_metrics(y_true, proba, classes):
+    """scores() plus the confusion matrix and classification report (as a dict and as text)"""
+    from sklearn.metrics import classification_report, confusion_matrix
+
+    classes = np.asarray(classes)
+    pred = classes[np.argmax(proba, axis=1)]
+    return {
+        'n': int(len(pred)),
+        **scores(y_true, proba, classes),
+        'confusion_matrix': confusion_matrix(y_true, pred, labels=classes).tolist(),
+        'per_class': classification_report(y_true, pred, labels=classes, output_dict=True, zero_division=0),
+        'report': classification_report(y_true, pred, labels=classes, zero_division=0),
+    }
+
+
+def evaluate_model(model, splits):
+    """{split: metrics} for {split: (X, y)}, with one timed predict_proba call per split"""
+    results = {}
+    for split, (X, y) in splits.items():
+        start = time.perf_counter()
+        proba = model.predict_proba(X)
+        predict_ms = (time.perf_counter() - start) * 1000
+        results[split] = {**classification_metrics(y, proba, model.classes_), 'predict_ms': predict_ms}
+    return results
+
+
+def print_evaluation(title, evaluation, split='test'):
+    print("\n" + "="*60)
+    print(f"{title.upper()} MODEL EVALUATION")
+    print("="*60)
+
+    for name, metrics in evaluation.items():
+        print(f"{name.capitalize()} Accuracy: {metrics['accuracy']:.4f}")
+    metrics = evaluation[split]
+    print(f"ROC-AUC Score: {metrics['roc_auc']:.4f}")
+    print(f"Log Loss: {metrics['log_loss']:.4f}  Brier Score: {metrics['brier']:.4f}\n")
+    print("Classification Report:")
+    print(metrics['report'])
+    print("Confusion Matrix:")
+    print(np.array(metrics['confusion_matrix']))
+
+
+# Per-fold scores averaged into the leaderboard as cv_<name>
+CV_METRICS = ('roc_auc', 'accuracy', 'log_loss', 'brier')
+
+
+def fold_scores(y_true, proba, classes):
+    """The scalar metrics of one validation fold (what the fold cache stores)"""
+    metrics = scores(y_true, proba, classes)
+    return {key: metrics[key] for key in CV_METRICS}
+
+
+def summarize_folds(folds):
+    """Mean of each per-fold metric of one candidate, plus the ROC-AUC spread"""
+    summary = {f'cv_{key}': float(np.mean([f[key] for f in folds])) for key in CV_METRICS}
+    summary['cv_roc_auc_std'] = float(np.std([f['roc_auc'] for f in folds]))
+    return summary
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def write_report(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=_json_default)
@@ -0,0 +1,313 @@
+"""
+Compact serving export of the trained model
+
+Shrinks the compiled ensemble written by train_model.py into a smaller serving
+artifact, diabetes_risk_model_compact.joblib:
+
+    fewer trees     the shortest prefix of the ensemble whose ROC-AUC stays within
+                    --auc-tolerance of the full model and whose probabilities move by at
+                    most --max-probability-change
+    pruned trees    subtrees whose leaf values all lie within --leaf-tolerance of each
+                    other are collapsed into a single leaf
+    narrow arrays   float32 thresholds and leaf values, uint8 feature ids and int16
+                    tree-relative child indices (instead of float64 / intp)
+
+The held-out split of train_model.py is halved: the tree count is chosen on the
+validation half, and the reported ROC-AUC and probability change come from the
+other half. Nothing is written unless the compact model is within both tolerances
+there too.
+
+It is served by the same compiled engine; start the server with
+ML_COMPILED_MODEL=diabetes_risk_model_compact.joblib. The export reports the size,
+load time, latency and accuracy of the original and compact models.
+
+Usage:
+    python export_compact.py [--auc-tolerance 0.005] [--max-probability-change 0.05]
+                             [--leaf-tolerance 0.05] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from benchmark import time_calls
+from data_loading import load_dataset
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN
+from inference_engine import CompiledEnsemble, compile_model, file_sha256
+from measure_startup import run_scenario
+
+MODEL_PATH = 'diabetes_risk_model.pkl'
+SCALER_PATH = 'scaler.pkl'
+COMPILED_MODEL_PATH = 'diabetes_risk_model_compiled.joblib'
+COMPACT_MODEL_PATH = 'diabetes_risk_model_compact.joblib'
+
+INT16_MAX = np.iinfo(np.int16).max
+
+
+def holdout(csv_path):
+    """The test split train_model.py evaluates on (raw features, labels)"""
+    data = load_dataset(csv_path)
+    if data is None:
+        raise SystemExit(f"❌ {csv_path} not found. Please run 'python train_model.py' first.")
+    X = data[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = data[TARGET_COLUMN].to_numpy()
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    return X_test, y_test
+
+
+def split_holdout(X, y, seed=42):
+    """(X_val, y_val), (X_eval, y_eval): the half the tree count is chosen on and the half it is reported on"""
+    X_val, X_eval, y_val, y_eval = train_test_split(X, y, test_size=0.5, random_state=seed, stratify=y)
+    return (X_val, y_val), (X_eval, y_eval)
+
+
+# ============================================
+# ESTIMATOR COUNT
+# ============================================
+
+def prefix_aucs(engine, X, y):
+    """ROC-AUC of the first k trees, for every k (the ensemble is evaluated once)"""
+    leaves = np.concatenate([engine.leaf_values(X[start:start + 4096]) for start in range(0, len(X), 4096)])
+    # Averaging (forest) or the sigmoid (boosting) do not change the ranking, so the running sum is enough
+    running = np.cumsum(leaves, axis=1, dtype=np.float64)
+    return np.array([roc_auc_score(y, running[:, k]) for k in range(engine.n_trees)])
+
+
+def select_n_trees(aucs, tolerance):
+    """Smallest tree count from which every longer prefix stays within tolerance of the full ensemble's AUC
+
+    Requiring all longer prefixes to qualify (not just the first that happens to) keeps a lucky dip in a
+    noisy small-sample AUC curve from selecting a handful of trees.
+    """
+    within = aucs >= aucs[-1] - tolerance
+    stable = np.logical_and.accumulate(within[::-1])[::-1]
+    return int(np.argmax(stable)) + 1
+
+
+# ============================================
+# PRUNING AND NARROW ARRAYS
+# ============================================
+
+def _tree_bounds(engine, t):
+    end = engine.roots[t + 1] if t + 1 < engine.n_trees else engine.n_nodes
+    return int(engine.roots[t]), int(end)
+
+
+def prune_tree(engine, t, leaf_tolerance):
+    """Tree t as local arrays with near-constant subtrees collapsed: (feature, threshold, left, right, value, depth, cover)"""
+    start, end = _tree_bounds(engine, t)
+    feature = engine.feature[start:end]
+    threshold = engine.threshold[start:end]
+    left = engine.left[start:end] - start
+    right = engine.right[start:end] - start
+    value = engine.value[start:end]
+    cover = engine.cover[start:end] if engine.cover is not None else np.ones(end - start)
+
+    # Range of leaf values under each node (children always come after their parent)
+    low = value.astype(np.float64)
+    high = low.copy()
+    for node in range(end - start - 1, -1, -1):
+        if left[node] != node:
+            low[node] = min(low[left[node]], low[right[node]])
+            high[node] = max(high[left[node]], high[right[node]])
+
+    out_feature, out_threshold, out_left, out_right, out_value, out_cover = [], [], [], [], [], []
+    max_depth = 0
+    # Depth-first copy of the kept nodes; a collapsed subtree becomes a leaf at the midpoint of its values
+    stack = [(0, None, None, 0)]
+    while stack:
+        node, parent, side, depth = stack.pop()
+        index = len(out_feature)
+        if parent is not None:
+            (out_left if side == 'left' else out_right)[parent] = index
+        is_leaf = left[node] == node or high[node] - low[node] <= leaf_tolerance
+        out_feature.append(0 if is_leaf else feature[node])
+        out_threshold.append(threshold[node])
+        out_left.append(index)
+        out_right.append(index)
+        out_value.append((low[node] + high[node]) / 2)
+        out_cover.append(cover[node])
+        max_depth = max(max_depth, depth)
+        if not is_leaf:
+            stack.append((right[node], index, 'right', depth + 1))
+            stack.append((left[node], index, 'left', depth + 1))
+    return out_feature, out_threshold, out_left, out_right, out_value, max_depth, out_cover
+
+
+def round_down_float32(values):
+    """Largest float32 <= each value
+
+    Rounding split thresholds down (not to nearest) keeps x <= threshold decisions unchanged for every
+    input that is itself exactly representable in float32: integers, and halves like 28.5. Rounding to
+    nearest flipped rows sitting exactly on a boundary (e.g. age 35 against a folded 34.9999997).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def build_compact(engine, n_trees, leaf_tolerance):
+    """CompiledEnsemble with the first n_trees trees, pruned and stored in narrow dtypes"""
+    trees = [prune_tree(engine, t, leaf_tolerance) for t in range(n_trees)]
+    sizes = [len(tree[0]) for tree in trees]
+    # Child indices are relative to the tree root; a tree too large for int16 keeps int32 indices
+    index_dtype = np.int16 if max(sizes) <= INT16_MAX else np.int32
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+
+    def column(i, dtype):
+        return np.concatenate([np.asarray(tree[i]) for tree in trees]).astype(dtype)
+
+    compact = CompiledEnsemble(
+        engine.kind, column(0, np.uint8), round_down_float32(column(1, np.float64)), column(2, index_dtype), column(3, index_dtype),
+        column(4, np.float32), roots, max(tree[5] for tree in trees),
+        base_score=engine.base_score, classes=engine.classes_,
+        feature_importances=engine.feature_importances_, local_index=True,
+        cover=column(6, np.float32) if engine.cover is not None else None,
+    )
+    compact.variant = f"compact:trees={n_trees},leaf_tolerance={leaf_tolerance:g}"
+    return compact
+
+
+def array_bytes(engine):
+    return sum(getattr(engine, name).nbytes for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots'))
+
+
+# ============================================
+# REPORT
+# ============================================
+
+def compare(engine, compact, X, y):
+    """ROC-AUC of both models and the largest change in positive-class probability on one split"""
+    full_proba, compact_proba = engine.positive_proba(X), compact.positive_proba(X)
+    return {
+        'roc_auc': float(roc_auc_score(y, full_proba)),
+        'compact_roc_auc': float(roc_auc_score(y, compact_proba)),
+        'max_probability_change': float(np.abs(compact_proba - full_proba).max()),
+    }
+
+
+def within_tolerance(comparison, auc_tolerance, max_probability_change):
+    return (comparison['compact_roc_auc'] >= comparison['roc_auc'] - auc_tolerance
+            and comparison['max_probability_change'] <= max_probability_change)
+
+
+def measure(predict, X):
+    return {
+        'latency_single_ms': float(np.median(time_calls(lambda: predict(X[:1])))),
+        'latency_batch_1000_ms': float(np.median(time_calls(lambda: predict(X[:1000])))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='medical_data.csv', help='training CSV (the held-out split is used)')
+    parser.add_argument('--auc-tolerance', type=float, default=0.005,
+                        help='maximum ROC-AUC loss allowed when dropping trees and pruning')
+    parser.add_argument('--max-probability-change', type=float, default=0.05,
+                        help='maximum |change| of any held-out probability allowed before the export is written')
+    parser.add_argument('--leaf-tolerance', type=float, default=0.05,
+                        help='collapse subtrees whose leaf values differ by at most this much')
+    parser.add_argument('--load-repeat', type=int, default=5, help='fresh interpreters per load-time measurement')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    print("="*60)
+    print("COMPACT MODEL EXPORT")
+    print("="*60)
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    engine = compile_model(model, scaler)
+    (X_val, y_val), (X, y) = split_holdout(*holdout(args.data))
+    print(f"{type(model).__name__}: {engine.n_trees} trees, {engine.n_nodes} nodes; "
+          f"{len(y_val)} validation + {len(y)} evaluation rows held out from {args.data}")
+
+    # Pruning, float32 rounding and dropped trees also move individual probabilities, which ROC-AUC
+    # (a ranking metric) does not see, so add trees back until both tolerances hold on the validation half
+    n_trees = select_n_trees(prefix_aucs(engine, X_val, y_val), args.auc_tolerance)
+    while True:
+        compact = build_compact(engine, n_trees, args.leaf_tolerance)
+        validation = compare(engine, compact, X_val, y_val)
+        if within_tolerance(validation, args.auc_tolerance, args.max_probability_change) or n_trees == engine.n_trees:
+            break
+        n_trees = min(engine.n_trees, n_trees + max(1, engine.n_trees // 20))
+
+    evaluation = compare(engine, compact, X, y)
+    full_auc, compact_auc = evaluation['roc_auc'], evaluation['compact_roc_auc']
+    print(f"{n_trees} trees: ROC-AUC {compact_auc:.4f} (full {full_auc:.4f}), "
+          f"max |Δ probability| {evaluation['max_probability_change']:.4f} on the evaluation rows")
+    if not within_tolerance(evaluation, args.auc_tolerance, args.max_probability_change):
+        raise SystemExit(f"❌ The compact model is not within --auc-tolerance {args.auc_tolerance} and "
+                         f"--max-probability-change {args.max_probability_change} of the full model; "
+                         f"{COMPACT_MODEL_PATH} was not written. Lower --leaf-tolerance or raise the tolerances.")
+
+    compact.save(COMPACT_MODEL_PATH, sources={MODEL_PATH: file_sha256(MODEL_PATH), SCALER_PATH: file_sha256(SCALER_PATH)})
+    print(f"✅ {COMPACT_MODEL_PATH}: {compact.n_trees} trees, {compact.n_nodes} nodes "
+          f"({compact.left.dtype} child indices, {compact.threshold.dtype} thresholds)")
+
+    report = {
+        'config': {'auc_tolerance': args.auc_tolerance, 'max_probability_change': args.max_probability_change,
+                   'leaf_tolerance': args.leaf_tolerance, 'validation_rows': len(y_val), 'evaluation_rows': len(y)},
+        'validation': validation,
+        'original': {'n_trees': engine.n_trees, 'n_nodes': engine.n_nodes, 'roc_auc': full_auc,
+                     'pickle_kb': os.path.getsize(MODEL_PATH) / 1024, 'array_kb': array_bytes(engine) / 1024},
+        'compact': {'n_trees': compact.n_trees, 'n_nodes': compact.n_nodes, 'roc_auc': compact_auc,
+                    'artifact_kb': os.path.getsize(COMPACT_MODEL_PATH) / 1024, 'array_kb': array_bytes(compact) / 1024,
+                    'max_probability_change': evaluation['max_probability_change']},
+    }
+    if os.path.exists(COMPILED_MODEL_PATH):
+        report['original']['artifact_kb'] = os.path.getsize(COMPILED_MODEL_PATH) / 1024
+
+    # Latency of the serving paths on the same rows
+    report['original'].update(measure(engine.predict_proba, X))
+    report['original']['sklearn'] = measure(lambda batch: model.predict_proba(scaler.transform(batch)), X)
+    report['compact'].update(measure(compact.predict_proba, X))
+
+    # Cold start in fresh interpreters
+    for name, scenario in (('original', 'pickle'), ('original', 'mmap'), ('compact', 'compact')):
+        try:
+            result = run_scenario(scenario, args.load_repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️ {scenario}: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        report[name][f'{scenario}_load_ms'] = result['load_ms']
+        report[name][f'{scenario}_rss_added_mb'] = result['rss_added_mb']
+
+    original, small = report['original'], report['compact']
+    print("\n" + "="*60)
+    print("SIZE / LOAD TIME / LATENCY")
+    print("="*60)
+    print(f"Trees:            {original['n_trees']:>10} -> {small['n_trees']:>10}")
+    print(f"Nodes:            {original['n_nodes']:>10} -> {small['n_nodes']:>10}")
+    print(f"Pickle / artifact:{original['pickle_kb']:>8.0f} KB -> {small['artifact_kb']:>8.0f} KB")
+    print(f"Node arrays:      {original['array_kb']:>8.0f} KB -> {small['array_kb']:>8.0f} KB")
+    for scenario in ('pickle', 'mmap'):
+        if f'{scenario}_load_ms' in original and 'compact_load_ms' in small:
+            print(f"Load ({scenario:>6}):    {original[f'{scenario}_load_ms']:>7.1f} ms -> {small['compact_load_ms']:>7.1f} ms")
+    print(f"Single row:       {original['latency_single_ms']:>7.3f} ms -> {small['latency_single_ms']:>7.3f} ms "
+          f"(sklearn {original['sklearn']['latency_single_ms']:.3f} ms)")
+    print(f"1000 rows:        {original['latency_batch_1000_ms']:>7.3f} ms -> {small['latency_batch_1000_ms']:>7.3f} ms "
+          f"(sklearn {original['sklearn']['latency_batch_1000_ms']:.3f} ms)")
+    print(f"ROC-AUC:          {full_auc:>10.4f} -> {compact_auc:>10.4f} (tolerance {args.auc_tolerance})")
+    print(f"Max |Δ probability|: {small['max_probability_change']:>10.4f} (tolerance {args.max_probability_change})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report saved to {args.output}")
+    print(f"\nServe it with: ML_COMPILED_MODEL={COMPACT_MODEL_PATH} python app.py")
+
+
+if __name__ == '__main__':
+    main()
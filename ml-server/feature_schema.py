@@ -0,0 +1,210 @@
+"""
+Declarative model feature schema
+
+Single source of truth for the model inputs, shared by train_model.py,
+data_loading.py, bulk_score.py and app.py: training column name, API field name,
+display name, order, storage dtype, accepted (clinical) range and default.
+
+FeatureSchema compiles the declarations into:
+    extract(record)           one JSON record -> feature list (a few µs), precise errors
+    extract_records(records)  list of records -> matrix + per-row errors
+    extract_columns(columns)  columnar payload / DataFrame -> matrix + per-row errors, vectorized
+    validate(X)               vectorized range / finiteness / integer check of a feature matrix
+"""
+
+import numpy as np
+
+
+class Feature:
+    def __init__(self, name, field, display, dtype, low, high, default=None, integer=False):
+        self.name = name          # training column name
+        self.field = field        # /api/predict field name
+        self.display = display    # label used in feature_importance
+        self.dtype = dtype        # storage dtype for training data
+        self.low = low            # accepted range, inclusive
+        self.high = high
+        self.default = default    # value used when the field is missing or null; None = required
+        self.integer = integer
+
+    def range_error(self, value):
+        kind = 'an integer' if self.integer else 'a number'
+        return f"{self.field} must be {kind} between {self.low:g} and {self.high:g}, got {value!r}"
+
+
+# Model feature order: never reorder without retraining
+FEATURES = [
+    Feature('age', 'age', 'Age', np.float32, 0, 120),
+    Feature('bmi', 'bmi', 'BMI', np.float32, 10, 80),
+    Feature('bp_systolic', 'bp_systolic', 'Blood Pressure', np.float32, 40, 300),
+    Feature('fasting_glucose', 'fasting_glucose', 'Fasting Glucose', np.float32, 30, 600),
+    # 0/1 from the API; the Pima download stores the pedigree score (up to ~2.5) here, so the range is wider.
+    # Unknown history counts as positive (conservative).
+    Feature('family_history', 'familyHistory', 'Family History', np.float32, 0, 3, default=1.0),
+    Feature('activity_level', 'activityLevel', 'Activity Level', np.uint8, 0, 3, default=0.0, integer=True),
+    Feature('cholesterol', 'cholesterol', 'Cholesterol', np.float32, 50, 600, default=200.0),  # default healthy level
+    Feature('years_condition', 'yearsCondition', 'Years with Condition', np.float32, 0, 100, default=0.0),
+]
+
+TARGET_COLUMN = 'diabetes_risk'
+TARGET_DTYPE = np.uint8
+
+_MISSING = object()
+
+
+class FeatureSchema:
+    def __init__(self, features):
+        self.features = list(features)
+        self.names = [f.name for f in self.features]
+        self.fields = [f.field for f in self.features]
+        self.display_names = [f.display for f in self.features]
+        self.dtypes = {f.name: f.dtype for f in self.features}
+        self.low = np.array([f.low for f in self.features], dtype=np.float64)
+        self.high = np.array([f.high for f in self.features], dtype=np.float64)
+        self.integer = np.array([f.integer for f in self.features])
+        # Flat tuples for the per-record hot path
+        self._compiled = tuple(
+            (f.field, f.name if f.name != f.field else None, float(f.low), float(f.high),
+             None if f.default is None else float(f.default), f.integer, f)
+            for f in self.features
+        )
+
+    def __len__(self):
+        return len(self.features)
+
+    # ============================================
+    # SINGLE RECORDS
+    # ============================================
+
+    def extract(self, record):
+        """Feature list for one patient record (API field names, training names also accepted)"""
+        if not isinstance(record, dict):
+            raise ValueError('Patient record must be a JSON object')
+        row = []
+        for field, alias, low, high, default, integer, feature in self._compiled:
+            value = record.get(field, _MISSING)
+            if value is _MISSING and alias is not None:
+                value = record.get(alias, _MISSING)
+            if value is _MISSING or value is None:
+                if default is None:
+                    raise ValueError(f"{field} is required")
+                row.append(default)
+                continue
+            try:
+                x = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be a number, got {value!r}") from None
+            # Written so NaN fails as well
+            if not low <= x <= high or (integer and not x.is_integer()):
+                raise ValueError(feature.range_error(value))
+            row.append(x)
+        return row
+
+    def extract_records(self, records):
+        """(X [n_valid, n_features], valid row indices, [{'index', 'error'}]) for a list of records"""
+        rows, valid_index, errors = [], [], []
+        extract = self.extract
+        for i, record in enumerate(records):
+            try:
+                rows.append(extract(record))
+                valid_index.append(i)
+            except ValueError as e:
+                errors.append({'index': i, 'error': str(e)})
+        X = np.array(rows, dtype=np.float64).reshape(len(rows), len(self))
+        return X, valid_index, errors
+
+    # ============================================
+    # VECTORIZED (columnar payloads, DataFrames, training data)
+    # ============================================
+
+    def validate(self, X):
+        """Boolean [n, n_features] mask of values outside the schema (range, NaN/inf, non-integer)"""
+        X = np.asarray(X, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            bad = ~((X >= self.low) & (X <= self.high))
+            bad[:, self.integer] |= X[:, self.integer] != np.floor(X[:, self.integer])
+        return bad
+
+    def extract_columns(self, columns, n_rows=None):
+        """Vectorized extract() over a mapping of column -> sequence (JSON 'columns' payload or a DataFrame)
+
+        Missing columns and missing values (None/NaN in a column) take the default. Returns the same
+        (X, valid row indices, errors) triple as extract_records().
+        """
+        if n_rows is None and hasattr(columns, 'index'):
+            n_rows = len(columns.index)
+        elif n_rows is None:
+            n_rows = len(next(iter(columns.values()))) if len(columns) else 0
+        X = np.empty((n_rows, len(self)), dtype=np.float64)
+        errors = {}
+        for j, feature in enumerate(self.features):
+            key = feature.field if feature.field in columns else feature.name if feature.name in columns else None
+            if key is None:
+                if feature.default is None:
+                    for i in range(n_rows):
+                        errors.setdefault(i, f"{feature.field} is required")
+                X[:, j] = feature.default if feature.default is not None else np.nan
+                continue
+            values, missing, unparsable = _to_float(columns[key], n_rows)
+            for i in np.flatnonzero(unparsable):
+                errors.setdefault(int(i), f"{feature.field} must be a number, got {_item(columns[key], i)!r}")
+            if feature.default is None:
+                for i in np.flatnonzero(missing):
+                    errors.setdefault(int(i), f"{feature.field} is required")
+            else:
+                values[missing] = feature.default
+            X[:, j] = values
+            bad = self.validate_column(values, j) & ~missing & ~unparsable
+            for i in np.flatnonzero(bad):
+                errors.setdefault(int(i), feature.range_error(_item(columns[key], i)))
+        valid = np.ones(n_rows, dtype=bool)
+        valid[list(errors)] = False
+        return X[valid], np.flatnonzero(valid).tolist(), [{'index': i, 'error': errors[i]} for i in sorted(errors)]
+
+    def validate_column(self, values, j):
+        with np.errstate(invalid='ignore'):
+            bad = ~((values >= self.low[j]) & (values <= self.high[j]))
+            if self.integer[j]:
+                bad |= values != np.floor(values)
+        return bad
+
+
+def _item(values, i):
+    value = values.iloc[i] if hasattr(values, 'iloc') else values[i]
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _to_float(values, n_rows):
+    """(float64 array, missing mask, unparsable mask) for a column of JSON values or a pandas Series"""
+    if hasattr(values, 'to_numpy'):
+        import pandas as pd
+        missing = values.isna().to_numpy()
+        numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+        return numeric, missing, np.isnan(numeric) & ~missing
+    if len(values) != n_rows:
+        raise ValueError("All 'columns' arrays must have the same length")
+    try:
+        # Fast path: a list of numbers (None becomes NaN)
+        numeric = np.array(values, dtype=np.float64)
+        missing = np.array([v is None for v in values], dtype=bool) if np.isnan(numeric).any() else np.zeros(n_rows, bool)
+        return numeric, missing, np.zeros(n_rows, dtype=bool)
+    except (TypeError, ValueError):
+        numeric = np.empty(n_rows, dtype=np.float64)
+        missing = np.zeros(n_rows, dtype=bool)
+        unparsable = np.zeros(n_rows, dtype=bool)
+        for i, value in enumerate(values):
+            if value is None:
+                missing[i] = True
+                numeric[i] = np.nan
+                continue
+            try:
+                numeric[i] = float(value)
+            except (TypeError, ValueError):
+                unparsable[i] = True
+                numeric[i] = np.nan
+        return numeric, missing, unparsable
+
+
+SCHEMA = FeatureSchema(FEATURES)
+
+FEATURE_COLUMNS = SCHEMA.names
+COLUMN_DTYPES = {**SCHEMA.dtypes, TARGET_COLUMN: TARGET_DTYPE}
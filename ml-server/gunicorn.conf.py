@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration for serving the ML server in production
+
+    gunicorn -c gunicorn.conf.py app:app
+
+app.py is imported and the model loaded once in the master process, then
+forked, so all workers share the same model pages instead of each unpickling a
+private copy of the forest (the compiled artifact is memory-mapped, so its node
+arrays live in the OS page cache either way).
+
+Environment variables:
+    ML_WORKERS            worker processes (default: number of CPU cores)
+    ML_THREADS            threads per worker (default: 4)
+    ML_TIMEOUT            seconds before a silent worker is restarted (default: 30)
+    ML_GRACEFUL_TIMEOUT   seconds in-flight requests get to finish on reload/shutdown (default: 30)
+    ML_MAX_REQUESTS       recycle a worker after this many requests, 0 = never (default: 0)
+
+Graceful reload:
+    kill -HUP <master pid>    restart workers; in-flight requests are allowed to finish.
+                              Workers are re-forked from the preloaded master, so this
+                              does not pick up a retrained model.
+    kill -USR2 <master pid>   start a new master that re-imports app.py (new model), then
+    kill -QUIT <old pid>      stop the old master once the new workers are serving.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', os.getenv('ML_PORT', 3002))}"
+workers = int(os.getenv('ML_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('ML_THREADS', 4))
+worker_class = 'gthread'
+
+# Load the model once in the master before forking
+preload_app = True
+
+timeout = int(os.getenv('ML_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('ML_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+max_requests = int(os.getenv('ML_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    import app as ml_app
+    # Every registered model (ML_MODELS) is loaded before forking, so workers share them all
+    for name in ml_app.registry.names:
+        bundle = ml_app.registry.current(name)
+        if bundle is not None and name not in ml_app.registry.shadows:
+            # Leaf path tables for explained requests (?explain=1), built once and shared like the model
+            ml_app.bundle_explainer(bundle)
+            # sklearn model for large batches (ML_SKLEARN_MIN_ROWS), unpickled once here instead of in every worker
+            if bundle.engine is not None and bundle.sklearn_min_rows:
+                bundle.sklearn_model()
+
+    # Move everything loaded by the preload into the permanent generation, so the
+    # cyclic GC never writes to (and thereby un-shares) the model's pages in workers
+    gc.freeze()
+    server.log.info(f"ML server ready: {workers} workers x {threads} threads, {len(ml_app.registry.names)} model(s) preloaded")
@@ -0,0 +1,337 @@
+"""
+Incremental retraining from logged, labeled predictions
+
+Instead of refitting every tree on medical_data.csv, each run reads only the
+labeled rows added since the last checkpoint and grows the serving model by a
+few estimators fitted on them (warm_start), then rewrites the model files the
+server hot-reloads.
+
+Rows come from a local CSV export or a SQLite copy of the Node backend's
+`predictions` table. The label column must hold the observed outcome (0/1), not
+the model's own `risk` output. Rows without a label yet (e.g. the prediction log's
+empty `outcome`) are kept pending and read again on later runs, so an outcome filled
+in after the cursor has moved past its row is still trained on. Columns use the
+API or training feature names; missing optional features take the schema
+defaults (see feature_schema.py).
+
+    RandomForest                 +--add-estimators trees fitted on the new rows
+    GradientBoosting             +--add-estimators boosting stages on the new rows
+    HistGradientBoosting         +--add-estimators boosting iterations on the new rows
+
+Trees split on the scaled features of the scaler they were fitted with, so the
+serving scaler (scaler.pkl) stays fixed. Running scaler statistics are updated
+with partial_fit and checkpointed separately; when they drift more than
+--drift-threshold standard deviations from the serving scaler, a full
+train_model.py run is recommended.
+
+State (cursor, pending unlabeled rows, running statistics, history) is checkpointed in
+incremental_state.json. A full retrain by train_model.py is detected from the
+model hash and replays all logged rows onto the new base model.
+
+Usage:
+    python incremental_train.py --csv predictions_export.csv --label-column outcome
+    python incremental_train.py --sqlite lina.db --table predictions --label-column outcome
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from feature_schema import FEATURE_COLUMNS, SCHEMA, TARGET_COLUMN
+from inference_engine import compile_model, file_sha256
+
+MODEL_PATH = 'diabetes_risk_model.pkl'
+SCALER_PATH = 'scaler.pkl'
+COMPILED_MODEL_PATH = 'diabetes_risk_model_compiled.joblib'
+STATE_PATH = 'incremental_state.json'
+
+# Parameter that counts the fitted estimators of each supported model type
+GROWTH_PARAMS = {
+    RandomForestClassifier: 'n_estimators',
+    GradientBoostingClassifier: 'n_estimators',
+    HistGradientBoostingClassifier: 'max_iter',
+}
+
+
+# ============================================
+# CHECKPOINT
+# ============================================
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def new_state(source, model_sha256, scaler):
+    """Fresh checkpoint; running statistics start from the serving scaler's training data"""
+    return {
+        'source': source,
+        'cursor': None,
+        'pending': [],
+        'base_model_sha256': model_sha256,
+        'model_sha256': model_sha256,
+        'rows_consumed': 0,
+        'stats': scaler_stats(scaler),
+        'history': [],
+    }
+
+
+def scaler_stats(scaler):
+    return {
+        'mean': scaler.mean_.tolist(),
+        'var': scaler.var_.tolist(),
+        'n_samples_seen': int(np.max(scaler.n_samples_seen_)),
+    }
+
+
+def running_scaler(stats):
+    """StandardScaler holding the checkpointed running statistics, ready for partial_fit"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(stats['mean'], dtype=np.float64)
+    scaler.var_ = np.asarray(stats['var'], dtype=np.float64)
+    scaler.scale_ = np.sqrt(scaler.var_)
+    scaler.n_samples_seen_ = np.int64(stats['n_samples_seen'])
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+
+# ============================================
+# NEW ROWS
+# ============================================
+
+# Pending ids per SQLite IN (...) query, below SQLite's bound-parameter limit
+PENDING_CHUNK = 500
+
+
+def read_new_rows(args, cursor, pending=()):
+    """(DataFrame of the pending rows and the rows after the cursor, cursor after them, key of each row)
+
+    The key is the cursor column value, or the row position for a CSV without that column; keys of rows
+    that turn out to be unlabeled become the next run's pending list.
+    """
+    if args.sqlite:
+        column = f'"{args.cursor_column}"'
+        with sqlite3.connect(f"file:{args.sqlite}?mode=ro", uri=True) as conn:
+            frames = [pd.read_sql_query(f'SELECT * FROM "{args.table}" WHERE {column} > ? ORDER BY {column}',
+                                        conn, params=(cursor if cursor is not None else -1,))]
+            for start in range(0, len(pending), PENDING_CHUNK):
+                chunk = list(pending[start:start + PENDING_CHUNK])
+                frames.insert(-1, pd.read_sql_query(
+                    f'SELECT * FROM "{args.table}" WHERE {column} IN ({", ".join("?" * len(chunk))})', conn, params=chunk))
+        frame = pd.concat(frames, ignore_index=True)
+        new_cursor = frames[-1][args.cursor_column].max() if len(frames[-1]) else cursor
+        return frame, _json_scalar(new_cursor), frame[args.cursor_column].to_numpy()
+
+    frame = pd.read_csv(args.csv)
+    if args.cursor_column in frame.columns:
+        keys = frame[args.cursor_column]
+        new = keys > cursor if cursor is not None else pd.Series(True, index=frame.index)
+        new_cursor = keys[new].max() if new.any() else cursor
+        frame = frame[new | keys.isin(pending)].reset_index(drop=True)
+        return frame, _json_scalar(new_cursor), frame[args.cursor_column].to_numpy()
+    # No id column: the export is append-only, so the cursor is the number of rows already read
+    offset = cursor or 0
+    positions = np.concatenate([np.asarray(pending, dtype=np.int64), np.arange(offset, len(frame))])
+    return frame.iloc[positions].reset_index(drop=True), len(frame), positions
+
+
+def _json_scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def labeled_rows(frame, label_column):
+    """(X, y, unlabeled mask, errors) for the rows that have a 0/1 label and pass the feature schema"""
+    if label_column not in frame.columns:
+        raise SystemExit(f"❌ Label column '{label_column}' not found (columns: {', '.join(frame.columns)})")
+    labels = pd.to_numeric(frame[label_column], errors='coerce')
+    has_label = labels.isin([0, 1]).to_numpy()
+    frame = frame[has_label].reset_index(drop=True)
+    X, valid_index, errors = SCHEMA.extract_columns(frame, len(frame))
+    y = labels[has_label].to_numpy(dtype=np.int64)[valid_index]
+    return X, y, ~has_label, errors
+
+
+# ============================================
+# WARM-START UPDATE
+# ============================================
+
+def fitted_estimators(model):
+    if isinstance(model, HistGradientBoostingClassifier):
+        return len(model._predictors)
+    return len(model.estimators_)
+
+
+def grow(model, X_scaled, y, add_estimators):
+    """Add add_estimators estimators fitted on (X_scaled, y) to a fitted ensemble, keeping the existing ones"""
+    param = next((p for cls, p in GROWTH_PARAMS.items() if isinstance(model, cls)), None)
+    if param is None:
+        raise SystemExit(f"❌ Incremental training does not support {type(model).__name__}")
+    if set(np.unique(y)) != set(model.classes_):
+        raise ValueError(f"new rows contain classes {sorted(set(np.unique(y)))}, the model needs {list(model.classes_)}")
+    params = {param: getattr(model, param) + add_estimators, 'warm_start': True}
+    if isinstance(model, HistGradientBoostingClassifier):
+        # Early stopping would carve a validation split out of the (small) new batch
+        params['early_stopping'] = False
+    model.set_params(**params)
+    model.fit(X_scaled, y)
+    model.set_params(warm_start=False)
+    return model
+
+
+def dump_atomic(obj, path):
+    """Write next to the target and rename, so the server's file watcher never sees a partial file"""
+    tmp = f"{path}.tmp"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help='CSV export of the predictions table')
+    source.add_argument('--sqlite', help='SQLite database holding the predictions table')
+    parser.add_argument('--table', default='predictions', help='table name in the SQLite database')
+    parser.add_argument('--label-column', default=TARGET_COLUMN, help='column with the observed 0/1 outcome')
+    parser.add_argument('--cursor-column', default='id', help='increasing column marking which rows are new')
+    parser.add_argument('--add-estimators', type=int, default=20, help='estimators added per run')
+    parser.add_argument('--min-rows', type=int, default=50, help='skip the run (keep the cursor) below this many new rows')
+    parser.add_argument('--max-estimators', type=int, default=1000, help='warn once the model grows past this size')
+    parser.add_argument('--drift-threshold', type=float, default=0.5,
+                        help='recommend a full retrain when a running mean moves this many serving stds')
+    parser.add_argument('--state', default=STATE_PATH, help='checkpoint file')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be trained without writing anything')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    source = os.path.abspath(args.sqlite or args.csv)
+
+    print("="*60)
+    print("INCREMENTAL TRAINING")
+    print("="*60)
+
+    if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
+        raise SystemExit("❌ Model files not found. Please run 'python train_model.py' first.")
+    model_sha256 = file_sha256(MODEL_PATH)
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+
+    state = load_state(args.state)
+    if state is None:
+        print(f"No checkpoint at {args.state}; starting from the first logged row")
+        state = new_state(source, model_sha256, scaler)
+    elif state['source'] != source:
+        print(f"⚠️ Checkpoint was for {state['source']}; starting over for {source}")
+        state = new_state(source, model_sha256, scaler)
+    elif state['model_sha256'] != model_sha256:
+        # train_model.py replaced the model: its training data does not include the logged rows
+        print("⚠️ diabetes_risk_model.pkl was retrained since the last checkpoint; replaying all logged rows")
+        state = new_state(source, model_sha256, scaler)
+
+    # ============================================
+    # READ NEW ROWS
+    # ============================================
+
+    start = time.perf_counter()
+    pending = state.get('pending', [])
+    frame, cursor, keys = read_new_rows(args, state['cursor'], pending)
+    X, y, unlabeled, errors = labeled_rows(frame, args.label_column)
+    # Unlabeled rows stay pending until their outcome is filled in; the cursor moves past everything read
+    pending = [_json_scalar(key) for key in keys[unlabeled]]
+    read_s = time.perf_counter() - start
+    print(f"{len(frame)} rows since cursor {state['cursor']!r} or pending: {len(y)} usable, "
+          f"{len(pending)} unlabeled, {len(errors)} invalid ({read_s:.2f}s)")
+    for error in errors[:5]:
+        print(f"   row {error['index']}: {error['error']}")
+
+    if len(y) < args.min_rows:
+        print(f"⏭️ Fewer than {args.min_rows} labeled rows; nothing trained, cursor unchanged")
+        return
+
+    # ============================================
+    # UPDATE
+    # ============================================
+
+    X_scaled = scaler.transform(X)
+    # Prequential check: the current model has never seen these rows
+    auc_before = float(roc_auc_score(y, model.predict_proba(X_scaled)[:, 1])) if len(set(y)) == 2 else None
+
+    stats = running_scaler(state['stats'])
+    stats.partial_fit(X)
+    drift = np.abs(stats.mean_ - scaler.mean_) / scaler.scale_
+    drifted = {name: round(float(d), 3) for name, d in zip(FEATURE_COLUMNS, drift) if d > args.drift_threshold}
+
+    n_before = fitted_estimators(model)
+    if args.dry_run:
+        print(f"Dry run: would add {args.add_estimators} estimators to {n_before} on {len(y)} rows")
+        return
+    start = time.perf_counter()
+    try:
+        grow(model, X_scaled, y, args.add_estimators)
+    except ValueError as e:
+        print(f"⏭️ Cannot train on this batch ({e}); cursor unchanged")
+        return
+    fit_s = time.perf_counter() - start
+    n_after = fitted_estimators(model)
+
+    # ============================================
+    # SAVE
+    # ============================================
+
+    dump_atomic(model, MODEL_PATH)
+    tmp = f"{COMPILED_MODEL_PATH}.tmp"
+    compile_model(model, scaler).save(tmp, sources={
+        MODEL_PATH: file_sha256(MODEL_PATH),
+        SCALER_PATH: file_sha256(SCALER_PATH),
+    })
+    os.replace(tmp, COMPILED_MODEL_PATH)
+
+    state['cursor'] = cursor
+    state['pending'] = pending
+    state['model_sha256'] = file_sha256(MODEL_PATH)
+    state['rows_consumed'] += len(y)
+    state['stats'] = scaler_stats(stats)
+    state['history'].append({
+        'finished_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'rows': len(y),
+        'estimators': n_after,
+        'auc_before_update': auc_before,
+        'fit_s': fit_s,
+        'drift': drifted,
+    })
+    save_state(state, args.state)
+
+    print(f"✅ {type(model).__name__}: {n_before} -> {n_after} estimators in {fit_s:.2f}s "
+          f"({state['rows_consumed']} logged rows consumed so far)")
+    if auc_before is not None:
+        print(f"ROC-AUC of the previous model on these rows: {auc_before:.4f}")
+    print(f"✅ Saved {MODEL_PATH} and {COMPILED_MODEL_PATH}; checkpoint {args.state} "
+          f"(cursor {cursor!r}, {len(pending)} unlabeled rows pending)")
+    if drifted:
+        print(f"⚠️ Feature means drifted from the serving scaler (in stds): {drifted}; "
+              f"consider a full 'python train_model.py' run")
+    if n_after > args.max_estimators:
+        print(f"⚠️ The model has {n_after} estimators (> {args.max_estimators}); a full retrain will shrink it")
+
+
+if __name__ == '__main__':
+    main()
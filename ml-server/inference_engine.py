@@ -0,0 +1,276 @@
+"""
+Compiled tree-ensemble inference engine
+
+Flattens the RandomForest / (Hist)GradientBoosting models saved by train_model.py into
+compact NumPy node arrays (feature, threshold, left, right, value) and evaluates
+every tree at once with vectorized code. The StandardScaler is folded into the
+split thresholds, so raw (unscaled) features can be scored directly and the
+per-call sklearn overhead (input validation, joblib thread setup) is avoided.
+"""
+
+import hashlib
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+
+# Rows scored per vectorized pass; bounds the (rows x trees) node index matrix
+CHUNK_SIZE = 4096
+
+ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+def file_sha256(path):
+    """Content hash used to tie a compiled artifact to the pickles it was built from"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CompiledEnsemble:
+    """Tree ensemble stored as flat node arrays with the scaler folded into the thresholds"""
+
+    def __init__(self, kind, feature, threshold, left, right, value, roots, max_depth,
+                 base_score=0.0, classes=(0, 1), feature_importances=None, local_index=False, cover=None):
+        self.kind = kind  # 'forest' (average of leaf probabilities) or 'boosting' (sum of log-odds)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        # Tiny (one entry per tree), and native-width indices keep the per-step fancy indexing free of casts
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.base_score = float(base_score)
+        self.classes_ = np.asarray(classes)
+        self.feature_importances_ = feature_importances
+        # left/right hold tree-relative node indices (offset by roots), so they fit in int16 (see export_compact.py)
+        self.local_index = bool(local_index)
+        # Training samples (weight) reaching each node; only needed for per-prediction explanations (explain.py)
+        self.cover = cover
+        self.sources = {}  # source pickle path -> sha256, recorded when saved as an artifact
+        self.variant = ''  # describes a derived artifact (e.g. the compact export); part of the bundle version
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def leaf_values(self, X):
+        """Return the (n_samples, n_trees) matrix of leaf values reached by each row"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        # Leaves point to themselves, so a fixed number of steps lands every row on its leaf
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+            if self.local_index:
+                node = node + self.roots
+        return self.value[node]
+
+    def positive_proba(self, X):
+        """Return the probability of the positive class for each row"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            leaves = self.leaf_values(X[start:start + CHUNK_SIZE])
+            # Accumulate in float64 even when the leaf values are stored as float32
+            if self.kind == 'forest':
+                out[start:start + CHUNK_SIZE] = leaves.mean(axis=1, dtype=np.float64)
+            else:
+                raw = self.base_score + leaves.sum(axis=1, dtype=np.float64)
+                out[start:start + CHUNK_SIZE] = 1.0 / (1.0 + np.exp(-raw))
+        return out
+
+    def predict_proba(self, X):
+        """sklearn-compatible (n_samples, 2) probability matrix for unscaled features"""
+        p1 = self.positive_proba(X)
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path, sources=None):
+        """Write the node arrays uncompressed, so load() can memory-map them instead of copying"""
+        state = {name: np.ascontiguousarray(getattr(self, name)) for name in ARRAY_FIELDS}
+        state.update({
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'base_score': self.base_score,
+            'classes': np.asarray(self.classes_),
+            'feature_importances': None if self.feature_importances_ is None else np.asarray(self.feature_importances_),
+            'sources': dict(sources or {}),
+            'local_index': self.local_index,
+            'cover': None if self.cover is None else np.ascontiguousarray(self.cover),
+            'variant': self.variant,
+        })
+        joblib.dump(state, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a saved engine; with mmap_mode the node arrays stay in the OS page cache, shared across processes"""
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        # Plain ndarray views of the mapped buffers: indexing an np.memmap wraps every result in a new
+        # memmap (__array_finalize__), which dominated single-row latency
+        engine = cls(state['kind'], *(np.asarray(state[name]) for name in ARRAY_FIELDS), state['max_depth'],
+                     base_score=state['base_score'], classes=state['classes'],
+                     feature_importances=state['feature_importances'], local_index=state.get('local_index', False),
+                     cover=None if state.get('cover') is None else np.asarray(state['cover']))
+        engine.sources = state['sources']
+        engine.variant = state.get('variant', '')
+        return engine
+
+    def is_stale(self):
+        """True if any source pickle recorded at save time has since changed on disk"""
+        for path, digest in self.sources.items():
+            try:
+                if file_sha256(path) != digest:
+                    return True
+            except FileNotFoundError:
+                continue
+        return False
+
+
+def _fold_scaler(feature, threshold, is_leaf, scaler, input_dtype=np.float32):
+    """Map thresholds from scaled feature space back to raw feature space
+
+    sklearn trees compare input_dtype(scaler.transform(x)) <= threshold (float32 for the
+    classic trees, float64 for HistGradientBoosting), so the exact raw-space boundary is the
+    largest x that still satisfies that test. It lies within a few ulps of
+    threshold * scale + mean and is located by bisection.
+    """
+    if scaler is None:
+        return threshold
+    n_features = len(scaler.mean_) if scaler.mean_ is not None else len(scaler.scale_)
+    scale = np.ones(n_features) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+    mean = np.zeros(n_features) if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+    scale, mean = scale[feature], mean[feature]
+
+    def passes(x):
+        return ((x - mean) / scale).astype(input_dtype) <= threshold
+
+    guess = threshold * scale + mean
+    delta = scale * (np.abs(threshold) + 1.0) * 2.0 ** -16
+    lo, hi = guess - delta, guess + delta
+    # Widen until the bracket [lo, hi] contains the boundary for every node
+    while True:
+        bad_lo, bad_hi = ~passes(lo), passes(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        delta = delta * 2
+        lo = np.where(bad_lo, lo - delta, lo)
+        hi = np.where(bad_hi, hi + delta, hi)
+
+    for _ in range(128):
+        mid = lo + (hi - lo) / 2
+        ok = passes(mid)
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+        if np.all(hi <= np.nextafter(lo, np.inf)):
+            break
+    return np.where(is_leaf, threshold, lo)
+
+
+def _sklearn_tree(tree, value):
+    """(children_left, children_right, feature, threshold, value, max_depth) of an sklearn Tree"""
+    return tree.children_left, tree.children_right, tree.feature, tree.threshold, value, tree.max_depth
+
+
+def _sklearn_cover(trees):
+    return np.concatenate([np.asarray(tree.weighted_n_node_samples, dtype=np.float64) for tree in trees])
+
+
+def _hist_tree(predictor):
+    """Same layout for a HistGradientBoosting TreePredictor (leaf values already include shrinkage)"""
+    nodes = predictor.nodes
+    if nodes['is_categorical'].any():
+        raise ValueError('Categorical splits cannot be compiled')
+    is_leaf = nodes['is_leaf'].astype(bool)
+    left = np.where(is_leaf, -1, nodes['left'].astype(np.intp))
+    right = np.where(is_leaf, -1, nodes['right'].astype(np.intp))
+    return left, right, nodes['feature_idx'], nodes['num_threshold'], nodes['value'], int(nodes['depth'].max())
+
+
+def _flatten(trees, scaler, input_dtype=np.float32):
+    """Concatenate per-tree node arrays into flat arrays with global node indices"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for children_left, children_right, tree_feature, tree_threshold, tree_value, tree_depth in trees:
+        n = len(children_left)
+        idx = np.arange(n)
+        is_leaf = children_left == -1
+
+        feature = np.where(is_leaf, 0, tree_feature).astype(np.intp)
+        threshold = _fold_scaler(feature, np.asarray(tree_threshold, dtype=np.float64), is_leaf, scaler, input_dtype)
+        left = np.where(is_leaf, idx, children_left) + offset
+        right = np.where(is_leaf, idx, children_right) + offset
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left.astype(np.intp))
+        rights.append(right.astype(np.intp))
+        values.append(np.asarray(tree_value, dtype=np.float64))
+        roots.append(offset)
+        max_depth = max(max_depth, tree_depth)
+        offset += n
+
+    return (np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+            np.concatenate(rights), np.concatenate(values), np.asarray(roots, dtype=np.intp), max_depth)
+
+
+def _gain_importances(feature, gain, is_leaf, n_features):
+    """Normalized total split gain per feature (HistGradientBoosting has no feature_importances_)"""
+    totals = np.bincount(feature[~is_leaf], weights=gain[~is_leaf], minlength=n_features)
+    return totals / totals.sum() if totals.sum() > 0 else totals
+
+
+def compile_model(model, scaler=None):
+    """Compile a fitted RandomForest / GradientBoosting / HistGradientBoosting classifier (plus scaler) into a CompiledEnsemble"""
+    if len(model.classes_) != 2:
+        raise ValueError('Only binary classifiers can be compiled')
+
+    if isinstance(model, RandomForestClassifier):
+        def tree_arrays(tree):
+            # Normalize per-node class weights to probabilities (older sklearn stores raw counts)
+            counts = tree.value[:, 0, :]
+            return _sklearn_tree(tree, counts[:, 1] / counts.sum(axis=1))
+
+        arrays = _flatten([tree_arrays(est.tree_) for est in model.estimators_], scaler)
+        return CompiledEnsemble('forest', *arrays, classes=model.classes_,
+                                feature_importances=model.feature_importances_,
+                                cover=_sklearn_cover(est.tree_ for est in model.estimators_))
+
+    if isinstance(model, GradientBoostingClassifier):
+        trees = [_sklearn_tree(est.tree_, est.tree_.value[:, 0, 0] * model.learning_rate)
+                 for est in model.estimators_[:, 0]]
+        arrays = _flatten(trees, scaler)
+        base_score = model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0]
+        return CompiledEnsemble('boosting', *arrays, base_score=base_score, classes=model.classes_,
+                                feature_importances=model.feature_importances_,
+                                cover=_sklearn_cover(est.tree_ for est in model.estimators_[:, 0]))
+
+    if isinstance(model, HistGradientBoostingClassifier):
+        predictors = [iteration[0] for iteration in model._predictors]
+        # HistGradientBoosting compares float64 inputs, so no float32 rounding when folding the scaler
+        arrays = _flatten([_hist_tree(p) for p in predictors], scaler, input_dtype=np.float64)
+        nodes = np.concatenate([p.nodes for p in predictors])
+        importances = _gain_importances(nodes['feature_idx'], nodes['gain'], nodes['is_leaf'].astype(bool),
+                                        model.n_features_in_)
+        base_score = float(np.ravel(model._baseline_prediction)[0])
+        return CompiledEnsemble('boosting', *arrays, base_score=base_score, classes=model.classes_,
+                                feature_importances=importances, cover=nodes['count'].astype(np.float64))
+
+    raise TypeError(f'Cannot compile model of type {type(model).__name__}')
@@ -0,0 +1,103 @@
+"""
+Bounded inference executor with backpressure
+
+Request threads hand their predict_proba call to a fixed pool of inference
+threads instead of running it themselves, and wait for the result. The pool
+size caps how many model calls run at once (so concurrent requests cannot
+oversubscribe the cores), and admission is bounded: once max_workers calls are
+running and max_queue more are waiting, submit() raises Overloaded right away
+so the server can answer 429 with a Retry-After estimate instead of letting
+latency grow without bound.
+
+Like the micro-batcher, the pool is created lazily per process, so it is safe
+to construct before gunicorn forks its workers.
+"""
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised when the inference queue is full; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Inference queue is full, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers=2, max_queue=32, timeout=None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._stats = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'pending': 0,
+                       'total_service_s': 0.0}
+
+    def _executor(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix='inference')
+                    self._pid = os.getpid()
+        return self._pool
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely free: queued work / workers x mean call time"""
+        with self._lock:
+            done = self._stats['completed'] + self._stats['failed']
+            mean = self._stats['total_service_s'] / done if done else 0.0
+            pending = self._stats['pending']
+        return max(1, math.ceil(pending / self.max_workers * mean))
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise Overloaded(self.retry_after())
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['pending'] += 1
+
+        def run():
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._stats['completed' if ok else 'failed'] += 1
+                    self._stats['total_service_s'] += time.perf_counter() - start
+                    self._stats['pending'] -= 1
+                self._slots.release()
+
+        try:
+            return self._executor().submit(run)
+        except BaseException:
+            with self._lock:
+                self._stats['pending'] -= 1
+            self._slots.release()
+            raise
+
+    def run(self, fn, *args):
+        """Submit and wait for the result (raises Overloaded, or TimeoutError after self.timeout)"""
+        return self.submit(fn, *args).result(timeout=self.timeout)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        done = stats['completed'] + stats['failed']
+        return {
+            'pending': stats.pop('pending'),
+            'avg_service_ms': stats.pop('total_service_s') / done * 1000 if done else 0.0,
+            **stats,
+            'config': {'max_workers': self.max_workers, 'max_queue': self.max_queue, 'timeout_s': self.timeout},
+        }
@@ -0,0 +1,177 @@
+"""
+HTTP load test for the ML server
+
+Starts the production server (gunicorn.conf.py) with an increasing number of
+workers and drives /api/predict from several client processes, to show how
+throughput scales across cores. Can also target an already running server.
+
+Usage:
+    python load_test.py                                  # 1, 2, 4, ... workers up to the core count
+    python load_test.py --workers 1,2,4 --clients 16 --duration 10
+    python load_test.py --url http://localhost:3002      # load test a running server
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+def random_patient(rng):
+    """Varied payloads, so the prediction cache does not short-circuit the model"""
+    return {
+        'age': rng.randint(18, 85),
+        'bmi': round(rng.uniform(15, 50), 1),
+        'bp_systolic': rng.randint(80, 200),
+        'fasting_glucose': rng.randint(60, 250),
+        'familyHistory': rng.randint(0, 1),
+        'activityLevel': rng.randint(0, 3),
+        'cholesterol': rng.randint(100, 400),
+        'yearsCondition': rng.randint(0, 30),
+    }
+
+
+def client_worker(args):
+    """Send requests over one keep-alive connection until the deadline; return latencies and errors"""
+    host, port, duration, seed = args
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        body = json.dumps(random_patient(rng))
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/api/predict', body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies, errors
+
+
+def run_load(host, port, clients, duration):
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client_worker, [(host, port, duration, seed) for seed in range(clients)])
+    latencies = np.concatenate([np.asarray(r[0]) for r in results]) * 1000
+    errors = sum(r[1] for r in results)
+    return {
+        'requests': int(len(latencies)),
+        'errors': int(errors),
+        'throughput_rps': len(latencies) / duration,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(host, port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        conn = http.client.HTTPConnection(host, port, timeout=1)
+        try:
+            conn.request('GET', '/api/health')
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        # Not up yet, or up but not healthy (e.g. still loading the model)
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not become ready")
+
+
+def start_server(workers, threads, port):
+    env = dict(os.environ, ML_WORKERS=str(workers), ML_THREADS=str(threads), PORT=str(port), ML_CACHE_SIZE='0')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def format_result(result):
+    """Throughput, latency percentiles and errors of run_load() on one line (n/a when every request failed)"""
+    def ms(key):
+        return f"{result[key]:7.2f} ms" if result[key] is not None else f"{'n/a':>7}   "
+    return (f"{result['throughput_rps']:10.1f} req/s | p50 {ms('p50_ms')} | p95 {ms('p95_ms')} | "
+            f"p99 {ms('p99_ms')} | errors {result['errors']}")
+
+
+def print_row(label, result):
+    print(f"{label:>10} | {format_result(result)}")
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    default_workers = ','.join(str(2 ** i) for i in range(cores.bit_length()) if 2 ** i <= cores)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='load test an already running server instead of starting one')
+    parser.add_argument('--workers', default=default_workers, help='comma-separated worker counts to compare')
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker')
+    parser.add_argument('--clients', type=int, default=2 * cores, help='concurrent client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per measurement')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    print("="*60)
+    print(f"ML SERVER LOAD TEST ({args.clients} clients, {args.duration:.0f}s per run, {cores} cores)")
+    print("="*60)
+
+    results = []
+    if args.url:
+        url = urlparse(args.url)
+        result = run_load(url.hostname, url.port or 80, args.clients, args.duration)
+        print_row('target', result)
+        results.append({'url': args.url, **result})
+    else:
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            port = free_port()
+            server = start_server(workers, args.threads, port)
+            try:
+                wait_until_ready('127.0.0.1', port)
+                result = run_load('127.0.0.1', port, args.clients, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+            baseline = baseline or result['throughput_rps']
+            result['speedup'] = result['throughput_rps'] / baseline if baseline else None
+            print_row(f"{workers} worker{'s' if workers > 1 else ''}", result)
+            results.append({'workers': workers, 'threads': args.threads, **result})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
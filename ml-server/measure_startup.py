@@ -0,0 +1,95 @@
+"""
+Cold-start time and memory of the different model loading paths
+
+Each scenario runs in a fresh interpreter and reports the time to load the model,
+the time of the first prediction and the resident memory (RSS) the load added:
+
+    pickle    joblib.load of diabetes_risk_model.pkl + scaler.pkl (sklearn objects)
+    compiled  pickle load followed by compiling the trees in memory
+    mmap      memory-mapped diabetes_risk_model_compiled.joblib (no unpickling of trees)
+    compact   memory-mapped diabetes_risk_model_compact.joblib (written by export_compact.py)
+
+Usage:
+    python measure_startup.py [--output startup.json]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+SCENARIO_CODE = r'''
+import json, sys, time, warnings
+warnings.filterwarnings('ignore')
+import joblib, numpy as np
+from inference_engine import CompiledEnsemble, compile_model
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+scenario = sys.argv[1]
+row = np.array([[45, 28.5, 135, 115, 1, 1, 200, 0]], dtype=np.float64)
+rss_before = rss_kb()
+start = time.perf_counter()
+if scenario in ('mmap', 'compact'):
+    path = 'diabetes_risk_model_compact.joblib' if scenario == 'compact' else 'diabetes_risk_model_compiled.joblib'
+    predictor = CompiledEnsemble.load(path, mmap_mode='r')
+    predict = predictor.predict_proba
+else:
+    model = joblib.load('diabetes_risk_model.pkl')
+    scaler = joblib.load('scaler.pkl')
+    if scenario == 'compiled':
+        predict = compile_model(model, scaler).predict_proba
+    else:
+        predict = lambda X: model.predict_proba(scaler.transform(X))
+load_s = time.perf_counter() - start
+start = time.perf_counter()
+predict(row)
+first_s = time.perf_counter() - start
+print(json.dumps({'load_ms': load_s * 1000, 'first_prediction_ms': first_s * 1000, 'rss_added_mb': (rss_kb() - rss_before) / 1024}))
+'''
+
+SCENARIOS = ['pickle', 'compiled', 'mmap', 'compact']
+
+
+def run_scenario(scenario, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', SCENARIO_CODE, scenario], capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    # Median over runs for each metric
+    return {key: sorted(r[key] for r in runs)[len(runs) // 2] for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per scenario')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("MODEL COLD START")
+    print("="*60)
+
+    results = {}
+    for scenario in SCENARIOS:
+        try:
+            results[scenario] = run_scenario(scenario, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️ {scenario}: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        r = results[scenario]
+        print(f"{scenario:>9} | load {r['load_ms']:8.1f} ms | first prediction {r['first_prediction_ms']:8.2f} ms | "
+              f"RSS +{r['rss_added_mb']:6.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Versioned model bundles and atomic hot-swapping
+
+A ModelBundle is an immutable (model, scaler, compiled engine, version) set. The
+ModelManager holds the bundle currently serving traffic; a reload builds and warms
+a new bundle in a background thread and then swaps the reference in one step, so
+requests in flight finish on the bundle they started with and nothing is dropped.
+
+The compiled engine walks trees row by row and wins on small inputs, while
+sklearn's vectorized predict_proba overtakes it on large batches. A bundle with
+sklearn_min_rows set serves matrices of at least that many rows with sklearn;
+when the bundle was memory-mapped, the pickles it was compiled from are loaded
+for that on first use.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import traceback
+
+import joblib
+import numpy as np
+
+from explain import TreeExplainer
+from inference_engine import CompiledEnsemble, compile_model, file_sha256
+
+# Representative patients used to warm a new bundle before it takes traffic
+WARMUP_ROWS = np.array([
+    [45, 28.5, 135, 115, 1, 1, 200, 0],
+    [30, 22.0, 115, 90, 0, 3, 180, 0],
+    [65, 33.0, 150, 140, 1, 0, 240, 8],
+], dtype=np.float64)
+
+
+class ModelBundle:
+    """A model + scaler (and optional compiled engine) that always serve together"""
+
+    def __init__(self, version, model=None, scaler=None, engine=None, source='', name='default', sklearn_min_rows=None,
+                 n_jobs=None):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.engine = engine
+        self.source = source
+        self.sklearn_min_rows = sklearn_min_rows
+        self.n_jobs = n_jobs
+        self.loaded_at = time.time()
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+        self._sklearn = None
+        self._sklearn_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.engine is not None or (self.model is not None and self.scaler is not None)
+
+    @property
+    def predictor(self):
+        """The object that serves predictions: the compiled engine, or the sklearn model"""
+        return self.engine if self.engine is not None else self.model
+
+    def sklearn_model(self):
+        """(model, scaler) for sklearn inference, unpickled on first use (None if the pickles are unavailable)"""
+        if self._sklearn is None:
+            with self._sklearn_lock:
+                if self._sklearn is None:
+                    # False marks pickles that cannot be used, so the load is not retried per batch
+                    self._sklearn = self._load_sklearn()
+        return self._sklearn or None
+
+    def _load_sklearn(self):
+        if self.model is not None and self.scaler is not None:
+            return self.model, self.scaler
+        if self.engine is None or self.engine.variant or len(self.engine.sources) != 2:
+            # A compact export serves different trees than the pickles, so they cannot stand in for it
+            return False
+        # Only the exact pickles the artifact was compiled from, not a retrain that has not been swapped in yet
+        model_path, scaler_path = self.engine.sources
+        if not all(os.path.exists(path) and file_sha256(path) == digest for path, digest in self.engine.sources.items()):
+            print(f"⚠️ Large batches stay on the compiled engine: {model_path} / {scaler_path} changed since it was compiled")
+            return False
+        model = joblib.load(model_path)
+        if self.n_jobs is not None and hasattr(model, 'n_jobs'):
+            model.n_jobs = self.n_jobs
+        return model, joblib.load(scaler_path)
+
+    def _sklearn_for(self, n_rows):
+        """(model, scaler) that serve a matrix of n_rows rows, or None for the compiled engine"""
+        if self.engine is None:
+            return self.model, self.scaler
+        if self.sklearn_min_rows and n_rows >= self.sklearn_min_rows:
+            return self.sklearn_model()
+        return None
+
+    def transform(self, features):
+        """Model input for a (n_samples, 8) feature matrix"""
+        features = np.asarray(features, dtype=np.float64)
+        sklearn = self._sklearn_for(len(features))
+        if sklearn is None:
+            # Scaler is folded into the compiled thresholds
+            return features
+        return sklearn[1].transform(features)
+
+    def infer(self, X):
+        """Class probabilities for the output of transform()"""
+        sklearn = self._sklearn_for(len(X))
+        return self.engine.predict_proba(X) if sklearn is None else sklearn[0].predict_proba(X)
+
+    def predict_proba(self, features):
+        return self.infer(self.transform(features))
+
+    def explainer(self):
+        """TreeExplainer for this bundle's trees, built on first use (None if the model cannot be explained)"""
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    # False marks a model that cannot be explained, so the build is not retried per request
+                    self._explainer = self._build_explainer()
+        return self._explainer or None
+
+    def _build_explainer(self):
+        engine = self.engine
+        if engine is None or engine.cover is None:
+            # sklearn serving path, or a compiled artifact saved before node cover was recorded
+            if self.model is None:
+                print("⚠️ Explanations unavailable: the compiled model has no node cover (rerun train_model.py)")
+                return False
+            try:
+                engine = compile_model(self.model, self.scaler)
+            except (TypeError, ValueError) as e:
+                print(f"⚠️ Explanations unavailable: {e}")
+                return False
+        return TreeExplainer(engine)
+
+    def warm_up(self, explain=False):
+        self.predict_proba(WARMUP_ROWS)
+        self.predict_proba(WARMUP_ROWS[:1])
+        if explain and self.explainer() is not None:
+            self.explainer().contributions(WARMUP_ROWS[:1])
+        if self.engine is not None and self.sklearn_min_rows and self.sklearn_model() is not None:
+            model, scaler = self.sklearn_model()
+            model.predict_proba(scaler.transform(WARMUP_ROWS))
+
+    def info(self):
+        info = {
+            'name': self.name,
+            'version': self.version,
+            'source': self.source,
+            'engine': 'compiled' if self.engine is not None else 'sklearn',
+            'loaded_at': self.loaded_at,
+        }
+        if self.engine is not None and self.sklearn_min_rows:
+            info['sklearn_min_rows'] = self.sklearn_min_rows
+        return info
+
+
+def bundle_version(digests):
+    """Short version id derived from the sha256 digests of the model and scaler pickles"""
+    combined = hashlib.sha256()
+    for digest in digests:
+        combined.update(digest.encode())
+    return combined.hexdigest()[:12]
+
+
+def load_bundle(model_path, scaler_path, compiled_path=None, use_engine=True, log=print, n_jobs=None, name='default',
+                sklearn_min_rows=None):
+    """Build a ModelBundle, preferring the memory-mapped compiled artifact over unpickling the forest
+
+    n_jobs overrides the parallelism the model was trained with (train_model.py fits with n_jobs=-1,
+    which would make every predict_proba call start its own threads). Matrices of at least
+    sklearn_min_rows rows are scored with sklearn instead of the compiled engine.
+    """
+    if use_engine and compiled_path and os.path.exists(compiled_path):
+        compiled = CompiledEnsemble.load(compiled_path, mmap_mode='r')
+        if not compiled.is_stale():
+            log(f"✅ Memory-mapped compiled model ({compiled.n_trees} trees, {compiled.n_nodes} nodes)")
+            # Same version as the pickles it was compiled from; fall back to hashing the artifact itself
+            digests = list(compiled.sources.values()) or [file_sha256(compiled_path)]
+            if compiled.variant:
+                # A compact export serves different trees than the pickles, so it gets its own version
+                digests.append(compiled.variant)
+            return ModelBundle(bundle_version(digests), engine=compiled, source=compiled_path, name=name,
+                               sklearn_min_rows=sklearn_min_rows, n_jobs=n_jobs)
+        log(f"⚠️ {compiled_path} does not match {model_path} / {scaler_path}; loading the pickled model instead")
+
+    # Load the trained model and scaler
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    if n_jobs is not None and hasattr(model, 'n_jobs'):
+        model.n_jobs = n_jobs
+    log("✅ Model loaded successfully!")
+
+    engine = None
+    if use_engine:
+        try:
+            engine = compile_model(model, scaler)
+            log(f"✅ Compiled {engine.n_trees} trees ({engine.n_nodes} nodes) for fast inference")
+        except (TypeError, ValueError) as e:
+            log(f"⚠️ Could not compile model, using sklearn predict_proba: {e}")
+    version = bundle_version([file_sha256(model_path), file_sha256(scaler_path)])
+    return ModelBundle(version, model, scaler, engine, source=model_path, name=name, sklearn_min_rows=sklearn_min_rows)
+
+
+class ModelManager:
+    """Holds the active ModelBundle and swaps in reloaded ones atomically"""
+
+    def __init__(self, model_path, scaler_path, compiled_path=None, use_engine=True, on_swap=None, n_jobs=None,
+                 explain=False, name='default', sklearn_min_rows=None):
+        self.name = name  # registry name (see model_registry.py), carried by every bundle this manager loads
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.compiled_path = compiled_path
+        self.use_engine = use_engine
+        self.n_jobs = n_jobs
+        self.explain = explain  # build the explainer while warming a reloaded bundle
+        self.sklearn_min_rows = sklearn_min_rows
+        self.on_swap = on_swap
+        self._bundle = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher_pid = None
+        self._signature = None
+        self.last_reload = None
+
+    def _watched_files(self):
+        return [p for p in (self.model_path, self.scaler_path, self.compiled_path) if p]
+
+    def _file_signature(self):
+        signature = []
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self):
+        return load_bundle(self.model_path, self.scaler_path, self.compiled_path, self.use_engine, n_jobs=self.n_jobs,
+                           name=self.name, sklearn_min_rows=self.sklearn_min_rows)
+
+    def current(self):
+        """The bundle serving traffic; loaded lazily on first use (None if no model files exist)"""
+        bundle = self._bundle
+        if bundle is not None:
+            return bundle
+        with self._load_lock:
+            if self._bundle is None:
+                self._signature = self._file_signature()
+                try:
+                    self._bundle = self._load()
+                except FileNotFoundError:
+                    print("❌ Model files not found. Please run 'python train_model.py' first.")
+                    return None
+            return self._bundle
+
+    def reload(self, wait=False):
+        """Load, warm and swap in a new bundle in the background; returns False if a reload is already running"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._reload, name='model-reload', daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self):
+        started = time.time()
+        previous = self._bundle
+        try:
+            signature = self._file_signature()
+            bundle = self._load()
+            bundle.warm_up(explain=self.explain)
+            # Single reference assignment: requests already holding the old bundle finish on it
+            self._bundle = bundle
+            self._signature = signature
+            if self.on_swap is not None:
+                self.on_swap(previous, bundle)
+            self.last_reload = {
+                'status': 'ok',
+                'previous_version': previous.version if previous else None,
+                'version': bundle.version,
+                'duration_ms': (time.time() - started) * 1000,
+                'finished_at': time.time(),
+            }
+            print(f"🔄 Model reloaded: {self.last_reload['previous_version']} -> {bundle.version}")
+        except Exception as e:
+            traceback.print_exc()
+            self.last_reload = {'status': 'error', 'error': str(e), 'finished_at': time.time()}
+        finally:
+            self._reload_lock.release()
+
+    def start_watcher(self, interval=5.0):
+        """Poll the model files and reload when they change (started once per process, fork-safe)"""
+        if self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+
+        def watch():
+            last_seen = None
+            while True:
+                time.sleep(interval)
+                signature = self._file_signature()
+                # Only reload once the files have stopped changing, so a half-written retrain is never picked up
+                if self._bundle is not None and signature != self._signature and signature == last_seen:
+                    self.reload(wait=True)
+                last_seen = signature
+
+        threading.Thread(target=watch, name='model-watcher', daemon=True).start()
@@ -0,0 +1,220 @@
+"""
+Multiple named models with A/B routing and shadow scoring
+
+The registry holds one ModelManager per named model (each lazily loaded,
+versioned and hot-reloadable on its own). Every request is routed to one of
+them:
+
+    X-Model: <name>         that model, whatever the weights say
+    X-Routing-Key: <key>    a weighted pick that is stable for the key (same patient -> same model)
+    neither                 a weighted random pick
+
+Shadow models never answer requests. After the routed model has answered, the
+request's features are queued for the ShadowScorer, whose background thread
+scores them with every shadow model and reports the result through a callback
+(used for per-model metrics). The queue is bounded; when it is full, shadow jobs
+are dropped and counted instead of slowing requests down.
+
+Models are configured with ML_MODELS, a comma-separated list of
+name=path[+compiled][:weight|:shadow], e.g.
+
+    ML_MODELS="gb=diabetes_risk_model_gb.pkl+diabetes_risk_model_gb_compiled.joblib:10,hgb=diabetes_risk_model_hgb.pkl:shadow"
+
+Weights are percentages of traffic; the 'default' model (diabetes_risk_model.pkl)
+gets the remainder. The optional compiled artifact is memory-mapped instead of
+unpickling and compiling the model, like the default model's.
+"""
+
+import bisect
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+import zlib
+
+DEFAULT_MODEL = 'default'
+
+
+def parse_models(spec):
+    """[(name, path, compiled path or None, weight, shadow)] from 'name=path[+compiled][:weight|:shadow],...'"""
+    entries = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, sep, path = item.partition('=')
+        name, path = name.strip(), path.strip()
+        if not sep or not name or not path:
+            raise ValueError(f"Invalid ML_MODELS entry '{item}' (expected name=path[+compiled][:weight|:shadow])")
+        weight, shadow = 0.0, False
+        head, _, option = path.rpartition(':')
+        if head and option == 'shadow':
+            path, shadow = head, True
+        elif head:
+            try:
+                weight = float(option)
+            except ValueError:
+                pass
+            else:
+                path = head
+        if not 0 <= weight < float('inf'):
+            # NaN included: it would drop out of routing and leave no model to serve
+            raise ValueError(f"Invalid weight for model '{name}': {weight:g}")
+        path, _, compiled_path = path.partition('+')
+        entries.append((name, path.strip(), compiled_path.strip() or None, weight, shadow))
+    return entries
+
+
+def build_registry(default_manager, spec, make_manager):
+    """Registry of the default model plus the ML_MODELS entries; make_manager(name, path, compiled_path) builds a ModelManager"""
+    entries = parse_models(spec)
+    assigned = sum(weight for _, _, _, weight, shadow in entries if not shadow)
+    if assigned > 100:
+        raise ValueError(f'ML_MODELS weights add up to {assigned:g}%, more than 100%')
+    registry = ModelRegistry()
+    registry.add(DEFAULT_MODEL, default_manager, weight=100 - assigned)
+    for name, path, compiled_path, weight, shadow in entries:
+        registry.add(name, make_manager(name, path, compiled_path), weight, shadow)
+    return registry
+
+
+class UnknownModel(ValueError):
+    pass
+
+
+class ModelRegistry:
+    """Named ModelManagers plus the weights that split traffic between them"""
+
+    def __init__(self):
+        self.managers = {}
+        self.weights = {}
+        self.shadows = []
+        self._names = []
+        self._cumulative = []
+
+    def add(self, name, manager, weight=0.0, shadow=False):
+        if name in self.managers:
+            raise ValueError(f"Model '{name}' is registered twice")
+        self.managers[name] = manager
+        if shadow:
+            self.shadows.append(name)
+        else:
+            self.weights[name] = float(weight)
+        self._rebuild()
+
+    def _rebuild(self):
+        names = [name for name, weight in self.weights.items() if weight > 0]
+        total = sum(self.weights[name] for name in names)
+        self._names = names
+        cumulative, running = [], 0.0
+        for name in names:
+            running += self.weights[name] / total
+            cumulative.append(running)
+        self._cumulative = cumulative
+
+    @property
+    def names(self):
+        return list(self.managers)
+
+    def route(self, requested=None, routing_key=None):
+        """Name of the model that serves a request"""
+        if requested:
+            if requested not in self.managers:
+                raise UnknownModel(f"Unknown model '{requested}' (available: {', '.join(self.managers)})")
+            return requested
+        if len(self._names) == 1:
+            return self._names[0]
+        if routing_key:
+            # Stable per key, uniform over keys
+            draw = zlib.crc32(routing_key.encode()) / 2**32
+        else:
+            draw = random.random()
+        return self._names[min(bisect.bisect_right(self._cumulative, draw), len(self._names) - 1)]
+
+    def manager(self, name):
+        return self.managers[name]
+
+    def current(self, name):
+        return self.managers[name].current()
+
+    def start_watchers(self, interval):
+        for manager in self.managers.values():
+            manager.start_watcher(interval)
+
+    def info(self):
+        models = {}
+        for name, manager in self.managers.items():
+            bundle = manager.current()
+            models[name] = {
+                'role': 'shadow' if name in self.shadows else 'primary',
+                'weight': self.weights.get(name, 0.0),
+                'path': manager.model_path,
+                'model': bundle.info() if bundle is not None else None,
+            }
+        return models
+
+
+class ShadowScorer:
+    """Scores queued feature matrices with the shadow models on a background thread
+
+    on_result(name, bundle, proba, primary_proba, seconds) is called for every shadow
+    prediction. Like the micro-batcher, the thread is started lazily per process.
+    """
+
+    def __init__(self, registry, on_result, max_queue=1000):
+        self.registry = registry
+        self.on_result = on_result
+        self.max_queue = max(1, int(max_queue))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._stats = {'queued': 0, 'scored': 0, 'dropped': 0, 'errors': 0}
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(self.max_queue)
+                    threading.Thread(target=self._run, args=(self._queue,), name='shadow-scorer', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def submit(self, features, primary_name, primary_proba):
+        """Queue one request's rows for the shadow models; never blocks"""
+        if not self.registry.shadows:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((features, primary_name, primary_proba))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._lock:
+            self._stats['queued'] += 1
+        return True
+
+    def _run(self, jobs):
+        while True:
+            features, primary_name, primary_proba = jobs.get()
+            for name in self.registry.shadows:
+                if name == primary_name:
+                    continue
+                try:
+                    bundle = self.registry.current(name)
+                    if bundle is None or not bundle.ready:
+                        raise RuntimeError(f"shadow model '{name}' is not loaded")
+                    start = time.perf_counter()
+                    proba = bundle.predict_proba(features)
+                    self.on_result(name, bundle, proba, primary_proba, time.perf_counter() - start)
+                    outcome = 'scored'
+                except Exception:
+                    traceback.print_exc()
+                    outcome = 'errors'
+                with self._lock:
+                    self._stats[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+        stats['max_queue'] = self.max_queue
+        return stats
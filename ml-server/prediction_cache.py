@@ -0,0 +1,130 @@
+"""
+Bounded LRU/TTL cache for model predictions
+
+Entries are keyed on the (optionally quantized) feature tuple. The cache watches
+the model artifacts on disk and drops every entry as soon as any of them changes,
+so a retrained model never serves stale predictions.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def parse_quantization(spec, feature_keys):
+    """Parse 'bmi=0.1,fasting_glucose=1' into a per-feature step list aligned with feature_keys"""
+    steps = [None] * len(feature_keys)
+    if not spec:
+        return steps
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, step = item.partition('=')
+        name = name.strip()
+        if name not in feature_keys:
+            raise ValueError(f"Unknown feature in cache quantization: '{name}'")
+        step = float(step)
+        if step <= 0:
+            raise ValueError(f"Quantization step for '{name}' must be positive")
+        steps[feature_keys.index(name)] = step
+    return steps
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry TTL and file-change invalidation"""
+
+    def __init__(self, max_size=10000, ttl_seconds=600, quantization=None, watch_files=(), check_interval=1.0):
+        self.max_size = int(max_size)
+        self.ttl = float(ttl_seconds) if ttl_seconds else None
+        self.quantization = list(quantization) if quantization else None
+        self.watch_files = list(watch_files)
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = self._file_signature()
+        self._next_check = time.monotonic() + check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _file_signature(self):
+        signature = []
+        for path in self.watch_files:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def _check_files(self):
+        """Clear the cache if a watched file changed (stat'ed at most once per check_interval)"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._file_signature()
+        if signature != self._signature:
+            self._signature = signature
+            self._entries.clear()
+            self.invalidations += 1
+
+    def key(self, features):
+        """Normalize a feature vector into a hashable cache key, snapping to the quantization grid"""
+        if self.quantization is None:
+            return tuple(float(v) for v in features)
+        return tuple(
+            float(v) if step is None else round(round(float(v) / step) * step, 10)
+            for v, step in zip(features, self.quantization)
+        )
+
+    def get(self, key):
+        with self._lock:
+            self._check_files()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,235 @@
+"""
+Asynchronous, batched prediction log
+
+Request threads append a small tuple per prediction to a bounded in-memory ring
+buffer and return; a background writer thread drains it in batches and appends
+them to a local JSONL file or a SQLite table, so storing predictions never adds
+storage latency to a request.
+
+When the buffer is full, the policy decides:
+    drop_oldest   overwrite the oldest unwritten record (ring buffer, default)
+    drop_newest   discard the new record
+    block         wait up to block_timeout seconds for space, then discard it
+
+Dropped records are counted (stats()['dropped']). The SQLite table has the same
+columns as the Node backend's predictions table plus model_version, latency and an
+empty `outcome` column, so labeled rows can feed incremental_train.py directly.
+
+Like the micro-batcher, the writer thread is started lazily per process, so the
+log is safe to create before gunicorn forks its workers.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class PredictionLog:
+    def __init__(self, path, feature_keys, fmt=None, capacity=10000, batch_size=500, flush_interval=1.0,
+                 policy='drop_oldest', block_timeout=0.05, table='predictions'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown prediction log policy '{policy}' (expected one of: {', '.join(POLICIES)})")
+        self.path = path
+        self.fmt = fmt or ('sqlite' if path.endswith(('.db', '.sqlite', '.sqlite3')) else 'jsonl')
+        self.feature_keys = list(feature_keys)
+        self.capacity = max(1, int(capacity))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.table = table
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._pid = None
+        self._thread = None
+        self._closed = False
+        self._stats = {'logged': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'write_errors': 0,
+                       'total_write_s': 0.0}
+
+    # ============================================
+    # REQUEST PATH
+    # ============================================
+
+    def log(self, endpoint, model_version, features, probability, risk, latency_ms):
+        """Queue one prediction record; never waits on storage (and only up to block_timeout on a full buffer)"""
+        return self.log_batch(endpoint, model_version, [features], [probability], [risk], latency_ms) == 1
+
+    def log_batch(self, endpoint, model_version, features_rows, probabilities, risks, latency_ms):
+        """Queue one record per row under a single lock acquisition; returns how many were accepted"""
+        self._ensure_writer()
+        now = time.time()
+        accepted = 0
+        with self._cond:
+            for features, probability, risk in zip(features_rows, probabilities, risks):
+                if len(self._buffer) >= self.capacity:
+                    if self.policy == 'drop_oldest':
+                        self._buffer.popleft()
+                        self._stats['dropped'] += 1
+                    elif self.policy == 'drop_newest' or not self._wait_for_space():
+                        self._stats['dropped'] += 1
+                        continue
+                self._buffer.append((now, endpoint, model_version, features, probability, risk, latency_ms))
+                accepted += 1
+            self._stats['logged'] += accepted
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return accepted
+
+    def _wait_for_space(self):
+        deadline = time.monotonic() + self.block_timeout
+        self._cond.notify_all()  # wake the writer so it drains now
+        while len(self._buffer) >= self.capacity:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return True
+
+    # ============================================
+    # WRITER
+    # ============================================
+
+    def _ensure_writer(self):
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    # A forked child inherits the parent's unwritten records; they are the parent's to write
+                    self._buffer.clear()
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self):
+        try:
+            writer = self._open_writer()
+        except Exception as e:
+            # Keep draining so producers never block on a log that cannot be written
+            print(f"⚠️ Cannot open prediction log {self.path}: {e}")
+            writer = None
+        while True:
+            with self._cond:
+                # Write full batches right away; a partial one once the flush interval has passed
+                if len(self._buffer) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                batch = [self._buffer.popleft() for _ in range(min(len(self._buffer), self.batch_size))]
+                closed = self._closed
+                self._cond.notify_all()  # space for blocked producers
+            if batch:
+                self._write(writer, batch)
+            if closed and not batch:
+                if writer is not None:
+                    writer.close()
+                return
+
+    def _write(self, writer, batch):
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                raise OSError('log is not open')
+            writer.write(batch)
+            ok = True
+        except Exception as e:
+            ok = False
+            print(f"⚠️ Prediction log write failed ({len(batch)} records dropped): {e}")
+        with self._cond:
+            self._stats['batches'] += 1
+            self._stats['total_write_s'] += time.perf_counter() - start
+            if ok:
+                self._stats['written'] += len(batch)
+            else:
+                self._stats['write_errors'] += 1
+                self._stats['dropped'] += len(batch)
+
+    def _open_writer(self):
+        if self.fmt == 'sqlite':
+            return SQLiteWriter(self.path, self.table, self.feature_keys)
+        return JSONLWriter(self.path, self.feature_keys)
+
+    def close(self, timeout=5.0):
+        """Flush what is buffered and stop the writer (registered with atexit)"""
+        with self._cond:
+            if self._closed or self._pid != os.getpid():
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def pending(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            pending = len(self._buffer)
+        batches = stats['batches']
+        return {
+            'pending': pending,
+            'avg_batch_write_ms': stats.pop('total_write_s') / batches * 1000 if batches else 0.0,
+            **stats,
+            'config': {'path': self.path, 'format': self.fmt, 'capacity': self.capacity,
+                       'batch_size': self.batch_size, 'flush_interval_s': self.flush_interval, 'policy': self.policy},
+        }
+
+
+def _row(record, feature_keys):
+    created_at, endpoint, model_version, features, probability, risk, latency_ms = record
+    return {
+        'created_at': created_at,
+        'endpoint': endpoint,
+        'model_version': model_version,
+        **{key: float(value) for key, value in zip(feature_keys, features)},
+        'risk': int(risk),
+        'probability': float(probability),
+        'latency_ms': float(latency_ms),
+    }
+
+
+class JSONLWriter:
+    """One JSON object per line; each batch is a single O_APPEND write, so workers sharing the file do not interleave"""
+
+    def __init__(self, path, feature_keys):
+        self.feature_keys = feature_keys
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, batch):
+        data = ''.join(json.dumps(_row(record, self.feature_keys)) + '\n' for record in batch).encode()
+        os.write(self.fd, data)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SQLiteWriter:
+    """One transaction per batch; WAL mode lets readers (and other workers) proceed while a batch is written"""
+
+    def __init__(self, path, table, feature_keys):
+        self.feature_keys = feature_keys
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        feature_columns = ''.join(f'"{key}" REAL, ' for key in feature_keys)
+        self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL, '
+            f'endpoint TEXT, model_version TEXT, {feature_columns}risk INTEGER, probability REAL, '
+            f'latency_ms REAL, outcome INTEGER)'
+        )
+        self.columns = ['created_at', 'endpoint', 'model_version', *feature_keys, 'risk', 'probability', 'latency_ms']
+        placeholders = ', '.join('?' * len(self.columns))
+        quoted = ', '.join(f'"{c}"' for c in self.columns)
+        self.insert = f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders})'
+
+    def write(self, batch):
+        rows = [tuple(_row(record, self.feature_keys)[c] for c in self.columns) for record in batch]
+        with self.conn:
+            self.conn.executemany(self.insert, rows)
+
+    def close(self):
+        self.conn.close()
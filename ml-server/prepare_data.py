@@ -11,6 +11,8 @@ import numpy as np
 import urllib.request
 import zipfile
 import os
+from data_loading import FEATURE_COLUMNS, TARGET_COLUMN, write_columnar
+from synthetic_data import generate_dataset
 
 print("="*60)
 print("MEDICAL DATASET DOWNLOADER")
@@ -20,8 +22,8 @@ print("="*60)
 # OPTION 1: Pima Indians Diabetes Dataset
 # ============================================
 
-def download_pima_diabetes():
-    """Download Pima Indians Diabetes Dataset"""
+def download_pima_diabetes(seed=42):
+    """Download Pima Indians Diabetes Dataset; the features it lacks are drawn from a seeded generator"""
     print("\n📥 Downloading Pima Indians Diabetes Dataset...")
     
     url = "https://raw.githubusercontent.com/jbrownlee/Datasets/master/pima-indians-diabetes.data.csv"
@@ -48,12 +50,14 @@ def download_pima_diabetes():
             'diabetes_pedigree': 'family_history'
         })
         
-        # Add missing features
-        df['activity_level'] = np.random.randint(0, 4, len(df))
-        df['cholesterol'] = np.random.normal(200, 40, len(df))
-        df['years_condition'] = np.random.exponential(3, len(df))
+        # Add missing features (seeded like synthetic_data.py, so reruns give the same CSV)
+        rng = np.random.default_rng(seed)
+        df['activity_level'] = rng.integers(0, 4, len(df))
+        df['cholesterol'] = rng.normal(200, 40, len(df))
+        df['years_condition'] = rng.exponential(3, len(df))
         
         df.to_csv('medical_data.csv', index=False)
+        write_columnar('medical_data.csv', df)
         print(f"✅ Downloaded {len(df)} records from Pima Indians Dataset")
         return True
         
@@ -69,41 +73,11 @@ def create_medical_dataset():
     """Create a realistic synthetic dataset based on medical research"""
     print("\n📊 Creating synthetic medical dataset based on medical research...")
     
-    np.random.seed(42)
-    n_samples = 3000
-    
     # Based on medical literature and population health data
-    data = pd.DataFrame({
-        'age': np.random.normal(52, 15, n_samples).clip(18, 85),
-        'bmi': np.random.normal(27, 5, n_samples).clip(15, 50),
-        'bp_systolic': np.random.normal(125, 20, n_samples).clip(80, 200),
-        'fasting_glucose': np.random.normal(108, 35, n_samples).clip(60, 300),
-        'family_history': np.random.binomial(1, 0.4, n_samples),
-        'activity_level': np.random.choice([0, 1, 2, 3], n_samples, p=[0.35, 0.3, 0.25, 0.1]),
-        'cholesterol': np.random.normal(205, 45, n_samples).clip(100, 400),
-        'years_condition': np.random.exponential(3, n_samples).clip(0, 30),
-    })
-    
-    # Calculate risk based on medical criteria
-    risk_score = (
-        (data['age'] > 45) * 15 +
-        (data['bmi'] > 25) * 20 +
-        (data['bmi'] > 30) * 15 +
-        (data['bp_systolic'] > 130) * 20 +
-        (data['fasting_glucose'] > 100) * 25 +
-        (data['fasting_glucose'] > 125) * 25 +
-        (data['family_history'] == 1) * 20 +
-        (data['activity_level'] == 0) * 15 +
-        (data['cholesterol'] > 240) * 10
-    )
-    
-    data['diabetes_risk'] = (risk_score > 50).astype(int)
-    
-    # Add some noise
-    noise = np.random.binomial(1, 0.1, n_samples)
-    data['diabetes_risk'] = (data['diabetes_risk'] + noise) % 2
+    data = generate_dataset(3000, profile='research')
     
     data.to_csv('medical_data.csv', index=False)
+    write_columnar('medical_data.csv', data)
     print(f"✅ Created synthetic dataset with {len(data)} records")
     print(f"   - Positive cases (at risk): {data['diabetes_risk'].sum()} ({data['diabetes_risk'].sum()/len(data)*100:.1f}%)")
     print(f"   - Negative cases: {(1-data['diabetes_risk']).sum()} ({(1-data['diabetes_risk']).sum()/len(data)*100:.1f}%)")
@@ -123,6 +97,8 @@ def load_custom_csv(filepath):
         print(f"\nColumns: {list(df.columns)}")
         print(f"\nData preview:")
         print(df.head())
+        if all(col in df.columns for col in FEATURE_COLUMNS + [TARGET_COLUMN]):
+            write_columnar(filepath)
         return True
     except FileNotFoundError:
         print(f"❌ File not found: {filepath}")
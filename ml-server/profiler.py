@@ -0,0 +1,161 @@
+"""
+On-demand profiling of the running server
+
+Two opt-in tools (enabled with ML_PROFILING=1, admin-only):
+
+    sample_stacks()   statistical stack sampler: every interval_ms, record the Python
+                      stack of each thread that is handling a request (plus the
+                      micro-batcher, inference pool, shadow scorer and prediction
+                      log threads) and return the counts in the collapsed-stack
+                      format read by flamegraph.pl, speedscope and inferno
+    RequestProfile    cProfile of a single request, summarized as pstats text;
+                      model calls it hands to the inference pool are profiled in
+                      the pool thread and merged in
+
+The sampler only reads sys._current_frames(), so the profiled requests run at
+full speed; the cost is one short pass over a few frames per interval. Samples
+are taken whenever the sampler thread gets the GIL, so time inside C code that
+holds the GIL (e.g. sklearn's Cython tree traversal) is attributed to the Python
+frame that called it.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# Name prefixes of threads that are not request handlers but do request work
+# (ThreadPoolExecutor names its threads inference_0, inference_1, ...)
+WORKER_THREAD_PREFIXES = ('micro-batcher', 'inference', 'shadow-scorer', 'prediction-log')
+
+# Only one sampling session per process at a time
+_session_lock = threading.Lock()
+
+# Only one request profile per process at a time: from Python 3.12 cProfile hooks
+# sys.monitoring, which allows a single profiler in the interpreter
+_profile_lock = threading.Lock()
+
+# Idents of threads currently inside a request, maintained by app.py hooks
+_active_threads = set()
+_active_lock = threading.Lock()
+
+
+def request_started():
+    with _active_lock:
+        _active_threads.add(threading.get_ident())
+
+
+def request_finished():
+    with _active_lock:
+        _active_threads.discard(threading.get_ident())
+
+
+def _frame_label(code):
+    path = code.co_filename
+    # Shorten to the package-relative path: .../site-packages/sklearn/utils/validation.py -> sklearn/utils/validation.py
+    marker = 'site-packages' + os.sep
+    if marker in path:
+        path = path.split(marker, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(';', ':')
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def sample_stacks(seconds, interval_ms=5.0, all_threads=False):
+    """Sample for `seconds`; returns (collapsed-stack text, number of sampling passes) or None if already running"""
+    if not _session_lock.acquire(blocking=False):
+        return None
+    try:
+        own = threading.get_ident()
+        counts = Counter()
+        interval = interval_ms / 1000
+        passes = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            if not all_threads:
+                worker_idents = {t.ident for t in threading.enumerate() if t.name.startswith(WORKER_THREAD_PREFIXES)}
+                with _active_lock:
+                    wanted = (_active_threads | worker_idents) - {own}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (not all_threads and ident not in wanted):
+                    continue
+                counts[_collapse(frame)] += 1
+            passes += 1
+            time.sleep(interval)
+        lines = [f"{stack} {count}" for stack, count in counts.most_common()]
+        return '\n'.join(lines) + ('\n' if lines else ''), passes
+    finally:
+        _session_lock.release()
+
+
+class RequestProfile:
+    """cProfile of one request: start() in before_request, summary() in after_request
+
+    start() returns False, and the request runs unprofiled, while another request
+    profile (or any other profiler) is active in this process.
+    """
+
+    def __init__(self, sort='cumulative', limit=30):
+        self.sort = sort
+        self.limit = limit
+        self.profile = cProfile.Profile()
+        self._offloaded = []
+        self._lock = threading.Lock()
+        self._running = False
+
+    def start(self):
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler is active in this interpreter (Python 3.12+)
+            _profile_lock.release()
+            return False
+        self._running = True
+        return True
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self.profile.disable()
+            _profile_lock.release()
+
+    def wrap(self, fn):
+        """fn, profiled in whichever thread runs it (for work handed to the inference pool)"""
+        def profiled(*args):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active in this interpreter; the call shows up in the stack sampler only
+                return fn(*args)
+            try:
+                return fn(*args)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._offloaded.append(profile)
+        return profiled
+
+    def summary(self):
+        self.stop()
+        out = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=out)
+        with self._lock:
+            for profile in self._offloaded:
+                stats.add(profile)
+        stats.sort_stats(self.sort).print_stats(self.limit)
+        return out.getvalue()
@@ -0,0 +1,193 @@
+"""
+Synthetic medical dataset generator
+
+One vectorized generator for every synthetic dataset in the project (training
+fallback, prepare_data.py, download_real_data.py backup), built on
+np.random.Generator instead of the global np.random.seed.
+
+Rows are produced in fixed blocks of SEED_BLOCK_ROWS rows. Block i draws from
+its own substream, SeedSequence(seed).spawn(n_blocks)[i], and a chunk is a whole
+number of blocks, so chunks can be generated in parallel processes and the
+output only depends on (seed, rows, profile), not on the chunk size or the
+number of processes. Chunks are streamed straight to CSV (plus the columnar
+cache next to it) or to the columnar binary format only.
+
+Usage:
+    python synthetic_data.py --rows 10000000 --output big.csv
+    python synthetic_data.py --rows 10000000 --output big.csv --format columns --n-jobs 8
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loading import COLUMN_DTYPES, FEATURE_COLUMNS, TARGET_COLUMN, ColumnarWriter, columnar_path
+
+# Distribution and labelling parameters of the datasets the scripts used to generate separately.
+# Risk points per factor follow medical literature / NHANES population data.
+PROFILES = {
+    # train_model.py fallback
+    'realistic': {
+        'age': (50, 15), 'integer_age': True,
+        'glucose': (105, 30, 250), 'integer_readings': False,
+        'activity_p': [0.3, 0.3, 0.25, 0.15],
+        'cholesterol': (200, 40),
+        'years_condition_points': 10, 'noise': 0.1,
+    },
+    # prepare_data.py option 2
+    'research': {
+        'age': (52, 15), 'integer_age': False,
+        'glucose': (108, 35, 300), 'integer_readings': False,
+        'activity_p': [0.35, 0.3, 0.25, 0.1],
+        'cholesterol': (205, 45),
+        'years_condition_points': 0, 'noise': 0.1,
+    },
+    # download_real_data.py backup when the download fails
+    'backup': {
+        'age': (52, 15), 'integer_age': True,
+        'glucose': (108, 35, 300), 'integer_readings': True,
+        'activity_p': [0.35, 0.3, 0.25, 0.1],
+        'cholesterol': (205, 45),
+        'years_condition_points': 0, 'noise': 0.0,
+    },
+}
+
+DEFAULT_CHUNK_ROWS = 500_000
+# Rows per seeded substream; changing it changes every generated dataset of more rows than this
+SEED_BLOCK_ROWS = 50_000
+RISK_THRESHOLD = 50
+
+
+def generate_chunk(rng, n_rows, profile='realistic'):
+    """One chunk of n_rows patients as a DataFrame with the training columns and compact dtypes"""
+    p = PROFILES[profile]
+    age = rng.normal(*p['age'], n_rows).clip(18, 85)
+    bmi = rng.normal(27, 5, n_rows).clip(15, 50)
+    bp_systolic = rng.normal(125, 20, n_rows).clip(80, 200)
+    glucose_mean, glucose_scale, glucose_max = p['glucose']
+    fasting_glucose = rng.normal(glucose_mean, glucose_scale, n_rows).clip(60, glucose_max)
+    family_history = rng.binomial(1, 0.4, n_rows)
+    activity_level = rng.choice(4, n_rows, p=p['activity_p'])
+    cholesterol = rng.normal(*p['cholesterol'], n_rows).clip(100, 400)
+    years_condition = rng.exponential(3, n_rows).clip(0, 30)
+    if p['integer_age']:
+        age = np.trunc(age)
+    if p['integer_readings']:
+        bp_systolic = np.trunc(bp_systolic)
+        fasting_glucose = np.trunc(fasting_glucose)
+
+    risk_score = (
+        (age > 45) * 15 +
+        (bmi > 25) * 20 +
+        (bmi > 30) * 15 +
+        (bp_systolic > 130) * 20 +
+        (fasting_glucose > 100) * 25 +
+        (fasting_glucose > 125) * 25 +
+        (family_history == 1) * 20 +
+        (activity_level == 0) * 15 +
+        (cholesterol > 240) * 10 +
+        (years_condition > 5) * p['years_condition_points']
+    )
+    y = (risk_score > RISK_THRESHOLD).astype(np.uint8)
+    if p['noise']:
+        # Flip a fraction of labels to make it more realistic
+        y ^= rng.binomial(1, p['noise'], n_rows).astype(np.uint8)
+
+    values = [age, bmi, bp_systolic, fasting_glucose, family_history, activity_level, cholesterol, years_condition, y]
+    return pd.DataFrame({
+        col: np.asarray(v).astype(COLUMN_DTYPES[col], copy=False)
+        for col, v in zip(FEATURE_COLUMNS + [TARGET_COLUMN], values)
+    })
+
+
+def chunk_sizes(n_rows, chunk_rows):
+    full, rest = divmod(n_rows, chunk_rows)
+    return [chunk_rows] * full + ([rest] if rest else [])
+
+
+def _build_chunk(task):
+    """Worker: (block seed sequences, block rows, profile, csv header?) -> (DataFrame, CSV bytes or None)"""
+    seed_seqs, sizes, profile, header = task
+    blocks = [generate_chunk(np.random.default_rng(s), n_rows, profile) for s, n_rows in zip(seed_seqs, sizes)]
+    chunk = pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+    # Formatting CSV text is the expensive part, so it happens in the worker too
+    text = chunk.to_csv(index=False, header=header).encode() if header is not None else None
+    return chunk, text
+
+
+def iter_dataset(n_rows, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, profile='realistic', n_jobs=1, csv=False):
+    """Yield (chunk, csv_bytes) in order; chunks are built by n_jobs processes (-1 = all cores)
+
+    chunk_rows is rounded up to a whole number of SEED_BLOCK_ROWS blocks.
+    """
+    sizes = chunk_sizes(n_rows, SEED_BLOCK_ROWS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    per_chunk = max(1, -(-chunk_rows // SEED_BLOCK_ROWS))
+    tasks = [(seeds[i:i + per_chunk], sizes[i:i + per_chunk], profile, (i == 0) if csv else None)
+             for i in range(0, len(sizes), per_chunk)]
+    n_jobs = multiprocessing.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    if n_jobs == 1 or len(tasks) == 1:
+        yield from map(_build_chunk, tasks)
+        return
+    with multiprocessing.Pool(min(n_jobs, len(tasks))) as pool:
+        # imap keeps the chunk order and only a few chunks in flight
+        yield from pool.imap(_build_chunk, tasks)
+
+
+def generate_dataset(n_rows, seed=42, profile='realistic', chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Whole dataset in memory (small sizes; use write_dataset for large ones)"""
+    chunks = [chunk for chunk, _ in iter_dataset(n_rows, seed, chunk_rows, profile)]
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def write_dataset(path, n_rows, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, profile='realistic', n_jobs=-1, fmt='csv'):
+    """Stream n_rows rows to path (CSV + columnar cache) or to its columnar cache only (fmt='columns')"""
+    writer = ColumnarWriter(path)
+    digest = hashlib.sha256()
+    csv_file = open(path, 'wb') if fmt == 'csv' else None
+    try:
+        for chunk, text in iter_dataset(n_rows, seed, chunk_rows, profile, n_jobs, csv=csv_file is not None):
+            writer.append(chunk)
+            if csv_file is not None:
+                csv_file.write(text)
+                digest.update(text)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    if csv_file is None and os.path.exists(path):
+        # A CSV left over under the same name would make the new columns look stale
+        os.remove(path)
+    writer.commit(digest.hexdigest() if fmt == 'csv' else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000, help='number of patients')
+    parser.add_argument('--output', default='medical_data.csv', help='CSV path (the columnar cache goes next to it)')
+    parser.add_argument('--format', choices=['csv', 'columns'], default='csv',
+                        help="'csv' writes the CSV and its columnar cache, 'columns' only the binary columns")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'rows per chunk (rounded up to whole blocks of {SEED_BLOCK_ROWS})')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='generator processes (-1 = all cores)')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='realistic')
+    args = parser.parse_args()
+
+    print(f"📊 Generating {args.rows} synthetic patients ({args.profile} profile, seed {args.seed})...")
+    start = time.perf_counter()
+    write_dataset(args.output, args.rows, args.seed, args.chunk_rows, args.profile, args.n_jobs, args.format)
+    elapsed = time.perf_counter() - start
+    target = args.output if args.format == 'csv' else columnar_path(args.output)
+    print(f"✅ Wrote {target} in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The ml-server modules are flat scripts, importable from the directory above
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A valid /api/predict payload
+PATIENT = {'age': 45, 'bmi': 28.5, 'bp_systolic': 135, 'fasting_glucose': 115, 'family_history': 1,
+           'activity_level': 1, 'cholesterol': 200, 'years_condition': 0}
+
+
+@pytest.fixture(scope='session')
+def training_data():
+    from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN
+    from synthetic_data import generate_dataset
+
+    frame = generate_dataset(600, seed=3)
+    return frame[FEATURE_COLUMNS].to_numpy(np.float64), frame[TARGET_COLUMN].to_numpy()
+
+
+@pytest.fixture(scope='session')
+def bundle(training_data):
+    """A small compiled forest bundle, as the server would load it"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from inference_engine import compile_model
+    from model_manager import ModelBundle
+
+    X, y = training_data
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0).fit(scaler.transform(X), y)
+    return ModelBundle('test', model, scaler, compile_model(model, scaler))
@@ -0,0 +1,59 @@
+"""The bounded inference pool answers 429 when saturated and 503 when a queued call times out"""
+
+import threading
+
+import pytest
+
+import app
+from conftest import PATIENT
+from inference_executor import BoundedExecutor
+
+
+@pytest.fixture
+def client(monkeypatch, bundle):
+    monkeypatch.setattr(app, 'routed_bundle', lambda: bundle)
+    monkeypatch.setattr(app, 'prediction_cache', None)
+    monkeypatch.setattr(app, 'coalescer', None)
+    return app.app.test_client()
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    """Install a pool and occupy its only worker until the test ends"""
+    release = threading.Event()
+    pools = []
+
+    def install(**kwargs):
+        pool = BoundedExecutor(max_workers=1, **kwargs)
+        pools.append(pool.submit(release.wait))
+        monkeypatch.setattr(app, 'inference_pool', pool)
+        return pool
+
+    yield install
+    release.set()
+    for future in pools:
+        future.result()
+
+
+def test_saturated_pool_returns_429(client, busy_pool):
+    pool = busy_pool(max_queue=0)
+    response = client.post('/api/predict', json=PATIENT)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    response = client.post('/api/predict/batch', json={'patients': [PATIENT, PATIENT]})
+    assert response.status_code == 429
+    assert pool.metrics()['rejected'] == 2
+
+
+def test_pool_timeout_returns_503(client, busy_pool):
+    busy_pool(max_queue=4, timeout=0.05)
+    response = client.post('/api/predict', json=PATIENT)
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Prediction timed out'
+
+
+def test_idle_pool_serves(client, monkeypatch):
+    monkeypatch.setattr(app, 'inference_pool', BoundedExecutor(max_workers=1, max_queue=0))
+    response = client.post('/api/predict', json=PATIENT)
+    assert response.status_code == 200
+    assert 0 <= response.get_json()['probability'] <= 1
@@ -0,0 +1,125 @@
+"""Micro-batcher: concurrent callers share model calls but each gets its own row, errors and timeouts reach them"""
+
+import threading
+
+import numpy as np
+import pytest
+
+import app
+from coalescer import MicroBatcher
+from conftest import PATIENT
+
+N = 16
+
+
+def submit_all(batcher, rows, contexts=None, timeout=5):
+    """Submit every row from its own thread at the same moment; returns (results, errors) by row"""
+    results, errors = [None] * len(rows), [None] * len(rows)
+    barrier = threading.Barrier(len(rows))
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = batcher.submit(rows[i], contexts[i] if contexts else None, timeout=timeout)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def echo(features, context):
+    # One probability row per input row, derived from that row only
+    return np.column_stack([features[:, 0], features[:, 1]])
+
+
+def test_each_caller_gets_its_own_row():
+    calls = []
+
+    def score(features, context):
+        calls.append(len(features))
+        return echo(features, context)
+
+    batcher = MicroBatcher(score, max_batch_size=N, max_wait_ms=200)
+    rows = [[i, 100 + i] for i in range(N)]
+    results, errors = submit_all(batcher, rows)
+    assert errors == [None] * N
+    assert [list(r) for r in results] == rows
+    # Coalesced into fewer model calls than requests
+    assert sum(calls) == N and len(calls) < N
+    metrics = batcher.metrics()
+    assert metrics['requests'] == N and metrics['batches'] == len(calls)
+    assert metrics['max_batch_size'] == max(calls) > 1
+
+
+def test_contexts_are_never_scored_together():
+    seen = []
+
+    def score(features, context):
+        seen.append((context, sorted(features[:, 0].tolist())))
+        return echo(features, context)
+
+    batcher = MicroBatcher(score, max_batch_size=N, max_wait_ms=200)
+    rows = [[i, i] for i in range(N)]
+    contexts = ['a' if i % 2 else 'b' for i in range(N)]
+    results, errors = submit_all(batcher, rows, contexts)
+    assert errors == [None] * N
+    assert [r[0] for r in results] == list(range(N))
+    for context, values in seen:
+        assert all(contexts[int(v)] == context for v in values)
+
+
+def test_exception_reaches_every_waiter():
+    def score(features, context):
+        raise ValueError('model exploded')
+
+    batcher = MicroBatcher(score, max_batch_size=N, max_wait_ms=200)
+    results, errors = submit_all(batcher, [[i, i] for i in range(N)])
+    assert results == [None] * N
+    assert all(isinstance(e, ValueError) and str(e) == 'model exploded' for e in errors)
+    assert batcher.metrics()['errors'] == N
+
+    # The batcher thread survives a failed batch
+    batcher.score_fn = echo
+    assert list(batcher.submit([1, 2], timeout=5)) == [1, 2]
+
+
+def test_timeout():
+    release = threading.Event()
+
+    def score(features, context):
+        release.wait()
+        return echo(features, context)
+
+    batcher = MicroBatcher(score, max_wait_ms=0)
+    try:
+        with pytest.raises(TimeoutError, match='Timed out waiting for batched prediction'):
+            batcher.submit([1, 2], timeout=0.05)
+    finally:
+        release.set()
+    # Requests queued behind the slow batch are served once it finishes
+    assert list(batcher.submit([3, 4], timeout=5)) == [3, 4]
+
+
+def test_timeout_returns_503(monkeypatch, bundle):
+    release = threading.Event()
+
+    def score(features, context):
+        release.wait()
+        return context.predict_proba(features)
+
+    monkeypatch.setattr(app, 'routed_bundle', lambda: bundle)
+    monkeypatch.setattr(app, 'prediction_cache', None)
+    monkeypatch.setattr(app, 'inference_pool', None)
+    monkeypatch.setattr(app, 'coalescer', MicroBatcher(score, max_wait_ms=0))
+    monkeypatch.setattr(app, 'COALESCE_TIMEOUT', 0.05)
+    try:
+        response = app.app.test_client().post('/api/predict', json=PATIENT)
+    finally:
+        release.set()
+    assert response.status_code == 503
+    assert response.get_json() == {'error': 'Prediction timed out'}
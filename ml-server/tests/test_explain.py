@@ -0,0 +1,77 @@
+"""TreeExplainer contributions against exact Shapley values by subset enumeration"""
+
+import itertools
+import math
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from explain import TreeExplainer
+from inference_engine import compile_model
+
+N_FEATURES = 5
+
+
+def conditional_expectation(tree, x, known, node=0):
+    """Path-dependent E[tree(x) | x_known]: unknown features follow both children, weighted by training cover"""
+    left, right = tree.children_left[node], tree.children_right[node]
+    if left == -1:
+        value = tree.value[node].ravel()
+        # Classifier trees hold class weights (probability of class 1), regression trees the output itself
+        return value[1] / value.sum() if len(value) == 2 else value[0]
+    feature = tree.feature[node]
+    if feature in known:
+        child = left if x[feature] <= tree.threshold[node] else right
+        return conditional_expectation(tree, x, known, child)
+    cover = tree.weighted_n_node_samples
+    return (cover[left] * conditional_expectation(tree, x, known, left)
+            + cover[right] * conditional_expectation(tree, x, known, right)) / cover[node]
+
+
+def exact_shapley(trees, x, scale):
+    n = len(x)
+    phi = np.zeros(n)
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for size in range(n):
+            weight = math.factorial(size) * math.factorial(n - size - 1) / math.factorial(n)
+            for subset in itertools.combinations(others, size):
+                with_i = sum(conditional_expectation(t, x, set(subset) | {i}) for t in trees)
+                without = sum(conditional_expectation(t, x, set(subset)) for t in trees)
+                phi[i] += weight * (with_i - without)
+    return phi * scale
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, N_FEATURES)) * [10, 5, 20, 15, 1] + [50, 30, 130, 110, 0]
+    y = (X[:, 0] / 10 + X[:, 3] / 15 + rng.normal(size=300) > 12.5).astype(int)
+    return X, y, StandardScaler().fit(X)
+
+
+@pytest.mark.parametrize('kind', ['forest', 'boosting'])
+def test_contributions_match_exact_shapley(data, kind):
+    X, y, scaler = data
+    X_scaled = scaler.transform(X)
+    if kind == 'forest':
+        model = RandomForestClassifier(n_estimators=4, max_depth=4, random_state=0).fit(X_scaled, y)
+        trees, scale = [e.tree_ for e in model.estimators_], 1 / 4
+    else:
+        model = GradientBoostingClassifier(n_estimators=4, max_depth=3, random_state=0).fit(X_scaled, y)
+        trees, scale = [e.tree_ for e in model.estimators_[:, 0]], model.learning_rate
+
+    explainer = TreeExplainer(compile_model(model, scaler))
+    rows = X[:8]
+    base_value, contributions = explainer.explain(rows)
+    for row, row_scaled, phi in zip(rows, scaler.transform(rows), contributions):
+        np.testing.assert_allclose(phi, exact_shapley(trees, row_scaled, scale), atol=1e-9)
+
+    # Additivity: base value plus the contributions is the model output (probability or log-odds)
+    if kind == 'forest':
+        output = model.predict_proba(scaler.transform(rows))[:, 1]
+    else:
+        output = model.decision_function(scaler.transform(rows))
+    np.testing.assert_allclose(base_value + contributions.sum(axis=1), output, atol=1e-9)
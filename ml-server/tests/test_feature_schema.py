@@ -0,0 +1,138 @@
+"""Feature extraction: per-record and vectorized paths agree on values, defaults and errors"""
+
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import PATIENT
+from feature_schema import FEATURES, SCHEMA
+
+# (record, expected error or None); fields not listed come from PATIENT
+CASES = [
+    ({}, None),
+    ({'age': '45'}, None),
+    ({'age': None}, 'age is required'),
+    ({'bmi': 'abc'}, "bmi must be a number, got 'abc'"),
+    ({'bmi': [1]}, 'bmi must be a number, got [1]'),
+    ({'bp_systolic': 301}, 'bp_systolic must be a number between 40 and 300, got 301'),
+    ({'fasting_glucose': 29.9}, 'fasting_glucose must be a number between 30 and 600, got 29.9'),
+    ({'activityLevel': 1.5}, 'activityLevel must be an integer between 0 and 3, got 1.5'),
+    ({'activityLevel': 4}, 'activityLevel must be an integer between 0 and 3, got 4'),
+    ({'age': 0, 'bmi': 80}, None),
+    ({'age': -1, 'bmi': 'x'}, 'age must be a number between 0 and 120, got -1'),
+]
+
+
+def expected_row(rec):
+    """extract() written out: API field, else training column name, else the default"""
+    row = []
+    for f in FEATURES:
+        value = rec.get(f.field, rec.get(f.name))
+        row.append(f.default if value is None else float(value))
+    return row
+
+
+@pytest.mark.parametrize('overrides,error', CASES)
+def test_extract(overrides, error):
+    rec = {**PATIENT, **overrides}
+    if error is None:
+        assert SCHEMA.extract(rec) == expected_row(rec)
+    else:
+        with pytest.raises(ValueError, match=f'^{re.escape(error)}$'):
+            SCHEMA.extract(rec)
+
+
+def test_missing_required_field():
+    rec = dict(PATIENT)
+    del rec['bmi']
+    with pytest.raises(ValueError, match='^bmi is required$'):
+        SCHEMA.extract(rec)
+
+
+def test_defaults_fill_missing_and_null_fields():
+    rec = {f: PATIENT[f] for f in ('age', 'bmi', 'bp_systolic', 'fasting_glucose')}
+    rec['cholesterol'] = None
+    row = SCHEMA.extract(rec)
+    assert row[4:] == [1.0, 0.0, 200.0, 0.0]
+
+
+def test_api_and_training_names_are_equivalent():
+    api = {f.field: PATIENT[f.name] for f in FEATURES}
+    assert SCHEMA.extract(api) == SCHEMA.extract(PATIENT)
+
+
+def test_record_must_be_an_object():
+    with pytest.raises(ValueError, match='JSON object'):
+        SCHEMA.extract([45, 28.5])
+
+
+def batch():
+    return [{**PATIENT, **overrides} for overrides, _ in CASES]
+
+
+def expected_batch():
+    rows = [(i, expected_row(rec)) for i, (rec, (_, error)) in enumerate(zip(batch(), CASES)) if error is None]
+    errors = [{'index': i, 'error': error} for i, (_, error) in enumerate(CASES) if error is not None]
+    return np.array([row for _, row in rows]), [i for i, _ in rows], errors
+
+
+def test_extract_records_matches_single_extraction():
+    X, valid, errors = SCHEMA.extract_records(batch())
+    expected_X, expected_valid, expected_errors = expected_batch()
+    np.testing.assert_array_equal(X, expected_X)
+    assert valid == expected_valid
+    assert errors == expected_errors
+
+
+def test_extract_columns_matches_records():
+    records = batch()
+    columns = {f.field: [rec.get(f.field, rec.get(f.name)) for rec in records] for f in FEATURES}
+    X, valid, errors = SCHEMA.extract_columns(columns)
+    expected_X, expected_valid, expected_errors = SCHEMA.extract_records(records)
+    np.testing.assert_array_equal(X, expected_X)
+    assert valid == expected_valid
+    assert errors == expected_errors
+
+
+def test_extract_columns_from_dataframe():
+    records = batch()
+    # A float column reports 4 as 4.0, so only the messages up to the value are compared
+    frame = pd.DataFrame({f.name: [rec.get(f.field, rec.get(f.name)) for rec in records] for f in FEATURES})
+    X, valid, errors = SCHEMA.extract_columns(frame)
+    expected_X, expected_valid, expected_errors = SCHEMA.extract_records(records)
+    np.testing.assert_array_equal(X, expected_X)
+    assert valid == expected_valid
+    assert [(e['index'], e['error'].split(', got')[0]) for e in errors] == \
+        [(e['index'], e['error'].split(', got')[0]) for e in expected_errors]
+
+
+def test_extract_columns_defaults_for_missing_columns():
+    columns = {field: [PATIENT[field]] * 3 for field in ('age', 'bmi', 'bp_systolic', 'fasting_glucose')}
+    columns['cholesterol'] = [None, 250, None]
+    X, valid, errors = SCHEMA.extract_columns(columns)
+    assert valid == [0, 1, 2] and errors == []
+    np.testing.assert_array_equal(X[:, 4:], [[1, 0, 200, 0], [1, 0, 250, 0], [1, 0, 200, 0]])
+
+
+def test_extract_columns_missing_required_column():
+    columns = {field: [PATIENT[field]] * 2 for field in ('age', 'bp_systolic', 'fasting_glucose')}
+    X, valid, errors = SCHEMA.extract_columns(columns)
+    assert X.shape == (0, len(SCHEMA)) and valid == []
+    assert errors == [{'index': 0, 'error': 'bmi is required'}, {'index': 1, 'error': 'bmi is required'}]
+
+
+def test_extract_columns_rejects_ragged_columns():
+    with pytest.raises(ValueError, match='same length'):
+        SCHEMA.extract_columns({'age': [45, 50], 'bmi': [28.5]}, n_rows=2)
+
+
+def test_validate_flags_range_nan_and_non_integers():
+    X = np.tile(SCHEMA.extract(PATIENT), (4, 1))
+    X[1, 0] = np.nan
+    X[2, 1] = 81
+    X[3, 5] = 2.5
+    bad = SCHEMA.validate(X)
+    assert bad.sum() == 3
+    assert bad[1, 0] and bad[2, 1] and bad[3, 5]
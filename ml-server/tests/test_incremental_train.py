@@ -0,0 +1,54 @@
+"""Incremental training on the prediction log: outcomes filled in after a run are trained on by the next one"""
+
+import json
+import sqlite3
+import sys
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+import incremental_train
+from feature_schema import FEATURE_COLUMNS, SCHEMA, TARGET_COLUMN
+from prediction_log import PredictionLog
+from synthetic_data import generate_dataset
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['incremental_train.py', *args])
+    incremental_train.main()
+    with open('incremental_state.json') as f:
+        return json.load(f)
+
+
+def test_rows_labeled_after_a_run_are_trained_on(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = generate_dataset(300, seed=1)
+    X, y = data[FEATURE_COLUMNS].to_numpy(np.float64), data[TARGET_COLUMN].to_numpy()
+    scaler = StandardScaler().fit(X[:200])
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X[:200]), y[:200])
+    joblib.dump(model, incremental_train.MODEL_PATH)
+    joblib.dump(scaler, incremental_train.SCALER_PATH)
+
+    # 90 served predictions land in the log with an empty outcome
+    log = PredictionLog(str(tmp_path / 'predictions.db'), SCHEMA.names, batch_size=10)
+    log.log_batch('/api/predict/batch', 'v1', X[200:290].tolist(), [0.5] * 90, [0] * 90, 1.0)
+    log.close()
+
+    with sqlite3.connect(tmp_path / 'predictions.db') as conn:
+        # Outcomes arrive for two thirds of the rows, interleaved with the ones still unknown
+        conn.execute('UPDATE predictions SET outcome = id % 2 WHERE id % 3 != 0')
+    args = ('--sqlite', 'predictions.db', '--label-column', 'outcome', '--min-rows', '10', '--add-estimators', '2')
+    state = run(monkeypatch, *args)
+    assert state['cursor'] == 90
+    assert state['history'][-1]['rows'] == 60
+    assert state['pending'] == list(range(3, 91, 3))
+
+    with sqlite3.connect(tmp_path / 'predictions.db') as conn:
+        conn.execute('UPDATE predictions SET outcome = id % 2 WHERE outcome IS NULL')
+    state = run(monkeypatch, *args)
+    assert state['history'][-1]['rows'] == 30
+    assert state['rows_consumed'] == 90
+    assert state['pending'] == []
+    assert len(joblib.load(incremental_train.MODEL_PATH).estimators_) == 9
@@ -0,0 +1,61 @@
+"""Compiled ensembles against sklearn's predict_proba, including inputs exactly on the folded thresholds"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN
+from inference_engine import compile_model
+from synthetic_data import generate_dataset
+
+TOLERANCE = 1e-9
+
+MODELS = {
+    'forest': lambda: RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0),
+    'boosting': lambda: GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0),
+    'hist_boosting': lambda: HistGradientBoostingClassifier(max_iter=20, max_leaf_nodes=15, random_state=0),
+}
+
+
+@pytest.fixture(scope='module')
+def data():
+    frame = generate_dataset(1500, seed=7)
+    return frame[FEATURE_COLUMNS].to_numpy(np.float64), frame[TARGET_COLUMN].to_numpy()
+
+
+def boundary_rows(engine, X, n_nodes=300, seed=0):
+    """Rows placed exactly on, and one ulp either side of, the raw-space threshold of sampled split nodes"""
+    rng = np.random.default_rng(seed)
+    internal = np.flatnonzero(engine.left != np.arange(engine.n_nodes))
+    rows = []
+    for node in rng.choice(internal, min(n_nodes, len(internal)), replace=False):
+        feature, threshold = engine.feature[node], engine.threshold[node]
+        for value in (np.nextafter(threshold, -np.inf), threshold, np.nextafter(threshold, np.inf)):
+            row = X[rng.integers(len(X))].copy()
+            row[feature] = value
+            rows.append(row)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize('name', sorted(MODELS))
+def test_compiled_matches_sklearn(data, name):
+    X, y = data
+    scaler = StandardScaler().fit(X[:1000])
+    model = MODELS[name]().fit(scaler.transform(X[:1000]), y[:1000])
+    engine = compile_model(model, scaler)
+
+    for rows in (X[1000:], boundary_rows(engine, X)):
+        expected = model.predict_proba(scaler.transform(rows))
+        actual = engine.predict_proba(rows)
+        assert actual.shape == expected.shape
+        assert np.abs(actual - expected).max() <= TOLERANCE
+        np.testing.assert_array_equal(engine.predict(rows), model.predict(scaler.transform(rows)))
+
+
+def test_single_row_matches_batch(data):
+    X, y = data
+    scaler = StandardScaler().fit(X)
+    engine = compile_model(MODELS['forest']().fit(scaler.transform(X), y), scaler)
+    batch = engine.predict_proba(X[:20])
+    np.testing.assert_array_equal(np.vstack([engine.predict_proba(X[i:i + 1]) for i in range(20)]), batch)
@@ -0,0 +1,55 @@
+"""Load test helpers: readiness polling and reporting a run in which every request failed"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import load_test
+
+
+@pytest.fixture
+def health_server():
+    """Server whose /api/health answers 503 until `ready` is set; counts the polls"""
+    state = {'polls': 0, 'ready': False}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state['polls'] += 1
+            self.send_response(200 if state['ready'] else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1], state
+    server.shutdown()
+    server.server_close()
+
+
+def test_wait_until_ready_sleeps_between_unhealthy_polls(health_server):
+    port, state = health_server
+    threading.Timer(0.5, state.__setitem__, ('ready', True)).start()
+    started = time.perf_counter()
+    load_test.wait_until_ready('127.0.0.1', port, timeout=5)
+    assert 0.4 < time.perf_counter() - started < 2
+    # 0.2 s between polls, not a busy loop
+    assert state['polls'] <= 5
+
+
+def test_wait_until_ready_times_out(health_server):
+    port, state = health_server
+    with pytest.raises(RuntimeError, match='did not become ready'):
+        load_test.wait_until_ready('127.0.0.1', port, timeout=0.5)
+    assert state['polls'] <= 4
+
+
+def test_format_result_without_latencies():
+    result = {'throughput_rps': 0.0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'errors': 40}
+    line = load_test.format_result(result)
+    assert 'p50     n/a' in line and 'errors 40' in line
+    assert 'p99    2.50 ms' in load_test.format_result({**result, 'p50_ms': 1.0, 'p95_ms': 2.0, 'p99_ms': 2.5})
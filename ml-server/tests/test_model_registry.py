@@ -0,0 +1,255 @@
+"""ML_MODELS parsing, weighted / header routing and shadow scoring"""
+
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.preprocessing import StandardScaler
+
+import app
+from conftest import PATIENT
+from inference_engine import compile_model
+from model_manager import ModelBundle
+from model_registry import DEFAULT_MODEL, ModelRegistry, ShadowScorer, UnknownModel, build_registry, parse_models
+
+ROW = np.array([[45, 28.5, 135, 115, 1, 1, 200, 0]], dtype=np.float64)
+HALF = np.array([[0.5, 0.5]])
+
+
+class StaticManager:
+    """Stands in for a ModelManager that has already loaded its bundle"""
+
+    def __init__(self, bundle, model_path='model.pkl'):
+        self.bundle = bundle
+        self.model_path = model_path
+
+    def current(self):
+        return self.bundle
+
+    def start_watcher(self, interval):
+        pass
+
+
+def named(bundle, name):
+    return ModelBundle(f'{name}-v1', bundle.model, bundle.scaler, bundle.engine, name=name)
+
+
+def registry_of(weights):
+    registry = ModelRegistry()
+    for name, weight in weights.items():
+        registry.add(name, StaticManager(name), weight)
+    return registry
+
+
+# ============================================
+# PARSING
+# ============================================
+
+def test_parse_models():
+    spec = ('gb=gb.pkl+gb_compiled.joblib:10, hgb=hgb.pkl:shadow,rf=rf.pkl,'
+            'c=c.pkl+c_compiled.joblib:shadow,w=w.pkl:2.5,')
+    assert parse_models(spec) == [
+        ('gb', 'gb.pkl', 'gb_compiled.joblib', 10.0, False),
+        ('hgb', 'hgb.pkl', None, 0.0, True),
+        ('rf', 'rf.pkl', None, 0.0, False),
+        ('c', 'c.pkl', 'c_compiled.joblib', 0.0, True),
+        ('w', 'w.pkl', None, 2.5, False),
+    ]
+    assert parse_models('') == []
+
+
+def test_parse_models_keeps_colons_that_are_not_options():
+    assert parse_models(r'win=C:\models\m.pkl') == [('win', r'C:\models\m.pkl', None, 0.0, False)]
+
+
+@pytest.mark.parametrize('spec,error', [
+    ('gb', 'Invalid ML_MODELS entry'),
+    ('gb=', 'Invalid ML_MODELS entry'),
+    ('=gb.pkl', 'Invalid ML_MODELS entry'),
+    ('gb=gb.pkl:-5', "Invalid weight for model 'gb'"),
+    ('gb=gb.pkl:nan', "Invalid weight for model 'gb'"),
+    ('gb=gb.pkl:inf', "Invalid weight for model 'gb'"),
+])
+def test_parse_models_errors(spec, error):
+    with pytest.raises(ValueError, match=error):
+        parse_models(spec)
+
+
+def make_manager(name, path, compiled_path):
+    manager = StaticManager(name, path)
+    manager.compiled_path = compiled_path
+    return manager
+
+
+def test_build_registry_gives_default_the_remainder():
+    spec = 'a=a.pkl:10,b=b.pkl+b.joblib:30,s=s.pkl:shadow'
+    registry = build_registry(StaticManager(DEFAULT_MODEL), spec, make_manager)
+    assert registry.names == [DEFAULT_MODEL, 'a', 'b', 's']
+    assert registry.weights == {DEFAULT_MODEL: 60.0, 'a': 10.0, 'b': 30.0}
+    assert registry.shadows == ['s']
+    assert registry.manager('b').compiled_path == 'b.joblib'
+    np.testing.assert_allclose(registry._cumulative, [0.6, 0.7, 1.0])
+
+
+@pytest.mark.parametrize('spec,error', [
+    ('a=a.pkl:60,b=b.pkl:50', 'more than 100%'),
+    ('default=other.pkl', 'registered twice'),
+    ('a=a.pkl,a=b.pkl', 'registered twice'),
+])
+def test_build_registry_errors(spec, error):
+    with pytest.raises(ValueError, match=error):
+        build_registry(StaticManager(DEFAULT_MODEL), spec, make_manager)
+
+
+# ============================================
+# ROUTING
+# ============================================
+
+def test_weights_are_normalized():
+    # Weights are relative: 1:3 routes like 25:75
+    registry = registry_of({'a': 1, 'b': 3, 'off': 0})
+    counts = Counter(registry.route(routing_key=f'patient-{i}') for i in range(20000))
+    assert set(counts) == {'a', 'b'}
+    assert counts['a'] / 20000 == pytest.approx(0.25, abs=0.02)
+
+
+def test_random_pick_follows_the_cumulative_weights(monkeypatch):
+    registry = registry_of({'a': 25, 'b': 75})
+    for draw, expected in [(0.0, 'a'), (0.2499, 'a'), (0.25, 'b'), (0.9999, 'b')]:
+        monkeypatch.setattr('random.random', lambda: draw)
+        assert registry.route() == expected
+
+
+def test_routing_key_is_stable():
+    registry = registry_of({'a': 50, 'b': 50})
+    assert len({registry.route(routing_key='patient-42') for _ in range(50)}) == 1
+
+
+def test_header_overrides_weights():
+    registry = registry_of({'a': 100, 'b': 0})
+    assert registry.route() == 'a'
+    assert registry.route('b', routing_key='patient-1') == 'b'
+    with pytest.raises(UnknownModel, match="Unknown model 'c'"):
+        registry.route('c')
+
+
+@pytest.fixture
+def client(monkeypatch, bundle):
+    registry = ModelRegistry()
+    registry.add('a', StaticManager(named(bundle, 'a')), 50)
+    registry.add('b', StaticManager(named(bundle, 'b')), 50)
+    monkeypatch.setattr(app, 'registry', registry)
+    monkeypatch.setattr(app, 'WATCH_MODEL', False)
+    monkeypatch.setattr(app, 'prediction_cache', None)
+    monkeypatch.setattr(app, 'coalescer', None)
+    monkeypatch.setattr(app, 'inference_pool', None)
+    monkeypatch.setattr(app, 'shadow_scorer', None)
+    return app.app.test_client()
+
+
+def test_app_routes_by_header_and_key(client):
+    for name in 'ab':
+        response = client.post('/api/predict', json=PATIENT, headers={'X-Model': name})
+        assert response.status_code == 200 and response.get_json()['model'] == name
+    served = {client.post('/api/predict', json=PATIENT, headers={'X-Routing-Key': 'p1'}).get_json()['model']
+              for _ in range(10)}
+    assert len(served) == 1
+    for path, payload in [('/api/predict', PATIENT), ('/api/predict/batch', [PATIENT])]:
+        response = client.post(path, json=payload, headers={'X-Model': 'nope'})
+        assert response.status_code == 400
+        assert "Unknown model 'nope'" in response.get_json()['error']
+
+
+# ============================================
+# SHADOW SCORING
+# ============================================
+
+@pytest.fixture(scope='module')
+def shadow_bundle(training_data):
+    X, y = training_data
+    scaler = StandardScaler().fit(X)
+    model = GradientBoostingClassifier(n_estimators=10, max_depth=3, random_state=0).fit(scaler.transform(X), y)
+    return ModelBundle('gb-v1', model, scaler, compile_model(model, scaler), name='gb')
+
+
+def wait_for(scorer, count, timeout=5):
+    """Stats once the background thread has handled count shadow predictions"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = scorer.stats()
+        if stats['scored'] + stats['errors'] >= count:
+            return stats
+        time.sleep(0.01)
+    raise AssertionError(f'shadow scorer did not finish: {scorer.stats()}')
+
+
+def test_shadow_scores_match_the_shadow_model(bundle, shadow_bundle, training_data):
+    registry = ModelRegistry()
+    registry.add(DEFAULT_MODEL, StaticManager(bundle), 100)
+    registry.add('gb', StaticManager(shadow_bundle), shadow=True)
+    results = []
+    scorer = ShadowScorer(registry, lambda *args: results.append(args))
+
+    X = training_data[0][:50]
+    primary = bundle.predict_proba(X)
+    assert scorer.submit(X, DEFAULT_MODEL, primary)
+    assert scorer.submit(X[:1], DEFAULT_MODEL, primary[:1])
+    stats = wait_for(scorer, 2)
+    assert stats['queued'] == 2 and stats['scored'] == 2 and stats['errors'] == 0
+
+    (name, used, proba, primary_proba, seconds), single = results
+    assert name == 'gb' and used is shadow_bundle and seconds >= 0
+    # Same probabilities as scoring the rows with the shadow model directly, next to the served ones
+    np.testing.assert_array_equal(proba, shadow_bundle.predict_proba(X))
+    np.testing.assert_array_equal(primary_proba, primary)
+    np.testing.assert_array_equal(single[2], shadow_bundle.predict_proba(X[:1]))
+    assert scorer.stats()['pending'] == 0
+
+
+def test_shadow_served_by_header_is_not_scored_twice(bundle, shadow_bundle):
+    registry = ModelRegistry()
+    registry.add(DEFAULT_MODEL, StaticManager(bundle), 100)
+    registry.add('gb', StaticManager(shadow_bundle), shadow=True)
+    results = []
+    scorer = ShadowScorer(registry, lambda *args: results.append(args))
+    # Served by the shadow model itself (X-Model: gb): nothing left to compare it with
+    scorer.submit(ROW, 'gb', HALF)
+    scorer.submit(ROW, DEFAULT_MODEL, HALF)
+    wait_for(scorer, 1)
+    assert [r[0] for r in results] == ['gb']
+    assert scorer.stats()['queued'] == 2 and scorer.stats()['scored'] == 1
+
+
+def test_full_shadow_queue_drops_jobs(bundle, shadow_bundle):
+    registry = ModelRegistry()
+    registry.add(DEFAULT_MODEL, StaticManager(bundle), 100)
+    registry.add('gb', StaticManager(shadow_bundle), shadow=True)
+    started, release = threading.Event(), threading.Event()
+
+    def on_result(*args):
+        started.set()
+        release.wait()
+
+    scorer = ShadowScorer(registry, on_result, max_queue=1)
+    try:
+        assert scorer.submit(ROW, DEFAULT_MODEL, HALF)
+        assert started.wait(5)
+        # The worker is busy with the first job: one more fits in the queue, the next is dropped
+        assert scorer.submit(ROW, DEFAULT_MODEL, HALF)
+        assert not scorer.submit(ROW, DEFAULT_MODEL, HALF)
+        stats = scorer.stats()
+        assert stats['queued'] == 2 and stats['dropped'] == 1 and stats['pending'] == 1
+    finally:
+        release.set()
+    assert wait_for(scorer, 2)['scored'] == 2
+
+
+def test_no_shadows_nothing_queued(bundle):
+    registry = ModelRegistry()
+    registry.add(DEFAULT_MODEL, StaticManager(bundle), 100)
+    scorer = ShadowScorer(registry, lambda *args: None)
+    assert not scorer.submit(ROW, DEFAULT_MODEL, HALF)
+    assert scorer.stats()['queued'] == 0
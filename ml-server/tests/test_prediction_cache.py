@@ -0,0 +1,129 @@
+"""Prediction cache: quantized keys, TTL expiry, LRU eviction order, file invalidation and ML_CACHE_SIZE=0"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import prediction_cache
+from feature_schema import FEATURE_COLUMNS
+from prediction_cache import PredictionCache, parse_quantization
+
+ROW = [45, 28.5, 135, 115, 1, 1, 200, 0]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', clock)
+    return clock
+
+
+def with_values(**values):
+    row = list(ROW)
+    for name, value in values.items():
+        row[FEATURE_COLUMNS.index(name)] = value
+    return row
+
+
+def test_parse_quantization():
+    steps = parse_quantization('bmi=0.1, fasting_glucose=1,', FEATURE_COLUMNS)
+    assert steps == [None, 0.1, None, 1.0, None, None, None, None]
+    assert parse_quantization('', FEATURE_COLUMNS) == [None] * len(FEATURE_COLUMNS)
+    with pytest.raises(ValueError, match="Unknown feature"):
+        parse_quantization('weight=1', FEATURE_COLUMNS)
+    with pytest.raises(ValueError, match='must be positive'):
+        parse_quantization('bmi=0', FEATURE_COLUMNS)
+
+
+def test_quantized_rows_share_an_entry():
+    cache = PredictionCache(quantization=parse_quantization('bmi=0.1,fasting_glucose=5', FEATURE_COLUMNS))
+    cache.put(cache.key(with_values(bmi=28.51, fasting_glucose=116)), 'a')
+    # Same grid cell: 28.5 / 115
+    assert cache.get(cache.key(with_values(bmi=28.54, fasting_glucose=114))) == 'a'
+    assert cache.key(with_values(bmi=28.51)) == cache.key(with_values(bmi=28.49))
+    # Neighbouring cells and unquantized features keep rows apart
+    assert cache.get(cache.key(with_values(bmi=28.56, fasting_glucose=116))) is None
+    assert cache.get(cache.key(with_values(bmi=28.51, fasting_glucose=118))) is None
+    assert cache.get(cache.key(with_values(bmi=28.51, fasting_glucose=116, age=46))) is None
+    assert cache.stats()['hits'] == 1
+
+
+def test_unquantized_keys_are_exact():
+    cache = PredictionCache()
+    assert cache.key(ROW) == tuple(float(v) for v in ROW)
+    assert cache.key(with_values(bmi=28.5000001)) != cache.key(ROW)
+    # A tuple of the same values hits the entry stored for the list
+    cache.put(cache.key(ROW), 'a')
+    assert cache.get(cache.key(tuple(ROW))) == 'a'
+
+
+def test_ttl_expiry(clock):
+    cache = PredictionCache(ttl_seconds=10)
+    cache.put('a', 1)
+    clock.now += 9.9
+    assert cache.get('a') == 1
+    clock.now += 0.2
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['size'] == 0 and stats['misses'] == 1
+
+
+def test_no_ttl_never_expires(clock):
+    cache = PredictionCache(ttl_seconds=0)
+    cache.put('a', 1)
+    clock.now += 1e9
+    assert cache.get('a') == 1
+
+
+def test_lru_eviction_order():
+    cache = PredictionCache(max_size=3)
+    for key in 'abc':
+        cache.put(key, key)
+    # A hit makes 'a' the most recently used, so 'b' goes first
+    assert cache.get('a') == 'a'
+    cache.put('d', 'd')
+    assert cache.get('b') is None
+    # Re-putting an existing key refreshes it too
+    cache.put('c', 'c2')
+    cache.put('e', 'e')
+    assert cache.get('a') is None
+    assert [cache.get(key) for key in 'cde'] == ['c2', 'd', 'e']
+    assert cache.stats()['evictions'] == 2 and cache.stats()['size'] == 3
+
+
+def test_zero_size_stores_nothing():
+    cache = PredictionCache(max_size=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_changed_model_file_clears_cache(tmp_path, clock):
+    model = tmp_path / 'model.pkl'
+    model.write_bytes(b'v1')
+    cache = PredictionCache(watch_files=[str(model)], check_interval=1.0)
+    cache.put('a', 1)
+    model.write_bytes(b'v2 retrained')
+    # Files are only stat'ed once per check_interval
+    assert cache.get('a') == 1
+    clock.now += 1.0
+    assert cache.get('a') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_cache_size_zero_disables_app_cache():
+    env = {**os.environ, 'ML_CACHE_SIZE': '0'}
+    code = 'import app; print(app.prediction_cache is None)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)), env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == 'True'
@@ -0,0 +1,118 @@
+"""Prediction log: rows reach SQLite / JSONL on shutdown, full-buffer policies drop what they should"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from feature_schema import FEATURE_COLUMNS
+from prediction_log import PredictionLog
+
+ROWS = [[40 + i, 25.0 + i / 10, 120, 100, i % 2, i % 4, 200, 0] for i in range(25)]
+
+
+def read_sqlite(path):
+    with sqlite3.connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute('SELECT * FROM predictions ORDER BY id')]
+
+
+def test_sqlite_rows_flushed_on_close(tmp_path):
+    path = str(tmp_path / 'predictions.db')
+    # Neither a full batch nor a flush interval comes around before close()
+    log = PredictionLog(path, FEATURE_COLUMNS, batch_size=1000, flush_interval=60)
+    assert log.fmt == 'sqlite'
+    assert log.log('/api/predict', 'v1', ROWS[0], 0.8, 1, 2.5)
+    assert log.log_batch('/api/predict/batch', 'v2', ROWS[1:], [0.1] * 24, [0] * 24, 7.0) == 24
+    assert log.pending() == 25 and log.stats()['written'] == 0
+
+    started = time.perf_counter()
+    log.close()
+    assert time.perf_counter() - started < 5
+    stats = log.stats()
+    assert stats['written'] == 25 and stats['pending'] == 0 and stats['dropped'] == 0
+
+    rows = read_sqlite(path)
+    assert len(rows) == 25
+    assert rows[0]['endpoint'] == '/api/predict' and rows[0]['model_version'] == 'v1'
+    assert (rows[0]['risk'], rows[0]['probability'], rows[0]['latency_ms']) == (1, 0.8, 2.5)
+    assert {row['endpoint'] for row in rows[1:]} == {'/api/predict/batch'}
+    assert [[row[key] for key in FEATURE_COLUMNS] for row in rows] == ROWS
+    # Outcomes are filled in later (see incremental_train.py)
+    assert all(row['outcome'] is None for row in rows)
+
+
+def test_jsonl_rows(tmp_path):
+    path = tmp_path / 'predictions.jsonl'
+    log = PredictionLog(str(path), FEATURE_COLUMNS, batch_size=10, flush_interval=60)
+    log.log_batch('/api/predict/batch', 'v1', ROWS, [0.5] * 25, [1] * 25, 3.0)
+    log.close()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 25
+    assert [[r[key] for key in FEATURE_COLUMNS] for r in records] == ROWS
+    assert log.stats()['batches'] == 3
+
+
+def idle_log(tmp_path, policy):
+    # The writer only wakes for a full batch or after the flush interval, so the buffer stays full
+    return PredictionLog(str(tmp_path / 'p.db'), FEATURE_COLUMNS, capacity=3, batch_size=100, flush_interval=60,
+                         policy=policy)
+
+
+def test_drop_oldest_keeps_the_newest(tmp_path):
+    log = idle_log(tmp_path, 'drop_oldest')
+    assert log.log_batch('/api/predict', 'v1', ROWS[:5], range(5), [0] * 5, 1.0) == 5
+    assert log.stats()['dropped'] == 2 and log.pending() == 3
+    log.close()
+    assert [row['probability'] for row in read_sqlite(tmp_path / 'p.db')] == [2, 3, 4]
+
+
+def test_drop_newest_keeps_the_oldest(tmp_path):
+    log = idle_log(tmp_path, 'drop_newest')
+    assert log.log_batch('/api/predict', 'v1', ROWS[:5], range(5), [0] * 5, 1.0) == 3
+    assert not log.log('/api/predict', 'v1', ROWS[5], 5, 0, 1.0)
+    assert log.stats()['dropped'] == 3
+    log.close()
+    assert [row['probability'] for row in read_sqlite(tmp_path / 'p.db')] == [0, 1, 2]
+
+
+class StuckWriter:
+    """Writer whose first batch hangs until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def write(self, batch):
+        self.release.wait(5)
+        self.batches.append(batch)
+
+    def close(self):
+        pass
+
+
+def test_block_waits_then_drops(tmp_path):
+    log = PredictionLog(str(tmp_path / 'p.db'), FEATURE_COLUMNS, capacity=1, batch_size=1, flush_interval=60,
+                        policy='block', block_timeout=0.1)
+    writer = StuckWriter()
+    log._open_writer = lambda: writer
+    try:
+        # The writer takes the first record and hangs on it; the second fills the buffer
+        assert log.log('/api/predict', 'v1', ROWS[0], 0, 0, 1.0)
+        assert log.log('/api/predict', 'v1', ROWS[1], 1, 0, 1.0)
+        started = time.perf_counter()
+        assert not log.log('/api/predict', 'v1', ROWS[2], 2, 0, 1.0)
+        assert time.perf_counter() - started >= 0.09
+        assert log.stats()['dropped'] == 1
+    finally:
+        writer.release.set()
+    log.close()
+    assert [record[4] for batch in writer.batches for record in batch] == [0, 1]
+    assert log.stats()['written'] == 2
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match="Unknown prediction log policy 'drop_all'"):
+        PredictionLog('p.db', FEATURE_COLUMNS, policy='drop_all')
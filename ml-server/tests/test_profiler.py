@@ -0,0 +1,63 @@
+"""X-Profile requests: profiled one at a time, and never failed by a profiler that cannot start"""
+
+import cProfile
+
+import pytest
+
+import app
+import profiler
+from conftest import PATIENT
+
+
+@pytest.fixture
+def client(monkeypatch, bundle):
+    monkeypatch.setattr(app, 'PROFILING', True)
+    monkeypatch.setattr(app, 'routed_bundle', lambda: bundle)
+    monkeypatch.setattr(app, 'prediction_cache', None)
+    monkeypatch.setattr(app, 'coalescer', None)
+    monkeypatch.setattr(app, 'inference_pool', None)
+    return app.app.test_client()
+
+
+def profiled_predict(client):
+    response = client.post('/api/predict', json=PATIENT, headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_profile_summary(client):
+    data = profiled_predict(client)
+    assert 'function calls' in data['profile']
+    assert 'confidence' in data
+
+
+def test_concurrent_profile_is_skipped(client):
+    active = profiler.RequestProfile()
+    assert active.start()
+    try:
+        assert not profiler.RequestProfile().start()
+        data = profiled_predict(client)
+        assert data['profile'].startswith('skipped')
+        assert 'confidence' in data
+    finally:
+        active.summary()
+    # The lock is released once the active profile is summarized
+    assert 'function calls' in profiled_predict(client)['profile']
+
+
+class ConflictingProfile(cProfile.Profile):
+    """What Python 3.12+ does when another profiler is already registered"""
+
+    def enable(self, *args, **kwargs):
+        raise ValueError('Another profiling tool is already active')
+
+
+def test_profiler_conflict_does_not_fail_the_request(client, monkeypatch):
+    monkeypatch.setattr(profiler.cProfile, 'Profile', ConflictingProfile)
+    data = profiled_predict(client)
+    assert data['profile'].startswith('skipped')
+    monkeypatch.undo()
+    # The failed start released the lock
+    profile = profiler.RequestProfile()
+    assert profile.start()
+    profile.summary()
@@ -0,0 +1,59 @@
+"""Synthetic datasets only depend on (seed, rows, profile), not on the chunk size or the number of processes"""
+
+import numpy as np
+import pytest
+
+import synthetic_data
+from data_loading import load_columnar
+from synthetic_data import generate_dataset, write_dataset
+
+ROWS = 5500
+
+
+def columns(path):
+    """The columnar cache next to path as {column: array}"""
+    return {name: np.asarray(values) for name, values in load_columnar(str(path)).items()}
+
+
+def assert_same_columns(a, b):
+    assert a.keys() == b.keys()
+    for name in a:
+        np.testing.assert_array_equal(a[name], b[name])
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Several seed blocks without generating hundreds of thousands of rows
+    monkeypatch.setattr(synthetic_data, 'SEED_BLOCK_ROWS', 1000)
+
+
+@pytest.mark.parametrize('chunk_rows,n_jobs', [(1000, 2), (2000, 3), (2500, 1), (100_000, 1)])
+def test_same_seed_same_csv(tmp_path, chunk_rows, n_jobs):
+    reference = tmp_path / 'reference.csv'
+    write_dataset(str(reference), ROWS, seed=11, chunk_rows=1000, n_jobs=1)
+    path = tmp_path / 'data.csv'
+    write_dataset(str(path), ROWS, seed=11, chunk_rows=chunk_rows, n_jobs=n_jobs)
+    assert path.read_bytes() == reference.read_bytes()
+    assert_same_columns(columns(path), columns(reference))
+
+
+def test_columns_format_matches_csv(tmp_path):
+    csv_path, columns_path = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    write_dataset(str(csv_path), ROWS, seed=11, chunk_rows=3000, n_jobs=2)
+    write_dataset(str(columns_path), ROWS, seed=11, chunk_rows=1000, n_jobs=1, fmt='columns')
+    assert not columns_path.exists()
+    assert_same_columns(columns(columns_path), columns(csv_path))
+
+
+def test_in_memory_matches_written(tmp_path):
+    path = tmp_path / 'data.csv'
+    write_dataset(str(path), ROWS, seed=11, chunk_rows=2000, n_jobs=2)
+    frame = generate_dataset(ROWS, seed=11, chunk_rows=4000)
+    assert len(frame) == ROWS
+    assert_same_columns({name: frame[name].to_numpy() for name in frame}, columns(path))
+
+
+def test_seed_changes_output():
+    a = generate_dataset(ROWS, seed=1)
+    b = generate_dataset(ROWS, seed=2)
+    assert not np.array_equal(a.to_numpy(), b.to_numpy())
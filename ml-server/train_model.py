@@ -1,294 +1,524 @@
+import argparse
+import hashlib
+import importlib
+import json
+import pickle
+import time
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, roc_curve
-import joblib
-import matplotlib.pyplot as plt
+from evaluation import evaluate_model, fold_scores, print_evaluation, summarize_folds, write_report
+from feature_schema import FEATURE_COLUMNS, SCHEMA, TARGET_COLUMN
+
+# pandas, sklearn, joblib and the data/engine modules are imported where they are used: the CV worker
+# processes import this module to run evaluate_fold and only need numpy plus the estimator's own module.
 
 # ============================================
 # LOAD OR CREATE MEDICAL DATASET
 # ============================================
 
-def create_realistic_dataset(n_samples=2000):
-    """
-    Create a realistic medical dataset based on diabetes/hypertension risk factors
-    Data based on medical research and NHANES (National Health and Nutrition Examination Survey)
-    """
-    np.random.seed(42)
-    
-    # Age distribution (realistic)
-    age = np.random.normal(loc=50, scale=15, size=n_samples)
-    age = np.clip(age, 18, 85).astype(int)
-    
-    # BMI distribution (realistic)
-    bmi = np.random.normal(loc=27, scale=5, size=n_samples)
-    bmi = np.clip(bmi, 15, 50)
-    
-    # Blood Pressure - Systolic (mm Hg)
-    bp_systolic = np.random.normal(loc=125, scale=20, size=n_samples)
-    bp_systolic = np.clip(bp_systolic, 80, 200)
-    
-    # Fasting Glucose (mg/dL)
-    fasting_glucose = np.random.normal(loc=105, scale=30, size=n_samples)
-    fasting_glucose = np.clip(fasting_glucose, 60, 250)
-    
-    # Family History (0 = No, 1 = Yes)
-    family_history = np.random.binomial(1, p=0.4, size=n_samples)
-    
-    # Activity Level (0=Sedentary, 1=Light, 2=Moderate, 3=Very Active)
-    activity_level = np.random.choice([0, 1, 2, 3], size=n_samples, p=[0.3, 0.3, 0.25, 0.15])
-    
-    # Additional features for better prediction
-    # Cholesterol level
-    cholesterol = np.random.normal(loc=200, scale=40, size=n_samples)
-    cholesterol = np.clip(cholesterol, 100, 400)
-    
-    # Years with condition (if any)
-    years_condition = np.random.exponential(scale=3, size=n_samples)
-    years_condition = np.clip(years_condition, 0, 30)
-    
-    # Create target variable based on medical criteria
-    # Risk factors weighted by medical literature
-    risk_score = (
-        (age > 45) * 15 +
-        (bmi > 25) * 20 +
-        (bmi > 30) * 15 +
-        (bp_systolic > 130) * 20 +
-        (fasting_glucose > 100) * 25 +
-        (fasting_glucose > 125) * 25 +
-        (family_history == 1) * 20 +
-        (activity_level == 0) * 15 +
-        (cholesterol > 240) * 10 +
-        (years_condition > 5) * 10
-    )
-    
-    # Convert risk score to binary classification with some randomness
-    threshold = 50
-    y = (risk_score > threshold).astype(int)
-    
-    # Add some random noise to make it more realistic
-    noise = np.random.binomial(1, p=0.1, size=n_samples)
-    y = (y + noise) % 2
-    
-    # Create DataFrame
-    data = pd.DataFrame({
-        'age': age,
-        'bmi': bmi,
-        'bp_systolic': bp_systolic,
-        'fasting_glucose': fasting_glucose,
-        'family_history': family_history,
-        'activity_level': activity_level,
-        'cholesterol': cholesterol,
-        'years_condition': years_condition,
-        'diabetes_risk': y
-    })
-    
-    return data
-
 def load_from_csv(filepath):
-    """Load real medical data from CSV file"""
-    try:
-        data = pd.read_csv(filepath)
-        print(f"✅ Loaded data from {filepath}")
-        return data
-    except FileNotFoundError:
-        print(f"⚠️ CSV file not found. Using synthetic data instead.")
-        return None
-
-# ============================================
-# LOAD OR CREATE DATA
-# ============================================
-
-print("Loading medical data...")
-csv_path = 'medical_data.csv'  # You can replace this with real data
-data = load_from_csv(csv_path)
-
-if data is None:
-    print("Creating realistic synthetic medical dataset...")
-    data = create_realistic_dataset(n_samples=2000)
-    # Save for future use
-    data.to_csv('medical_data.csv', index=False)
-    print("✅ Synthetic data saved to medical_data.csv")
-
-print(f"\nDataset shape: {data.shape}")
-print(f"Data types:\n{data.dtypes}\n")
-print(f"Risk distribution:\n{data['diabetes_risk'].value_counts()}\n")
-
-# ============================================
-# PREPARE DATA
-# ============================================
-
-# Separate features and target
-X = data[['age', 'bmi', 'bp_systolic', 'fasting_glucose', 'family_history', 'activity_level', 'cholesterol', 'years_condition']]
-y = data['diabetes_risk']
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-
-print(f"Training set size: {X_train.shape[0]}")
-print(f"Test set size: {X_test.shape[0]}\n")
-
-# ============================================
-# FEATURE SCALING
-# ============================================
+    """Load real medical data, from its columnar cache when that is up to date with the CSV"""
+    from data_loading import load_dataset
 
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# ============================================
-# TRAIN MODELS
-# ============================================
-
-print("Training Random Forest model...")
-rf_model = RandomForestClassifier(
-    n_estimators=200,
-    max_depth=12,
-    min_samples_split=5,
-    min_samples_leaf=2,
-    random_state=42,
-    n_jobs=-1
-)
-rf_model.fit(X_train_scaled, y_train)
-
-print("Training Gradient Boosting model...")
-gb_model = GradientBoostingClassifier(
-    n_estimators=150,
-    learning_rate=0.1,
-    max_depth=5,
-    min_samples_split=5,
-    min_samples_leaf=2,
-    random_state=42
-)
-gb_model.fit(X_train_scaled, y_train)
+    data = load_dataset(filepath)
+    if data is None:
+        print(f"⚠️ CSV file not found. Using synthetic data instead.")
+    return data
 
 # ============================================
-# EVALUATE MODELS
+# SEARCH SPACE
 # ============================================
 
-print("\n" + "="*60)
-print("RANDOM FOREST MODEL EVALUATION")
-print("="*60)
-
-rf_train_score = rf_model.score(X_train_scaled, y_train)
-rf_test_score = rf_model.score(X_test_scaled, y_test)
-rf_pred = rf_model.predict(X_test_scaled)
-rf_pred_proba = rf_model.predict_proba(X_test_scaled)[:, 1]
-rf_auc = roc_auc_score(y_test, rf_pred_proba)
-
-print(f"Training Accuracy: {rf_train_score:.4f}")
-print(f"Test Accuracy: {rf_test_score:.4f}")
-print(f"ROC-AUC Score: {rf_auc:.4f}\n")
-print("Classification Report:")
-print(classification_report(y_test, rf_pred))
-print("Confusion Matrix:")
-print(confusion_matrix(y_test, rf_pred))
-
-print("\n" + "="*60)
-print("GRADIENT BOOSTING MODEL EVALUATION")
-print("="*60)
-
-gb_train_score = gb_model.score(X_train_scaled, y_train)
-gb_test_score = gb_model.score(X_test_scaled, y_test)
-gb_pred = gb_model.predict(X_test_scaled)
-gb_pred_proba = gb_model.predict_proba(X_test_scaled)[:, 1]
-gb_auc = roc_auc_score(y_test, gb_pred_proba)
-
-print(f"Training Accuracy: {gb_train_score:.4f}")
-print(f"Test Accuracy: {gb_test_score:.4f}")
-print(f"ROC-AUC Score: {gb_auc:.4f}\n")
-print("Classification Report:")
-print(classification_report(y_test, gb_pred))
-print("Confusion Matrix:")
-print(confusion_matrix(y_test, gb_pred))
+# Estimator name -> module it is imported from on first use
+ESTIMATORS = {
+    'RandomForestClassifier': 'sklearn.ensemble',
+    'GradientBoostingClassifier': 'sklearn.ensemble',
+    'HistGradientBoostingClassifier': 'sklearn.ensemble',
+}
+
+# Candidate families and parameter grids; override with --search-space search_space.json (same layout).
+# 'family' decides which diabetes_risk_model_<family>.pkl the best candidate of that family is saved to.
+SEARCH_SPACE = {
+    'random_forest': {
+        'estimator': 'RandomForestClassifier',
+        'family': 'rf',
+        'params': {
+            'n_estimators': [200],
+            'max_depth': [8, 12],
+            'min_samples_split': [5],
+            'min_samples_leaf': [2],
+            'random_state': [42],
+        },
+    },
+    'gradient_boosting': {
+        'estimator': 'GradientBoostingClassifier',
+        'family': 'gb',
+        'params': {
+            'n_estimators': [150],
+            'learning_rate': [0.05, 0.1],
+            'max_depth': [3, 5],
+            'min_samples_split': [5],
+            'min_samples_leaf': [2],
+            'random_state': [42],
+        },
+    },
+    'small_forest': {
+        'estimator': 'RandomForestClassifier',
+        'family': 'rf_small',
+        'params': {
+            'n_estimators': [25, 50],
+            'max_depth': [6, 8],
+            'min_samples_leaf': [2],
+            'random_state': [42],
+        },
+    },
+    'hist_gradient_boosting': {
+        'estimator': 'HistGradientBoostingClassifier',
+        'family': 'hgb',
+        'params': {
+            'max_iter': [100, 200],
+            'learning_rate': [0.05, 0.1],
+            'max_leaf_nodes': [15],
+            'random_state': [42],
+        },
+    },
+}
+
+def expand_search_space(search_space):
+    """Flatten the search space into a list of named candidates"""
+    from sklearn.model_selection import ParameterGrid
+
+    candidates = []
+    for name, spec in search_space.items():
+        if spec['estimator'] not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator '{spec['estimator']}' in search space entry '{name}'")
+        for i, params in enumerate(ParameterGrid(spec['params'])):
+            candidates.append({
+                'name': f"{name}[{i}]",
+                'estimator': spec['estimator'],
+                'family': spec.get('family', name),
+                'params': params,
+            })
+    return candidates
+
+def build_estimator(estimator_name, params, n_jobs=None):
+    estimator = getattr(importlib.import_module(ESTIMATORS[estimator_name]), estimator_name)(**params)
+    if n_jobs is not None and 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=n_jobs)
+    return estimator
+
+def data_hash(X, y):
+    """Content hash of the training data; part of every fold cache key"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return digest.hexdigest()
 
 # ============================================
 # CROSS-VALIDATION
 # ============================================
 
-print("\n" + "="*60)
-print("CROSS-VALIDATION SCORES")
-print("="*60)
-
-rf_cv_scores = cross_val_score(rf_model, X_train_scaled, y_train, cv=5, scoring='roc_auc')
-gb_cv_scores = cross_val_score(gb_model, X_train_scaled, y_train, cv=5, scoring='roc_auc')
-
-print(f"Random Forest CV Scores: {rf_cv_scores}")
-print(f"Random Forest CV Mean: {rf_cv_scores.mean():.4f} (+/- {rf_cv_scores.std():.4f})\n")
-
-print(f"Gradient Boosting CV Scores: {gb_cv_scores}")
-print(f"Gradient Boosting CV Mean: {gb_cv_scores.mean():.4f} (+/- {gb_cv_scores.std():.4f})\n")
-
-# ============================================
-# FEATURE IMPORTANCE
-# ============================================
+def evaluate_fold(data_key, estimator_name, params, fold, n_folds, seed, X, y):
+    """Fit one candidate on one CV fold and score it; cached on disk by (data_key, params, fold)"""
+    from sklearn.model_selection import StratifiedKFold
 
-print("="*60)
-print("FEATURE IMPORTANCE")
-print("="*60)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    train_idx, val_idx = list(splitter.split(X, y))[fold]
 
-feature_names = ['Age', 'BMI', 'Blood Pressure', 'Fasting Glucose', 'Family History', 'Activity Level', 'Cholesterol', 'Years with Condition']
+    # Folds already run in parallel processes, so each estimator stays single-threaded
+    estimator = build_estimator(estimator_name, params, n_jobs=1)
+    start = time.perf_counter()
+    estimator.fit(X[train_idx], y[train_idx])
+    fit_time = time.perf_counter() - start
 
-rf_importance = pd.DataFrame({
-    'feature': feature_names,
-    'importance': rf_model.feature_importances_
-}).sort_values('importance', ascending=False)
+    # One probability pass; every fold metric is derived from it
+    start = time.perf_counter()
+    proba = estimator.predict_proba(X[val_idx])
+    predict_time = time.perf_counter() - start
 
-gb_importance = pd.DataFrame({
-    'feature': feature_names,
-    'importance': gb_model.feature_importances_
-}).sort_values('importance', ascending=False)
+    return {
+        **fold_scores(y[val_idx], proba, estimator.classes_),
+        'fit_time_s': fit_time,
+        'predict_time_ms': predict_time * 1000,
+        'n_val': int(len(val_idx)),
+    }
 
-print("\nRandom Forest Feature Importance:")
-print(rf_importance)
+def run_search(candidates, X, y, n_folds=5, n_jobs=-1, cache_dir='.train_cache', seed=42):
+    """Cross-validate every candidate, running all (candidate, fold) pairs in parallel processes
 
-print("\nGradient Boosting Feature Importance:")
-print(gb_importance)
-
-# ============================================
-# SELECT BEST MODEL
-# ============================================
-
-print("\n" + "="*60)
-print("MODEL SELECTION")
-print("="*60)
-
-if rf_test_score > gb_test_score:
-    print(f"✅ Random Forest selected (Test Accuracy: {rf_test_score:.4f})")
-    best_model = rf_model
-    best_model_name = "Random Forest"
-else:
-    print(f"✅ Gradient Boosting selected (Test Accuracy: {gb_test_score:.4f})")
-    best_model = gb_model
-    best_model_name = "Gradient Boosting"
+    Returns the leaderboard and a summary of the run (timings and per-fold results) for the report.
+    """
+    import pandas as pd
+    from joblib import Memory, Parallel, delayed
+
+    memory = Memory(cache_dir if cache_dir else None, verbose=0)
+    cached_fold = memory.cache(evaluate_fold, ignore=['X', 'y'])
+    key = data_hash(X, y)
+
+    tasks = [(c, fold) for c in candidates for fold in range(n_folds)]
+    cached = 0
+    if cache_dir:
+        cached = sum(cached_fold.check_call_in_cache(key, c['estimator'], c['params'], fold, n_folds, seed, X, y)
+                     for c, fold in tasks)
+    print(f"Running {len(tasks)} folds ({len(candidates)} candidates x {n_folds} folds, {cached} cached)...")
+
+    start = time.perf_counter()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(cached_fold)(key, c['estimator'], c['params'], fold, n_folds, seed, X, y)
+        for c, fold in tasks
+    )
+    wall_time = time.perf_counter() - start
+
+    folds_by_candidate = {}
+    for (candidate, _), result in zip(tasks, results):
+        folds_by_candidate.setdefault(candidate['name'], []).append(result)
+
+    rows = []
+    for candidate in candidates:
+        folds = folds_by_candidate[candidate['name']]
+        rows.append({
+            'candidate': candidate['name'],
+            'estimator': candidate['estimator'],
+            'family': candidate['family'],
+            'params': json.dumps(candidate['params'], sort_keys=True),
+            **summarize_folds(folds),
+            'fit_time_s': float(np.mean([f['fit_time_s'] for f in folds])),
+            'predict_time_ms': float(np.mean([f['predict_time_ms'] for f in folds])),
+        })
+    leaderboard = pd.DataFrame(rows).sort_values('cv_roc_auc', ascending=False).reset_index(drop=True)
+    summary = {
+        'folds': len(tasks),
+        'cached': int(cached),
+        'n_jobs': n_jobs,
+        'wall_time_s': wall_time,
+        # Serial fit + predict time of the folds; divided by wall_time_s it is the speedup of the process pool
+        'fold_time_s': float(sum(r['fit_time_s'] + r['predict_time_ms'] / 1000 for r in results)),
+        'fold_results': folds_by_candidate,
+    }
+    return leaderboard, summary
 
 # ============================================
-# SAVE MODELS
+# SERVING COST
 # ============================================
 
-print("\n" + "="*60)
-print("SAVING MODELS")
-print("="*60)
-
-joblib.dump(rf_model, 'diabetes_risk_model_rf.pkl')
-joblib.dump(gb_model, 'diabetes_risk_model_gb.pkl')
-joblib.dump(best_model, 'diabetes_risk_model.pkl')
-joblib.dump(scaler, 'scaler.pkl')
-
-print("✅ Models saved:")
-print("   - diabetes_risk_model_rf.pkl (Random Forest)")
-print("   - diabetes_risk_model_gb.pkl (Gradient Boosting)")
-print("   - diabetes_risk_model.pkl (Best Model)")
-print("   - scaler.pkl")
-
-print("\n" + "="*60)
-print("🎉 TRAINING COMPLETE!")
-print("="*60)
-print(f"\nBest Model: {best_model_name}")
-print(f"Test Accuracy: {max(rf_test_score, gb_test_score):.4f}")
-print(f"ROC-AUC Score: {max(rf_auc, gb_auc):.4f}")
+def median_latency_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+def serving_cost(model, scaler, X_raw, serving_engine='compiled'):
+    """Serialized size plus single-row and 1k-row latency of the path app.py would serve this model with"""
+    row = X_raw[:1]
+    batch = np.resize(X_raw, (1000, X_raw.shape[1]))
+    cost = {'size_kb': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024}
+
+    cost['sklearn_single_ms'] = median_latency_ms(lambda: model.predict_proba(scaler.transform(row)), 30)
+    cost['sklearn_batch_1k_ms'] = median_latency_ms(lambda: model.predict_proba(scaler.transform(batch)), 5)
+
+    from inference_engine import compile_model
+
+    engine = None
+    if serving_engine == 'compiled':
+        try:
+            engine = compile_model(model, scaler)
+        except (TypeError, ValueError):
+            pass
+    if engine is not None:
+        cost['serving_engine'] = 'compiled'
+        cost['latency_single_ms'] = median_latency_ms(lambda: engine.predict_proba(row), 100)
+        cost['latency_batch_1k_ms'] = median_latency_ms(lambda: engine.predict_proba(batch), 5)
+    else:
+        cost['serving_engine'] = 'sklearn'
+        cost['latency_single_ms'] = cost['sklearn_single_ms']
+        cost['latency_batch_1k_ms'] = cost['sklearn_batch_1k_ms']
+    return cost
+
+def profile_candidates(candidates, leaderboard, X_train_scaled, y_train, X_raw, scaler, serving_engine='compiled'):
+    """Refit every candidate on the full training set and add its serving cost to the leaderboard"""
+    import pandas as pd
+
+    fitted, costs = {}, []
+    for name in leaderboard['candidate']:
+        candidate = candidates[name]
+        model = build_estimator(candidate['estimator'], candidate['params'], n_jobs=-1)
+        model.fit(X_train_scaled, y_train)
+        fitted[name] = model
+        costs.append(serving_cost(model, scaler, X_raw, serving_engine))
+    return fitted, pd.concat([leaderboard, pd.DataFrame(costs, index=leaderboard.index)], axis=1)
+
+def select_model(leaderboard, max_latency_ms=None, max_batch_latency_ms=None, max_size_kb=None):
+    """Best CV ROC-AUC among the candidates that fit the serving budget"""
+    import pandas as pd
+
+    within = pd.Series(True, index=leaderboard.index)
+    if max_latency_ms is not None:
+        within &= leaderboard['latency_single_ms'] <= max_latency_ms
+    if max_batch_latency_ms is not None:
+        within &= leaderboard['latency_batch_1k_ms'] <= max_batch_latency_ms
+    if max_size_kb is not None:
+        within &= leaderboard['size_kb'] <= max_size_kb
+    leaderboard['within_budget'] = within
+
+    if not within.any():
+        print("⚠️ No candidate fits the serving budget; selecting on ROC-AUC alone")
+        return leaderboard.sort_values('cv_roc_auc', ascending=False).iloc[0]
+    return leaderboard[within].sort_values('cv_roc_auc', ascending=False).iloc[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Train and select the diabetes risk model')
+    parser.add_argument('--data', default='medical_data.csv', help='training data CSV')
+    parser.add_argument('--search-space', help='JSON file with the candidate search space (see SEARCH_SPACE)')
+    parser.add_argument('--folds', type=int, default=5, help='cross-validation folds')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='parallel fold processes (-1 = all cores)')
+    parser.add_argument('--cache-dir', default='.train_cache', help="fold result cache directory ('' disables caching)")
+    parser.add_argument('--leaderboard', default='leaderboard.csv', help='where to write the leaderboard')
+    parser.add_argument('--report', default='evaluation_report.json',
+                        help="where to write the JSON evaluation report ('' disables it)")
+    parser.add_argument('--max-latency-ms', type=float, default=5.0, help='serving budget: single-row latency')
+    parser.add_argument('--max-batch-latency-ms', type=float, help='serving budget: latency of a 1000-row batch')
+    parser.add_argument('--max-size-kb', type=float, help='serving budget: serialized model size')
+    parser.add_argument('--serving-engine', choices=['compiled', 'sklearn'], default='compiled',
+                        help='inference path used to measure latency (match ML_ENGINE of the server)')
+    parser.add_argument('--chunksize', type=int, help='stream the CSV in chunks of this many rows (bounded memory)')
+    parser.add_argument('--max-rows', type=int, default=500_000,
+                        help='with --chunksize: train on a uniform sample of at most this many rows')
+    args = parser.parse_args()
+
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from data_loading import load_chunked, write_columnar
+    from inference_engine import compile_model, file_sha256
+    from synthetic_data import generate_dataset
+
+    timings = {}
+    run_start = phase_start = time.perf_counter()
+
+    if args.chunksize:
+        # ============================================
+        # STREAM DATA (large files, bounded memory)
+        # ============================================
+
+        print("Streaming medical data...")
+        X_train, X_test, y_train, y_test, scaler = load_chunked(
+            args.data, chunksize=args.chunksize, max_train_rows=args.max_rows
+        )
+        # Scale the training sample in place; the raw copy is not needed again
+        X_train_scaled = scaler.transform(X_train, copy=False)
+        X_test_scaled = scaler.transform(X_test)
+        print(f"Risk distribution (training sample): {np.bincount(y_train).tolist()}\n")
+    else:
+        # ============================================
+        # LOAD OR CREATE DATA
+        # ============================================
+
+        print("Loading medical data...")
+        csv_path = args.data  # You can replace this with real data
+        data = load_from_csv(csv_path)
+
+        if data is None:
+            print("Creating realistic synthetic medical dataset...")
+            data = generate_dataset(2000, profile='realistic')
+            # Save for future use
+            data.to_csv(csv_path, index=False)
+            write_columnar(csv_path, data)
+            print(f"✅ Synthetic data saved to {csv_path}")
+
+        print(f"\nDataset shape: {data.shape}")
+        print(f"Data types:\n{data.dtypes}\n")
+        print(f"Risk distribution:\n{data[TARGET_COLUMN].value_counts()}\n")
+
+        # ============================================
+        # PREPARE DATA
+        # ============================================
+
+        # Separate features and target (column order from the shared feature schema)
+        X = data[FEATURE_COLUMNS]
+        y = data[TARGET_COLUMN]
+
+        # Rows the server would reject are kept for training, but reported
+        out_of_range = SCHEMA.validate(X.to_numpy(dtype=np.float64))
+        if out_of_range.any():
+            counts = {name: int(n) for name, n in zip(FEATURE_COLUMNS, out_of_range.sum(axis=0)) if n}
+            print(f"⚠️ {int(out_of_range.any(axis=1).sum())} rows have values outside the feature schema ranges: {counts}\n")
+
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+
+        # ============================================
+        # FEATURE SCALING
+        # ============================================
+
+        # Fitted on a bare array, like the chunked path: the server and serving_cost() transform arrays, and a
+        # scaler fitted on a DataFrame would warn about missing feature names on every call
+        X_test = X_test.to_numpy()
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train.to_numpy())
+        X_test_scaled = scaler.transform(X_test)
+        y_train = y_train.to_numpy()
+        y_test = y_test.to_numpy()
+
+    print(f"Training set size: {X_train_scaled.shape[0]}")
+    print(f"Test set size: {X_test_scaled.shape[0]}\n")
+    timings['load_s'] = time.perf_counter() - phase_start
+
+    # ============================================
+    # HYPERPARAMETER SEARCH
+    # ============================================
+
+    print("="*60)
+    print("HYPERPARAMETER SEARCH")
+    print("="*60)
+
+    search_space = SEARCH_SPACE
+    if args.search_space:
+        with open(args.search_space) as f:
+            search_space = json.load(f)
+    candidates = expand_search_space(search_space)
+
+    phase_start = time.perf_counter()
+    leaderboard, search = run_search(candidates, X_train_scaled, y_train, n_folds=args.folds,
+                                     n_jobs=args.n_jobs, cache_dir=args.cache_dir)
+    timings['search_s'] = time.perf_counter() - phase_start
+    print(f"Search finished in {timings['search_s']:.1f}s\n")
+
+    # ============================================
+    # TRAIN MODELS
+    # ============================================
+
+    print("Refitting candidates and measuring serving cost...")
+    phase_start = time.perf_counter()
+    candidates_by_name = {c['name']: c for c in candidates}
+    fitted, leaderboard = profile_candidates(candidates_by_name, leaderboard, X_train_scaled, y_train,
+                                             X_test.astype(np.float64), scaler, args.serving_engine)
+    best_row = select_model(leaderboard, args.max_latency_ms, args.max_batch_latency_ms, args.max_size_kb)
+    timings['profile_s'] = time.perf_counter() - phase_start
+
+    print("\nLeaderboard (cross-validated ROC-AUC, serving cost):")
+    print(leaderboard[['candidate', 'cv_roc_auc', 'cv_roc_auc_std', 'fit_time_s', 'latency_single_ms',
+                       'latency_batch_1k_ms', 'size_kb', 'within_budget']].to_string())
+    leaderboard.to_csv(args.leaderboard, index=False)
+    print(f"\n✅ Leaderboard saved to {args.leaderboard}")
+
+    # Best candidate of each family (by ROC-AUC), saved as diabetes_risk_model_<family>.pkl
+    family_models = {}
+    for family, rows in leaderboard.groupby('family', sort=False):
+        name = rows.sort_values('cv_roc_auc', ascending=False).iloc[0]['candidate']
+        family_models[family] = (candidates_by_name[name], fitted[name])
+
+    # ============================================
+    # EVALUATE MODELS
+    # ============================================
+
+    phase_start = time.perf_counter()
+    evaluations = {}
+    for family, (candidate, model) in family_models.items():
+        evaluations[candidate['name']] = evaluate_model(
+            model, {'training': (X_train_scaled, y_train), 'test': (X_test_scaled, y_test)}
+        )
+        print_evaluation(candidate['name'], evaluations[candidate['name']])
+    timings['evaluate_s'] = time.perf_counter() - phase_start
+
+    # ============================================
+    # FEATURE IMPORTANCE
+    # ============================================
+
+    print("="*60)
+    print("FEATURE IMPORTANCE")
+    print("="*60)
+
+    for family, (candidate, model) in family_models.items():
+        if not hasattr(model, 'feature_importances_'):
+            continue
+        importance = pd.DataFrame({
+            'feature': SCHEMA.display_names,
+            'importance': model.feature_importances_
+        }).sort_values('importance', ascending=False)
+        print(f"\n{candidate['name']} Feature Importance:")
+        print(importance)
+
+    # ============================================
+    # SELECT BEST MODEL
+    # ============================================
+
+    print("\n" + "="*60)
+    print("MODEL SELECTION")
+    print("="*60)
+
+    best_candidate = candidates_by_name[best_row['candidate']]
+    best_model = fitted[best_row['candidate']]
+    best_model_name = best_candidate['name']
+    budget = [f"{label} <= {value:g}" for label, value in (('single-row ms', args.max_latency_ms),
+              ('1k-batch ms', args.max_batch_latency_ms), ('size KB', args.max_size_kb)) if value is not None]
+    print(f"Serving budget: {', '.join(budget) or 'none'}")
+    print(f"✅ {best_model_name} selected (CV ROC-AUC: {best_row['cv_roc_auc']:.4f}, "
+          f"{best_row['latency_single_ms']:.2f} ms/row via {best_row['serving_engine']}, {best_row['size_kb']:.0f} KB)")
+
+    # ============================================
+    # SAVE MODELS
+    # ============================================
+
+    print("\n" + "="*60)
+    print("SAVING MODELS")
+    print("="*60)
+    phase_start = time.perf_counter()
+
+    joblib.dump(scaler, 'scaler.pkl')
+    saved = []
+    for family, (candidate, model) in family_models.items():
+        path = f'diabetes_risk_model_{family}.pkl'
+        joblib.dump(model, path)
+        saved.append(f"{path} ({candidate['name']})")
+        # Memory-mappable copy for serving this family through ML_MODELS (name=path+compiled)
+        compiled_path = f'diabetes_risk_model_{family}_compiled.joblib'
+        try:
+            compile_model(model, scaler).save(compiled_path, sources={
+                path: file_sha256(path),
+                'scaler.pkl': file_sha256('scaler.pkl'),
+            })
+            saved.append(f"{compiled_path} ({candidate['name']}, memory-mappable)")
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ {family} not compiled: {e}")
+    joblib.dump(best_model, 'diabetes_risk_model.pkl')
+
+    # Array-backed copy of the best model (scaler folded in) that app.py memory-maps instead of unpickling
+    compile_model(best_model, scaler).save('diabetes_risk_model_compiled.joblib', sources={
+        'diabetes_risk_model.pkl': file_sha256('diabetes_risk_model.pkl'),
+        'scaler.pkl': file_sha256('scaler.pkl'),
+    })
 
+    print("✅ Models saved:")
+    for line in saved:
+        print(f"   - {line}")
+    print("   - diabetes_risk_model.pkl (Best Model)")
+    print("   - diabetes_risk_model_compiled.joblib (Best Model, memory-mappable)")
+    print("   - scaler.pkl")
+    timings['save_s'] = time.perf_counter() - phase_start
+    timings['total_s'] = time.perf_counter() - run_start
+
+    if args.report:
+        write_report(args.report, {
+            'data': args.data,
+            'train_rows': int(X_train_scaled.shape[0]),
+            'test_rows': int(X_test_scaled.shape[0]),
+            'timings_s': timings,
+            'search': search,
+            'leaderboard': leaderboard.to_dict(orient='records'),
+            'evaluation': evaluations,
+            'selected': best_model_name,
+        })
+        print(f"✅ Evaluation report saved to {args.report}")
+
+    print("\n" + "="*60)
+    print("🎉 TRAINING COMPLETE!")
+    print("="*60)
+    print(f"\nBest Model: {best_model_name}")
+    print(f"CV ROC-AUC Score: {best_row['cv_roc_auc']:.4f}")
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,11 @@ app.get('/api/health', (req, res) => {
   res.json({ status: 'Server is running' })
 })
 
+const numberOrNull = value => {
+  const number = parseFloat(value)
+  return Number.isNaN(number) ? null : number
+}
+
 // ML Model endpoint
 app.post('/api/predict', async (req, res) => {
   try {
@@ -36,15 +41,19 @@ app.post('/api/predict', async (req, res) => {
     const mlResponse = await fetch(`${mlServerUrl}/api/predict`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
+      // Blank or non-numeric fields are sent as null, so the ML server applies its defaults or reports
+      // a missing required field (instead of a range error for a made-up 0); a real 0 is kept
       body: JSON.stringify({
-        age: parseFloat(age) || 0,
-        bmi: parseFloat(bmi) || 0,
-        bp_systolic: parseFloat(bp_systolic) || 0,
-        fasting_glucose: parseFloat(fasting_glucose) || 0,
-        familyHistory: parseFloat(familyHistory) || 1,
-        activityLevel: parseFloat(activityLevel) || 0,
-        cholesterol: parseFloat(cholesterol) || 200,
-        yearsCondition: parseFloat(yearsCondition) || 0
+        age: numberOrNull(age),
+        bmi: numberOrNull(bmi),
+        bp_systolic: numberOrNull(bp_systolic),
+        fasting_glucose: numberOrNull(fasting_glucose),
+        familyHistory: numberOrNull(familyHistory),
+        activityLevel: numberOrNull(activityLevel),
+        cholesterol: numberOrNull(cholesterol),
+        yearsCondition: numberOrNull(yearsCondition),
+        // Per-feature contributions for the result chart
+        explain: true
       })
     })
     if (!mlResponse.ok) {
@@ -54,20 +63,16 @@ app.post('/api/predict', async (req, res) => {
     }
 
     const prediction = await mlResponse.json()
-
-    // log the request and result into the database (if configured)
-    try {
-      await query(
-        `INSERT INTO predictions 
-          (age,bmi,bp_systolic,fasting_glucose,family_history,activity_level,risk,probability,created_at)
-         VALUES (?,?,?,?,?,?,?,?,NOW())`,
-        [age, bmi, bp_systolic, fasting_glucose, familyHistory, activityLevel, prediction.risk, prediction.probability]
-      )
-    } catch (dbErr) {
-      console.warn('Could not log prediction to DB:', dbErr.message)
-    }
-
     res.json(prediction)
+
+    // log the request and result into the database (if configured) after responding,
+    // so a slow or unavailable database never delays the prediction
+    query(
+      `INSERT INTO predictions 
+        (age,bmi,bp_systolic,fasting_glucose,family_history,activity_level,risk,probability,created_at)
+       VALUES (?,?,?,?,?,?,?,?,NOW())`,
+      [age, bmi, bp_systolic, fasting_glucose, familyHistory, activityLevel, prediction.risk, prediction.probability]
+    ).catch(dbErr => console.warn('Could not log prediction to DB:', dbErr.message))
   } catch (error) {
     console.error('Prediction Endpoint Error:', error.message)
     if (error.message.includes('fetch failed')) {
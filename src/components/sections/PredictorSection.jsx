@@ -2,6 +2,11 @@ import { useState } from 'react'
 import { motion } from 'framer-motion'
 import { Activity, ArrowRight, ShieldAlert, ShieldCheck, Trophy, HeartPulse, Utensils, Dumbbell } from 'lucide-react'
 
+const numberOrNull = value => {
+  const number = parseFloat(value)
+  return Number.isNaN(number) ? null : number
+}
+
 export default function PredictorSection() {
   const [formData, setFormData] = useState({
     age: '',
@@ -54,13 +59,14 @@ export default function PredictorSection() {
       const response = await fetch(`${baseUrl}/api/predict`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        // Blank fields go out as null, so the server reports them as required rather than out of range
         body: JSON.stringify({
-          age: parseFloat(formData.age) || 0,
-          bmi: parseFloat(formData.bmi) || 0,
-          bp_systolic: parseFloat(formData.bp_systolic) || 0,
-          fasting_glucose: parseFloat(formData.fasting_glucose) || 0,
-          familyHistory: parseFloat(formData.familyHistory) || 1,
-          activityLevel: parseFloat(formData.activityLevel) || 0,
+          age: numberOrNull(formData.age),
+          bmi: numberOrNull(formData.bmi),
+          bp_systolic: numberOrNull(formData.bp_systolic),
+          fasting_glucose: numberOrNull(formData.fasting_glucose),
+          familyHistory: numberOrNull(formData.familyHistory),
+          activityLevel: numberOrNull(formData.activityLevel),
           cholesterol: 200,
           yearsCondition: 0
         })
@@ -105,7 +111,13 @@ export default function PredictorSection() {
         exerciseRec = 'Supervised Low-Impact Cardio. Recommend Swimming and gentle Yoga poses.'
       }
 
-      const features = Object.entries(mlPrediction.feature_importance || {}).map(([name, importance]) => ({
+      // This patient's feature contributions when the ML server explains the prediction, else the model-wide importances
+      const contributions = mlPrediction.explanation?.contributions
+      const totalContribution = Object.values(contributions || {}).reduce((sum, value) => sum + Math.abs(value), 0)
+      const weights = contributions && totalContribution > 0
+        ? Object.fromEntries(Object.entries(contributions).map(([name, value]) => [name, Math.abs(value) / totalContribution]))
+        : mlPrediction.feature_importance || {}
+      const features = Object.entries(weights).map(([name, importance]) => ({
         name,
         contribution: importance * 40
       })).sort((a, b) => b.contribution - a.contribution)